@@ -0,0 +1,13 @@
+"""
+Benchmarks of widgetify.
+
+This package measures how the public entry points of widgetify scale on
+synthetic Colab notebooks, saves the results as JSON, and compares them with
+a baseline to catch performance regressions across releases.
+
+Usage:
+::
+
+    python -m benchmarks -o baseline.json
+    python -m benchmarks -o results.json --compare baseline.json
+"""
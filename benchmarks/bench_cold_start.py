@@ -0,0 +1,249 @@
+"""
+Benchmark of the time from kernel start to the first displayed form, and of
+the compile time of converted form cells.
+
+Converts a notebook, then runs its code cells up to the first form in a fresh
+interpreter, and times the whole process, so the interpreter start-up and the
+module imports are included. The current layout, a prelude cell importing
+`widgetify.runtime` and forms built from their FormSpecs, is compared with the
+generated-code layout it replaced, where each form cell imported `ipywidgets`,
+`IPython`, `pandas` and `widgetify` itself and spelled out every widget. The
+generated-code layout is skipped if `pandas` is not installed.
+
+The compile time is measured in-process on the form cells of a synthetic
+notebook, for both layouts.
+
+Last, a session of a synthetic notebook with dozens of forms is timed from
+interpreter start until all its forms are displayed, with the forms embedded
+in the notebook and with the forms exported to a module (see
+`widgetify.export`), whose bytecode is loaded from ``__pycache__`` instead of
+being compiled from the source of each cell. The in-process cost of getting
+the code of the forms, compiling the cells or unmarshalling the bytecode, is
+also shown.
+
+Usage:
+::
+
+    python -m benchmarks.bench_cold_start [notebook] [n_forms]
+"""
+import os
+import sys
+import json
+import time
+import marshal
+import logging
+import tempfile
+import subprocess
+import importlib.util
+
+import nbformat
+
+import widgetify
+from widgetify.export import export_module
+
+from .generator import make_form_source
+
+from widgetify.form2widget import (
+    _widgetify, _is_form_cell, generate_widgets, extract_parameters,
+    extract_global_vars)
+
+from .generator import make_notebook
+
+# The imports each converted form cell used to start with
+LEGACY_IMPORTS = """
+import ipywidgets as widgets
+from IPython.display import display
+import pandas as pd
+from widgetify import create_input_dropdown
+"""
+
+DEFAULT_NOTEBOOK = os.path.join(
+    os.path.dirname(__file__), '..', 'notebooks', 'example_colab_forms.ipynb')
+
+
+def legacy_form_code(source, form_id):
+    """Convert a form cell into the generated-code layout.
+    """
+    widgets_code, update_code = generate_widgets(extract_parameters(source),
+                                                 form_id)
+    widgets_code = widgets_code.replace('datetime.datetime.strptime(',
+                                        'pd.to_datetime(')
+    widgets_code = widgets_code.replace(", '%Y-%m-%d').date()", ')')
+    lines = [line for line in source.splitlines()
+             if '@param' not in line and '@title' not in line]
+    global_vars = extract_global_vars('\n'.join(lines))
+    global_line = f"global {', '.join(global_vars)}" if global_vars else ""
+    remaining_code = '\n        '.join(lines)
+    return f"""{LEGACY_IMPORTS}
+{widgets_code}
+submit_button{form_id} = widgets.Button(description="Submit")
+display(submit_button{form_id})
+voila_out{form_id} = widgets.Output()
+display(voila_out{form_id})
+
+def on_submit_clicked{form_id}(b):
+    {update_code}
+    with voila_out{form_id}:
+        voila_out{form_id}.clear_output()
+        {global_line}
+        {remaining_code}
+
+submit_button{form_id}.on_click(on_submit_clicked{form_id})
+"""
+
+
+def form_sources(notebook, legacy=False):
+    """Return the converted sources of the form cells of a notebook.
+
+    Args:
+        notebook (nbformat.NotebookNode): The source notebook.
+        legacy (bool, optional): Use the generated-code layout.
+
+    Returns:
+        list of str: The converted cells, starting with the prelude cell in
+        the current layout.
+    """
+    sources = [cell.source for cell in notebook.cells
+               if cell.cell_type == 'code' and _is_form_cell(cell.source)]
+    if legacy:
+        return [legacy_form_code(source, form_id)
+                for form_id, source in enumerate(sources, 1)]
+    converted = _widgetify(notebook)
+    return [cell.source for cell in converted.cells
+            if cell.cell_type == 'code' and (
+                'widgetify.runtime' in cell.source or
+                cell.source.startswith('@form('))]
+
+
+def time_cold_start(code, repeat=5):
+    """Return the best wall time of running code in a fresh interpreter.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Runs the cells whose sources are in a JSON file, as a kernel would
+SESSION_DRIVER = """
+import sys, json
+namespace = {'__name__': '__main__'}
+for source in json.load(open(sys.argv[1])):
+    exec(compile(source, '<cell>', 'exec'), namespace)
+"""
+
+
+def time_session(sources, cwd, repeat=5):
+    """Return the best wall time of running cells in a fresh interpreter.
+    """
+    cells_filename = os.path.join(cwd, 'cells.json')
+    with open(cells_filename, 'w') as f:
+        json.dump(sources, f)
+    # Run in `cwd`, where the exported module is, with widgetify importable
+    # even if it is not installed
+    package_dir = os.path.dirname(os.path.dirname(widgetify.__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [package_dir, os.environ.get('PYTHONPATH')])))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', SESSION_DRIVER,
+                        cells_filename], check=True, cwd=cwd, env=env,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def time_unmarshal(pyc_filename, repeat=5):
+    """Return the best wall time of loading the code of a bytecode file.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(pyc_filename, 'rb') as f:
+            # Skip the 16-byte header of the pyc file
+            marshal.loads(f.read()[16:])
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def compare_sessions(n_forms):
+    """Time a session of a notebook of forms, embedded and exported.
+    """
+    notebook = nbformat.v4.new_notebook(cells=[
+        nbformat.v4.new_code_cell(make_form_source(i, 8))
+        for i in range(n_forms)])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_filename = os.path.join(tmp_dir, 'forms.ipynb')
+        nbformat.write(notebook, nb_filename)
+        embedded = [cell.source for cell in _widgetify(notebook).cells]
+        exported = export_module(nb_filename)
+        launcher = nbformat.read(nb_filename, as_version=4)
+        launcher = [cell.source for cell in launcher.cells]
+        pyc_filename = importlib.util.cache_from_source(
+            exported.module_filename)
+
+        print(f"Session start to {n_forms} forms displayed")
+        print(f"{'layout':<16} {'session (ms)':>13} {'code (ms)':>10}")
+        rows = (
+            ('embedded', time_session(embedded, tmp_dir),
+             time_compile(embedded)),
+            ('exported module', time_session(launcher, tmp_dir),
+             time_unmarshal(pyc_filename)),
+        )
+        for name, session_time, code_time in rows:
+            print(f"{name:<16} {session_time * 1e3:>13.1f} "
+                  f"{code_time * 1e3:>10.2f}")
+
+
+def time_compile(sources, repeat=5):
+    """Return the best wall time of compiling the sources of cells.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for source in sources:
+            compile(source, '<cell>', 'exec')
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    logging.disable(logging.INFO)
+    argv = sys.argv[1:] if argv is None else argv
+    nb_filename = argv[0] if argv else DEFAULT_NOTEBOOK
+    n_forms = int(argv[1]) if len(argv) > 1 else 50
+    notebook = nbformat.read(nb_filename, as_version=4)
+
+    print(f"Kernel start to first form: {nb_filename}")
+    print(f"{'layout':<16} {'time (ms)':>10}")
+    print(f"{'python -c pass':<16} {time_cold_start('pass') * 1e3:>10.1f}")
+    # The prelude and the first form
+    code = '\n'.join(form_sources(notebook)[:2])
+    print(f"{'FormSpec':<16} {time_cold_start(code) * 1e3:>10.1f}")
+    if importlib.util.find_spec('pandas'):
+        code = form_sources(notebook, legacy=True)[0]
+        print(f"{'generated code':<16} {time_cold_start(code) * 1e3:>10.1f}")
+    else:
+        print(f"{'generated code':<16} {'skipped':>10} "
+              f"(pandas is not installed)")
+
+    print()
+    notebook = make_notebook(n_cells=1000, params_per_form=8, form_ratio=0.5)
+    print("Compile time of the form cells of a synthetic notebook")
+    print(f"{'layout':<16} {'lines':>7} {'time (ms)':>10}")
+    for name, legacy in (('FormSpec', False), ('generated code', True)):
+        sources = form_sources(notebook, legacy)
+        n_lines = sum(source.count('\n') + 1 for source in sources)
+        t = time_compile(sources)
+        print(f"{name:<16} {n_lines:>7} {t * 1e3:>10.1f}")
+
+    print()
+    compare_sessions(n_forms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark of the comm traffic of an input dropdown while typing.
+
+Types a word into the input box of an input dropdown with thousands of
+options, and counts the comm messages the kernel sends to the front-end, and
+their size in bytes, as well as the size of the initial state of the
+dropdown. The `InputDropdown` widget is compared with the function-based
+input dropdown it replaced, whose input box sent every keystroke to the
+kernel, which sent the whole option list back each time. The indexed
+`InputDropdown`, backed by an `OptionIndex`, sends every keystroke too, but
+only the first matches of the input, so its cost stays flat as the number
+of options grows.
+
+The front-end is simulated by applying the state updates of the input box as
+the comm messages of the front-end are applied; no kernel is needed.
+
+Usage:
+::
+
+    python -m benchmarks.bench_input_dropdown [n_options]
+"""
+import sys
+import json
+import contextlib
+
+import ipywidgets as widgets
+
+from widgetify.input_dropdown import InputDropdown, OptionIndex
+
+
+def legacy_input_dropdown(options, value, description):
+    """Create the function-based input dropdown, minus its class patching.
+    """
+    layout = widgets.Layout(width='auto')
+    dropdown = widgets.Dropdown(
+        options=options, value=value if value in options else None,
+        description=description, layout=layout)
+    input_box = widgets.Text(description='', placeholder='Type to Input',
+                             layout=layout)
+
+    def update_dropdown(change):
+        if change['new'] not in options:
+            dropdown.options = [change['new']] + options
+        dropdown.value = change['new']
+
+    def update_input_box(change):
+        if change['new']:
+            input_box.value = str(change['new'])
+
+    input_box.observe(update_dropdown, names='value')
+    dropdown.observe(update_input_box, names='value')
+    return widgets.HBox([dropdown, input_box])
+
+
+@contextlib.contextmanager
+def count_messages():
+    """Count the messages sent to the front-end, and their size in bytes.
+
+    Yields:
+        dict: ``{'messages': n, 'bytes': n}``, updated as messages are sent.
+    """
+    counts = {'messages': 0, 'bytes': 0}
+    original = widgets.Widget._send
+
+    def _send(self, msg, buffers=None):
+        counts['messages'] += 1
+        counts['bytes'] += len(json.dumps(msg))
+
+    widgets.Widget._send = _send
+    try:
+        yield counts
+    finally:
+        widgets.Widget._send = original
+
+
+def type_word(input_box, word):
+    """Simulate typing a word into an input box in the front-end.
+
+    A box with `continuous_update` sends its value on every keystroke;
+    otherwise, it sends the value once, when the input is committed.
+    """
+    if input_box.continuous_update:
+        prefixes = [word[:i] for i in range(1, len(word) + 1)]
+    else:
+        prefixes = [word]
+    for prefix in prefixes:
+        # As a comm message from the front-end is applied
+        with input_box._lock_property(value=prefix), input_box.hold_sync():
+            input_box.set_state({'value': prefix})
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    n_options = int(argv[0]) if argv else 5000
+    word = 'option 0042'
+
+    print(f"Typing {len(word)} keystrokes into an input dropdown")
+    print(f"{'widget':<16} {'options':>8} {'load bytes':>11} {'messages':>9} "
+          f"{'bytes':>9} {'bytes/keystroke':>16}")
+    factories = (
+        ('function', legacy_input_dropdown),
+        ('InputDropdown', InputDropdown),
+        ('indexed', lambda options, value, description: InputDropdown(
+            OptionIndex(options), value, description)),
+    )
+    for name, factory in factories:
+        for n in (n_options, n_options * 10):
+            options = [f"option {i:05d}" for i in range(n)]
+            widget = factory(options, options[0], 'x')
+            load_bytes = len(json.dumps(widget.children[0].get_state()))
+            with count_messages() as counts:
+                type_word(widget.children[1], word)
+            print(f"{name:<16} {n:>8} {load_bytes:>11} "
+                  f"{counts['messages']:>9} {counts['bytes']:>9} "
+                  f"{counts['bytes'] / len(word):>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of the Colab form parameter parser.
+
+Measures `extract_parameters` on cells with thousands of lines and on
+parameters with very long option lists, and the form cell detection on very
+long lines. The time per line (or per option) stays flat as the input grows,
+i.e., the parser scales linearly. The detection is compared against the
+regular expression it replaced, which backtracks quadratically on long lines.
+
+Usage:
+::
+
+    python -m benchmarks.bench_parser
+"""
+import re
+import time
+import logging
+
+from widgetify.form2widget import extract_parameters, _is_form_cell
+
+
+def best_time(func, *args, repeat=5):
+    """Return the best wall time of several calls in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_cell(n_lines):
+    """Make a form cell with `n_lines` lines, one in four a parameter.
+    """
+    lines = []
+    for i in range(n_lines):
+        if i % 4 == 0:
+            lines.append(f'p{i} = {i} # @param {{"type":"integer"}}')
+        elif i % 4 == 1:
+            lines.append(f's{i} = "v" # @param ["v","w"] {{"allow-input":true}}')
+        else:
+            lines.append(f'print(p{i - i % 4}, "x = y")  # a comment')
+    return '\n'.join(lines)
+
+
+def make_options_cell(n_options):
+    """Make a form cell with one parameter of `n_options` options.
+    """
+    options = ','.join(f'"option {i}"' for i in range(n_options))
+    return f'choice = "option 0" # @param [{options}]'
+
+
+def main():
+    logging.disable(logging.INFO)
+
+    print("extract_parameters() on long cells")
+    print(f"{'lines':>8} {'time (ms)':>10} {'us/line':>8}")
+    for n_lines in (1000, 2000, 4000, 8000, 16000):
+        t = best_time(extract_parameters, make_cell(n_lines))
+        print(f"{n_lines:>8} {t * 1e3:>10.2f} {t / n_lines * 1e6:>8.2f}")
+
+    print()
+    print("extract_parameters() on long option lists")
+    print(f"{'options':>8} {'time (ms)':>10} {'us/opt':>8}")
+    for n_options in (1000, 4000, 16000, 64000):
+        t = best_time(extract_parameters, make_options_cell(n_options))
+        print(f"{n_options:>8} {t * 1e3:>10.2f} "
+              f"{t / n_options * 1e6:>8.2f}")
+
+    print()
+    print("Form cell detection on a long line of '=' and '#'")
+    print(f"{'chars':>8} {'regex (ms)':>11} {'new (ms)':>9}")
+    old_pat = re.compile(r'.*=.*#\s*@param')
+    for n_chars in (200, 400, 800, 1600):
+        source = 'x' + '=#' * (n_chars // 2) + '\n# @param'
+        t_old = best_time(old_pat.search, source, repeat=1)
+        t_new = best_time(_is_form_cell, source)
+        print(f"{n_chars:>8} {t_old * 1e3:>11.2f} {t_new * 1e3:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark of the scope analysis of form cells.
+
+Measures the global variable analysis of the form cells of a synthetic
+notebook: the two-walk `extract_global_vars` it replaced (plus the separate
+walk finding the reads), and `scope.analyze_scope`, finding both in a single
+pass, with a cold cache and with a warm cache, as when a notebook is
+converted again or its cells are analyzed again for dependencies.
+
+Usage:
+::
+
+    python -m benchmarks.bench_scope [n_cells]
+"""
+import ast
+import sys
+import time
+import logging
+
+from widgetify.form2widget import _is_form_cell, _remaining_code
+from widgetify.scope import analyze_scope
+
+from .generator import make_notebook
+
+
+def legacy_global_vars(code):
+    """Find the global variables with the two walks of the former
+    `extract_global_vars`.
+    """
+    global_vars = set()
+
+    class GlobalVarVisitor(ast.NodeVisitor):
+        def visit_Global(self, node):
+            global_vars.update(node.names)
+
+    class AssignVisitor(ast.NodeVisitor):
+        def visit_Assign(self, node):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    global_vars.add(target.id)
+
+    tree = ast.parse(code)
+    GlobalVarVisitor().visit(tree)
+    AssignVisitor().visit(tree)
+    return global_vars
+
+
+def legacy_read_vars(code):
+    """Find the read variables with the walk of the former
+    `extract_read_vars`.
+    """
+    return {node.id for node in ast.walk(ast.parse(code))
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+
+
+def best_time(func, setup=None, repeat=5):
+    """Return the best wall time of several calls in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    logging.disable(logging.INFO)
+    argv = sys.argv[1:] if argv is None else argv
+    n_cells = int(argv[0]) if argv else 1000
+    notebook = make_notebook(n_cells=n_cells, params_per_form=8,
+                             form_ratio=0.5)
+    codes = [_remaining_code(cell.source) for cell in notebook.cells
+             if cell.cell_type == 'code' and _is_form_cell(cell.source)]
+
+    def legacy():
+        for code in codes:
+            legacy_global_vars(code)
+            legacy_read_vars(code)
+
+    def single_pass():
+        for code in codes:
+            analyze_scope(code)
+
+    print(f"Scope analysis of {len(codes)} form cells")
+    print(f"{'analysis':<32} {'time (ms)':>10}")
+    rows = (
+        ('two walks + read walk', best_time(legacy)),
+        ('analyze_scope (cold cache)',
+         best_time(single_pass, analyze_scope.cache_clear)),
+        ('analyze_scope (warm cache)', best_time(single_pass)),
+    )
+    for name, t in rows:
+        print(f"{name:<32} {t * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Synthetic Colab notebook generator for benchmarks.
+
+Usage:
+::
+
+    from benchmarks.generator import make_notebook
+
+    notebook = make_notebook(n_cells=200, params_per_form=5, n_options=20,
+                             output_size=10_000)
+"""
+import base64
+import random
+
+import nbformat
+
+# Parameter annotations cycled through by the generated forms
+_PARAM_KINDS = ('string', 'number', 'integer', 'raw', 'date', 'slider',
+                'dropdown', 'input-dropdown')
+
+
+def make_notebook(n_cells=100, params_per_form=5, n_options=10,
+                  output_size=0, form_ratio=0.3, section_every=10, seed=0):
+    """Make a synthetic Colab notebook.
+
+    The notebook starts with an open-in-colab cell and an install section,
+    followed by sections of code and form cells. Every `section_every` cells
+    a markdown heading starts a new section.
+
+    Args:
+        n_cells (int, optional): The number of code cells.
+        params_per_form (int, optional): The number of `@param` lines in each
+            form cell.
+        n_options (int, optional): The length of the option lists of dropdown
+            parameters.
+        output_size (int, optional): The size in bytes of the PNG output
+            stored in each plain code cell; 0 stores no outputs.
+        form_ratio (float, optional): The fraction of code cells that are
+            forms.
+        section_every (int, optional): The number of code cells per section.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        nbformat.NotebookNode: The notebook.
+    """
+    rng = random.Random(seed)
+    n_bytes = output_size * 3 // 4
+    png = base64.b64encode(
+        rng.getrandbits(n_bytes * 8).to_bytes(n_bytes, 'little')
+        if n_bytes else b'').decode()
+
+    cells = [
+        nbformat.v4.new_markdown_cell(
+            '<a href="https://colab.research.google.com/" target="_parent">'
+            '<img src="https://colab.research.google.com/assets/'
+            'colab-badge.svg" alt="Open In Colab"/></a>'),
+        nbformat.v4.new_markdown_cell('#### Install Required Packages'),
+        nbformat.v4.new_code_cell('!pip install -q pandas\n%env X=1'),
+    ]
+    for i in range(n_cells):
+        if i % section_every == 0:
+            level = '##' if i % (section_every * 3) == 0 else '###'
+            cells.append(nbformat.v4.new_markdown_cell(
+                f"{level} Section {i // section_every}\n\nSome text."))
+        if rng.random() < form_ratio:
+            cells.append(nbformat.v4.new_code_cell(
+                make_form_source(i, params_per_form, n_options)))
+        else:
+            cell = nbformat.v4.new_code_cell(
+                f"v{i} = v{i - 1} + 1 if 'v{i - 1}' in globals() else 0\n"
+                f"print(v{i})")
+            if output_size:
+                cell.outputs = [nbformat.v4.new_output(
+                    'display_data', data={'image/png': png})]
+            cells.append(cell)
+
+    notebook = nbformat.v4.new_notebook()
+    notebook.cells = cells
+    return notebook
+
+
+def make_form_source(form_index, params_per_form=5, n_options=10):
+    """Make the source of a Colab form cell.
+
+    Args:
+        form_index (int): The index used to name the parameters.
+        params_per_form (int, optional): The number of `@param` lines.
+        n_options (int, optional): The length of the option lists.
+
+    Returns:
+        str: The source of the form cell.
+    """
+    options = ','.join(f'"opt{j}"' for j in range(n_options))
+    lines = [f'# @title Form {form_index} {{"run":"auto"}}']
+    names = []
+    for j in range(params_per_form):
+        name = f"p{form_index}_{j}"
+        names.append(name)
+        kind = _PARAM_KINDS[j % len(_PARAM_KINDS)]
+        if kind == 'slider':
+            lines.append(f'{name} = 5 # @param '
+                         f'{{"type":"slider","min":0,"max":10,"step":1}}')
+        elif kind == 'date':
+            lines.append(f'{name} = "2024-09-19" # @param {{"type":"date"}}')
+        elif kind == 'dropdown':
+            lines.append(f'{name} = "opt0" # @param [{options}]')
+        elif kind == 'input-dropdown':
+            lines.append(f'{name} = "opt0" # @param [{options}] '
+                         f'{{"allow-input":true}}')
+        elif kind == 'string':
+            lines.append(f'{name} = "abc" # @param {{"type":"string"}}')
+        else:
+            lines.append(f'{name} = 1 # @param {{"type":"{kind}"}}')
+    lines.append('')
+    lines.append(f"result{form_index} = [{', '.join(names)}]")
+    lines.append(f"print(result{form_index})")
+    return '\n'.join(lines)
@@ -0,0 +1,259 @@
+"""
+Run the benchmarks of widgetify's public entry points.
+
+Each benchmark is timed over several runs and the best wall time is kept. The
+peak memory is measured with `tracemalloc` in a separate run, so tracing does
+not distort the timing. Results are saved as JSON, and can be compared with a
+baseline; the comparison fails when a tracked metric grows past a threshold.
+
+Usage:
+::
+
+    python -m benchmarks -o baseline.json
+    python -m benchmarks -o results.json --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import nbformat
+
+import widgetify
+from widgetify import nb_io
+from widgetify import nb_op
+from widgetify.form2widget import (
+    extract_parameters, generate_widgets, extract_global_vars, _is_form_cell)
+from widgetify.scope import analyze_scope
+
+from .generator import make_notebook
+
+# Wall times below this (in seconds) are too noisy to flag as regressions
+MIN_TIME = 1e-3
+
+
+def main(argv=None):
+    """Run the benchmarks, save the results, and compare with a baseline.
+
+    Returns:
+        int: 1 if any metric regressed past the threshold, 0 otherwise.
+    """
+    args = _parse_args(argv)
+    logging.disable(logging.INFO)
+
+    config = {
+        'n_cells': args.cells,
+        'params_per_form': args.params,
+        'n_options': args.options,
+        'output_size': args.output_size,
+    }
+    results = run_benchmarks(config, args.repeat)
+    report = {
+        'meta': {
+            'widgetify': widgetify.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': config,
+        },
+        'results': results,
+    }
+
+    print(f"{'benchmark':<40} {'time (ms)':>10} {'peak (KiB)':>11}")
+    for name, metrics in results.items():
+        print(f"{name:<40} {metrics['wall_time'] * 1e3:>10.2f} "
+              f"{metrics['peak_memory'] / 1024:>11.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline['results'], results, args.threshold)
+        print()
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.6g} -> {new:.6g} "
+                  f"(+{(new / old - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regression past {args.threshold:.0%}")
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark widgetify on synthetic Colab notebooks.')
+    parser.add_argument('--cells', type=int, default=200,
+                        help='code cells per notebook (default: %(default)s)')
+    parser.add_argument('--params', type=int, default=5,
+                        help='params per form (default: %(default)s)')
+    parser.add_argument('--options', type=int, default=20,
+                        help='options per dropdown (default: %(default)s)')
+    parser.add_argument('--output-size', type=int, default=10_000,
+                        help='bytes of output per code cell '
+                             '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with the results in a JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative growth of a metric '
+                             '(default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def run_benchmarks(config, repeat=5):
+    """Run every benchmark on a notebook generated with `config`.
+
+    Args:
+        config (dict): Keyword arguments of `generator.make_notebook`.
+        repeat (int, optional): The number of timed runs per benchmark.
+
+    Returns:
+        dict: ``{name: {'wall_time': seconds, 'peak_memory': bytes}}``.
+    """
+    notebook = make_notebook(**config)
+    sources = [cell.source for cell in notebook.cells
+               if cell.cell_type == 'code' and _is_form_cell(cell.source)]
+    params = [extract_parameters(source) for source in sources]
+    bodies = ['\n'.join(line for line in source.splitlines()
+                        if '@param' not in line and '@title' not in line)
+              for source in sources]
+
+    tmp_dir = tempfile.mkdtemp()
+    nb_template = os.path.join(tmp_dir, 'template.ipynb')
+    with open(nb_template, 'w', encoding='utf-8') as f:
+        nbformat.write(notebook, f)
+    nb_filename = os.path.join(tmp_dir, 'notebook.ipynb')
+
+    def fresh_copy():
+        shutil.copyfile(nb_template, nb_filename)
+        return (nb_filename,)
+
+    def uncached_bodies():
+        # Measure the analysis, not the cache of analyze_scope
+        analyze_scope.cache_clear()
+        return (bodies,)
+
+    section = 'Section 3'
+    # Ten level-3 sections, as a preparation step removes
+    sections = [f"### Section {k}" for k in range(1, 30) if k % 3][:10]
+    benchmarks = {
+        'form2widget.widgetify':
+            (fresh_copy, widgetify.widgetify),
+        'form2widget.extract_parameters':
+            (lambda: (sources,),
+             lambda sources: [extract_parameters(s) for s in sources]),
+        'form2widget.generate_widgets':
+            (lambda: (params,),
+             lambda params: [generate_widgets(p, i)
+                             for i, p in enumerate(params)]),
+        'form2widget.extract_global_vars':
+            (uncached_bodies,
+             lambda bodies: [extract_global_vars(b) for b in bodies]),
+        'nb_io.read_notebook':
+            (fresh_copy, nb_io.read_notebook),
+        'nb_io.read_notebook (trusted)':
+            (fresh_copy, lambda f: nb_io.read_notebook(f, trusted=True)),
+        'nb_io.read_notebook (streaming)':
+            (fresh_copy, lambda f: nb_io.read_notebook(f, streaming=True)),
+        'nb_op.insert_title_cells':
+            (fresh_copy, nb_op.insert_title_cells),
+        'nb_op.remove_open_in_colab_cell':
+            (fresh_copy, nb_op.remove_open_in_colab_cell),
+        'nb_op.extract_and_comment_first_code_cell':
+            (fresh_copy, nb_op.extract_and_comment_first_code_cell),
+        'nb_op.search_section':
+            (fresh_copy, lambda f: nb_op.search_section(f, section)),
+        'nb_op.extract_section':
+            (fresh_copy, lambda f: nb_op.extract_section(f, f"## {section}")),
+        'nb_op.remove_section':
+            (fresh_copy, lambda f: nb_op.remove_section(f, f"## {section}")),
+        'nb_op.remove_section (10 calls)':
+            (fresh_copy, lambda f: [nb_op.remove_section(f, name)
+                                    for name in sections]),
+        'nb_op.remove_sections (10 sections)':
+            (fresh_copy, lambda f: nb_op.remove_sections(f, sections)),
+    }
+
+    try:
+        return {name: measure(setup, func, repeat)
+                for name, (setup, func) in benchmarks.items()}
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def measure(setup, func, repeat=5):
+    """Measure the best wall time and the peak memory of a function.
+
+    Args:
+        setup (callable): Returns the arguments of `func`; called before
+            every run and not timed.
+        func (callable): The function to measure.
+        repeat (int, optional): The number of timed runs.
+
+    Returns:
+        dict: ``{'wall_time': seconds, 'peak_memory': bytes}``.
+    """
+    wall_time = float('inf')
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'wall_time': wall_time, 'peak_memory': peak_memory}
+
+
+def compare(baseline, results, threshold=0.2):
+    """Find the metrics that grew past a threshold.
+
+    Args:
+        baseline (dict): The results of a previous run.
+        results (dict): The results of the current run.
+        threshold (float, optional): The allowed relative growth.
+
+    Returns:
+        list of tuple: ``(name, metric, baseline_value, value)`` of each
+        regressed metric. Benchmarks missing from either side are ignored.
+
+    Examples:
+        >>> compare({'f': {'wall_time': 0.1, 'peak_memory': 100}},
+        ...         {'f': {'wall_time': 0.2, 'peak_memory': 110}})
+        [('f', 'wall_time', 0.1, 0.2)]
+    """
+    regressions = []
+    for name, old_metrics in baseline.items():
+        new_metrics = results.get(name)
+        if new_metrics is None:
+            continue
+        for metric, old in old_metrics.items():
+            new = new_metrics.get(metric)
+            if new is None or old <= 0:
+                continue
+            if metric == 'wall_time' and old < MIN_TIME:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+if __name__ == "__main__":
+    sys.exit(main())
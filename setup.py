@@ -22,11 +22,20 @@ setup(
     author_email = 'york.jong@gmail.com',
     description = 'Google Colab Forms into Jupyter Widgets Converter',
     long_description = open('README.md').read(),
-    python_requires = '>=3.6',
-    packages = find_packages(),
+    python_requires = '>=3.7',
+    packages = find_packages(exclude=['benchmarks', 'benchmarks.*']),
     install_requires = [
         'ipywidgets',
         'nbformat',
     ],
+    extras_require = {
+        'fast': ['orjson'],
+    },
+    entry_points = {
+        'console_scripts': [
+            'widgetify = widgetify.cli:main',
+            'widgetify-serve = widgetify.service:main',
+        ],
+    },
 )
 
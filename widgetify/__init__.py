@@ -2,19 +2,28 @@
 Initialize widgetify package.
 """
 __software__ = "Google Colab Forms into `ipywidgets` Converter"
-__version__ = "1.0"
+__version__ = "1.2"
 __author__ = "York <york.jong@gmail.com>"
-__date__ = "2024/09/19 (initial version) ~ 2024/09/22 (last revision)"
+__date__ = "2024/09/19 (initial version) ~ 2026/10/18 (last revision)"
 
 __all__ = [
     'widgetify',
+    'widgetify_notebook',
+    'widgetify_bytes',
+    'nb_io',
     'nb_op',
     'nb_exec',
+    'nb_profile',
+    'nb_pipeline',
+    'InputDropdown',
     'create_input_dropdown',
 ]
 
 from .form2widget import *
+from . import nb_io
 from . import nb_op
 from . import nb_exec
+from . import nb_profile
+from . import nb_pipeline
 from .input_dropdown import *
 
@@ -0,0 +1,8 @@
+"""
+Run the `widgetify` command with ``python -m widgetify``.
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+cache - Content-hash Conversion Cache
+
+This module provides `ConversionCache`, an on-disk cache that lets
+`widgetify` skip work that was already done by a previous build:
+
+* Each converted form cell is stored under a hash of the cell source and the
+  widgetify version, so an unchanged cell is not parsed and regenerated.
+* Each converted notebook is stored under a hash of the notebook file, so a
+  fully unchanged notebook is skipped without parsing its cells.
+
+The cache lives in a SQLite database, which is safe to share between the
+worker processes of the `widgetify` command. Its total size is capped, and
+the least recently used entries are evicted when the cap is exceeded.
+
+Usage:
+::
+
+    from widgetify import widgetify
+    from widgetify.cache import ConversionCache
+
+    cache = ConversionCache()
+    widgetify('example_colab_forms.ipynb', cache=cache)
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'ConversionCache',
+    'default_cache_dir',
+]
+
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+
+from . import __version__
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The value stored for a notebook that is its own conversion result, i.e., a
+# notebook that was already converted in place.
+_UNCHANGED = b''
+
+
+def default_cache_dir():
+    """Return the default cache directory.
+
+    Returns:
+        str: ``$XDG_CACHE_HOME/widgetify``, or ``~/.cache/widgetify`` if
+        `XDG_CACHE_HOME` is not set.
+    """
+    cache_home = (os.environ.get('XDG_CACHE_HOME') or
+                  os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'widgetify')
+
+
+class ConversionCache:
+    """An on-disk LRU cache of converted cells and notebooks.
+
+    Args:
+        cache_dir (str, optional): The directory holding the cache database.
+            Defaults to `default_cache_dir()`.
+        max_size (int, optional): The maximum total size of the cached values
+            in bytes. Defaults to 256 MiB.
+
+    Examples:
+        >>> import tempfile
+        >>> cache = ConversionCache(tempfile.mkdtemp(), max_size=10)
+        >>> cache.put_cell('x = 1 # @param', 'form code')
+        >>> cache.get_cell('x = 1 # @param')
+        'form code'
+        >>> cache.put_cell('y = 2 # @param', 'more code')
+        >>> cache.get_cell('x = 1 # @param') is None
+        True
+    """
+
+    def __init__(self, cache_dir=None, max_size=256 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(self.cache_dir, 'cache.sqlite3'), timeout=30)
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB, '
+                'size INTEGER, last_used REAL)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS entries_last_used '
+                'ON entries (last_used)')
+
+    def close(self):
+        """Close the cache database.
+        """
+        self._db.close()
+
+    def get_cell(self, source):
+        """Return the cached conversion of a form cell.
+
+        Args:
+            source (str): The source of the form cell.
+
+        Returns:
+            str: The converted source, or None on a cache miss.
+        """
+        value = self._get(_cell_key(source))
+        return None if value is None else value.decode('utf-8')
+
+    def put_cell(self, source, converted_source):
+        """Store the conversion of a form cell.
+
+        Args:
+            source (str): The source of the form cell.
+            converted_source (str): The converted source.
+        """
+        self._put(_cell_key(source), converted_source.encode('utf-8'))
+
+    def get_notebook(self, nb_bytes, variant=''):
+        """Return the cached conversion of a notebook file.
+
+        Args:
+            nb_bytes (bytes): The content of the notebook file.
+            variant (str, optional): The conversion options, which are part of
+                the key.
+
+        Returns:
+            bytes: The content of the converted notebook file, or None on a
+            cache miss. An unchanged notebook returns `nb_bytes` itself.
+        """
+        value = self._get(_notebook_key(nb_bytes, variant))
+        if value == _UNCHANGED:
+            return nb_bytes
+        return value
+
+    def put_notebook(self, nb_bytes, converted_bytes, variant=''):
+        """Store the conversion of a notebook file.
+
+        The converted notebook is also recorded as unchanged by conversion,
+        so converting it again in place is a cache hit.
+
+        Args:
+            nb_bytes (bytes): The content of the notebook file.
+            converted_bytes (bytes): The content of the converted notebook.
+            variant (str, optional): The conversion options, which are part of
+                the key.
+        """
+        if converted_bytes != nb_bytes:
+            self._put(_notebook_key(nb_bytes, variant), converted_bytes)
+        self._put(_notebook_key(converted_bytes, variant), _UNCHANGED)
+
+    def _get(self, key):
+        with self._db:
+            row = self._db.execute(
+                'SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                'UPDATE entries SET last_used = ? WHERE key = ?',
+                (time.time(), key))
+        return bytes(row[0])
+
+    def _put(self, key, value):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                (key, value, len(value), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used entries until the cache fits.
+        """
+        total, = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if total <= self.max_size:
+            return
+        rows = self._db.execute(
+            'SELECT key, size FROM entries '
+            'ORDER BY last_used DESC, rowid DESC')
+        kept = 0
+        evicted = []
+        for key, size in rows:
+            if kept + size <= self.max_size and not evicted:
+                kept += size
+            else:
+                evicted.append((key,))
+        self._db.executemany('DELETE FROM entries WHERE key = ?', evicted)
+        logger.debug(f"Evicted {len(evicted)} cache entries")
+
+
+def _cell_key(source):
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    return f"cell:{__version__}:{digest}"
+
+
+def _notebook_key(nb_bytes, variant=''):
+    digest = hashlib.sha256(nb_bytes).hexdigest()
+    return f"nb:{__version__}:{variant}:{digest}"
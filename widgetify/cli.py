@@ -0,0 +1,299 @@
+"""
+cli - Command Line Interface for Batch Notebook Conversion
+
+This module provides the `widgetify` console command, which converts the
+Colab Forms of many notebooks into Jupyter Widgets in a process pool. The
+command accepts notebook files, directories (searched recursively for
+``*.ipynb``) and glob patterns, reports the success or failure of each file,
+and ends with a throughput summary. A malformed notebook is reported as a
+failure and does not abort the batch.
+
+With ``--watch``, the command keeps watching a source directory and rebuilds
+the converted copy of each notebook in the output directory as it is edited.
+
+With ``--export-module``, the forms of each notebook are exported to a Python
+module next to the converted notebook, which becomes a launcher importing the
+module (see `export.export_module`).
+
+Usage:
+::
+
+    widgetify notebooks/ 'extra/**/*.ipynb' --jobs 8
+    widgetify notebooks/ --output-dir voila_notebooks --watch
+    widgetify notebooks/ --output-dir voila_notebooks --export-module
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'main',
+]
+
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+import concurrent.futures
+
+from . import __version__
+from . import nb_io
+from .form2widget import widgetify
+from .export import export_module
+from .cache import ConversionCache, default_cache_dir
+from .watch import NotebookWatcher
+
+
+def main(argv=None):
+    """Run the `widgetify` command.
+
+    Args:
+        argv (list of str, optional): The command line arguments, excluding
+            the program name. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: The exit status; 0 if every notebook was converted, 1 if any
+        conversion failed, and 2 if no notebook was found.
+    """
+    args = _parse_args(argv)
+
+    if args.watch:
+        if len(args.paths) != 1 or not os.path.isdir(args.paths[0]):
+            print("widgetify: --watch takes a single directory",
+                  file=sys.stderr)
+            return 2
+        if not args.output_dir:
+            print("widgetify: --watch requires --output-dir",
+                  file=sys.stderr)
+            return 2
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        NotebookWatcher(args.paths[0], args.output_dir).run()
+        return 0
+
+    nb_filenames = find_notebooks(args.paths)
+    if not nb_filenames:
+        print("widgetify: no notebooks found", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    n_failed = 0
+    cache_dir = None if args.no_cache else args.cache_dir
+    io_options = {
+        'trusted': args.trusted,
+        'streaming': args.streaming,
+        'json_backend': args.json_backend,
+    }
+    strip = {
+        'strip_outputs': (args.strip_outputs or
+                          args.max_output_size is not None),
+        'max_output_size': args.max_output_size,
+    }
+    for nb_filename, error, duration, report in convert_notebooks(
+            nb_filenames, args.jobs, cache_dir, args.output_dir, io_options,
+            strip, args.export_module):
+        if error:
+            n_failed += 1
+            print(f"FAIL {nb_filename}: {error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"OK   {nb_filename} ({duration:.2f}s)")
+            if report:
+                print(f"     {report}")
+    elapsed = time.perf_counter() - start
+
+    n_total = len(nb_filenames)
+    print(f"Converted {n_total - n_failed} of {n_total} notebooks "
+          f"({n_failed} failed) in {elapsed:.2f}s, "
+          f"{n_total / elapsed:.1f} notebooks/s")
+    return 1 if n_failed else 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='widgetify',
+        description='Convert Google Colab Forms into Jupyter Widgets.')
+    parser.add_argument(
+        'paths', nargs='+', metavar='PATH',
+        help='a notebook file, a directory, or a glob pattern')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count(),
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='report failures and the summary only')
+    parser.add_argument(
+        '-o', '--output-dir',
+        help='write converted notebooks to this directory instead of '
+             'converting them in place')
+    parser.add_argument(
+        '--watch', action='store_true',
+        help='keep rebuilding the notebooks of a directory as they change')
+    parser.add_argument(
+        '--export-module', action='store_true',
+        help='export the forms of each notebook to a Python module imported '
+             'by the converted notebook')
+    parser.add_argument(
+        '--strip-outputs', action='store_true',
+        help='strip stored outputs, execution counts and widget state')
+    parser.add_argument(
+        '--max-output-size', type=int, metavar='BYTES',
+        help='strip only outputs larger than BYTES (implies --strip-outputs)')
+    parser.add_argument(
+        '--cache-dir', default=default_cache_dir(),
+        help='directory of the conversion cache (default: %(default)s)')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='convert every notebook without using the cache')
+    parser.add_argument(
+        '--trusted', action='store_true',
+        help='skip JSON schema validation of the notebooks')
+    parser.add_argument(
+        '--streaming', action='store_true',
+        help='pass cell outputs through without decoding them '
+             '(implies --trusted)')
+    parser.add_argument(
+        '--json-backend', choices=('json', 'orjson', 'auto'), default='json',
+        help='JSON library for reading and writing (default: %(default)s)')
+    parser.add_argument(
+        '--version', action='version', version=f'%(prog)s {__version__}')
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error(f"argument -j/--jobs: must be at least 1, "
+                     f"not {args.jobs}")
+    return args
+
+
+def find_notebooks(paths):
+    """Expand files, directories and glob patterns into notebook filenames.
+
+    Directories are searched recursively for ``*.ipynb`` files, skipping
+    ``.ipynb_checkpoints`` directories. Duplicate files are listed once.
+
+    Args:
+        paths (list of str): Notebook files, directories or glob patterns.
+
+    Returns:
+        list of str: The notebook filenames, in the order they were found.
+    """
+    nb_filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames
+                                     if d != '.ipynb_checkpoints')
+                nb_filenames.extend(os.path.join(dirpath, filename)
+                                    for filename in sorted(filenames)
+                                    if filename.endswith('.ipynb'))
+        elif os.path.isfile(path):
+            nb_filenames.append(path)
+        else:
+            nb_filenames.extend(sorted(
+                filename for filename in glob.glob(path, recursive=True)
+                if os.path.isfile(filename)))
+
+    # Remove duplicates while keeping the order
+    return list(dict.fromkeys(nb_filenames))
+
+
+def convert_notebooks(nb_filenames, jobs=None, cache_dir=None,
+                      output_dir=None, io_options=None, strip=None,
+                      export=False):
+    """Convert notebooks in a process pool.
+
+    Args:
+        nb_filenames (list of str): The paths to the notebook files.
+        jobs (int, optional): The number of worker processes. With 1, the
+            notebooks are converted in the current process. Defaults to the
+            number of CPUs.
+        cache_dir (str, optional): The directory of the conversion cache
+            shared by the workers. Defaults to None (no caching).
+        output_dir (str, optional): The directory to write the converted
+            notebooks to, mirroring their layout below the common directory
+            of `nb_filenames`. Defaults to None (convert in place).
+        io_options (dict, optional): Options of `nb_io.set_options` for the
+            workers.
+        strip (dict, optional): The `strip_outputs` and `max_output_size`
+            arguments of `widgetify`.
+        export (bool, optional): Export the forms to modules with
+            `export.export_module` instead of converting them in the
+            notebooks. Defaults to False.
+
+    Yields:
+        tuple: ``(nb_filename, error, duration, report)`` for each notebook,
+        in the order the conversions finish. `error` is None on success, or a
+        message describing the failure. `report` is the payload report as a
+        string if outputs were stripped, or None.
+    """
+    if output_dir:
+        base_dir = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(nb_filename))
+             for nb_filename in nb_filenames])
+        output_filenames = [
+            os.path.join(output_dir, os.path.relpath(
+                os.path.abspath(nb_filename), base_dir))
+            for nb_filename in nb_filenames]
+    else:
+        output_filenames = [None] * len(nb_filenames)
+
+    if jobs == 1:
+        _init_worker(cache_dir, io_options)
+        for nb_filename, output_filename in zip(nb_filenames,
+                                                output_filenames):
+            yield _convert_notebook(nb_filename, output_filename, strip,
+                                    export)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=_init_worker,
+            initargs=(cache_dir, io_options)) as executor:
+        futures = {executor.submit(_convert_notebook, nb_filename,
+                                   output_filename, strip, export): nb_filename
+                   for nb_filename, output_filename
+                   in zip(nb_filenames, output_filenames)}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # A worker died (e.g., killed or crashed), which breaks the
+                # pool; report the notebooks it leaves unconverted
+                result = (futures[future], f"{type(e).__name__}: {e}", 0.0,
+                          None)
+            yield result
+
+
+# The conversion cache of the current worker process
+_worker_cache = None
+
+
+def _init_worker(cache_dir, io_options=None):
+    """Set the I/O options and open the conversion cache once per worker
+    process.
+    """
+    global _worker_cache
+    nb_io.set_options(**(io_options or {}))
+    _worker_cache = ConversionCache(cache_dir) if cache_dir else None
+
+
+def _convert_notebook(nb_filename, output_filename=None, strip=None,
+                      export=False):
+    """Convert a notebook and catch any error, for use in a worker process.
+    """
+    start = time.perf_counter()
+    report = error = None
+    try:
+        if output_filename:
+            os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+        if export:
+            report = export_module(nb_filename, output_filename,
+                                   **(strip or {})).report
+        else:
+            report = widgetify(nb_filename, output_filename,
+                               cache=_worker_cache, **(strip or {}))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (nb_filename, error, time.perf_counter() - start,
+            str(report) if report else None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
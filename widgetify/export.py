@@ -0,0 +1,221 @@
+"""
+export - Exporting Converted Forms as an Importable Module
+
+This module provides `export_module`, an alternative to `widgetify` for
+notebooks served to many sessions (e.g., by Voilà). Instead of embedding the
+converted forms in the notebook, where each new kernel parses and compiles
+them again, the forms are written to a Python module next to the notebook,
+with one builder function per form, and the notebook becomes a thin launcher
+that imports the module and calls the builders:
+::
+
+    import example_colab_forms_forms
+
+    form1 = example_colab_forms_forms.build_form1(globals())
+
+The module is compiled to bytecode in its ``__pycache__`` directory when it
+is exported, so every session, including the first one, loads the forms from
+the bytecode cache. The builders bind the form functions to the namespace of
+the notebook (see `runtime.form`), so the forms read and assign the
+notebook's variables as embedded forms do. The other cells of the notebook
+are kept in the launcher as they are.
+
+Usage:
+::
+
+    from widgetify.export import export_module
+
+    export_module('example_colab_forms.ipynb', 'voila/example.ipynb')
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'export_module',
+    'export_notebook',
+    'module_name_for',
+    'ModuleExport',
+]
+
+import os
+import re
+import logging
+import keyword
+import py_compile
+import collections
+
+import nbformat
+
+from . import nb_io
+from .nb_pipeline import NotebookPipeline
+from .form2widget import extract_form_spec, _is_form_cell, _form_function
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class ModuleExport(collections.namedtuple(
+        'ModuleExport', ['module_filename', 'launcher_filename', 'report'])):
+    """The files written by `export_module`.
+
+    Attributes:
+        module_filename (str): The path of the module, or None if the
+            notebook has no Colab Forms.
+        launcher_filename (str): The path of the launcher notebook.
+        report (nb_op.PayloadReport): The payload report if outputs were
+            stripped, or None.
+    """
+
+
+def module_name_for(nb_filename):
+    """Return the name of the module the forms of a notebook are exported to.
+
+    Args:
+        nb_filename (str): The path to the launcher notebook.
+
+    Returns:
+        str: A valid module name derived from the name of the notebook.
+
+    Examples:
+        >>> module_name_for('notebooks/example_colab_forms.ipynb')
+        'example_colab_forms_forms'
+        >>> module_name_for('2024 report-v2.ipynb')
+        '_2024_report_v2_forms'
+    """
+    stem = os.path.splitext(os.path.basename(nb_filename))[0]
+    name = re.sub(r'\W', '_', stem) + '_forms'
+    if name[0].isdigit() or keyword.iskeyword(name):
+        name = '_' + name
+    return name
+
+
+def export_module(nb_filename, output_filename=None, module_name=None,
+                  strip_outputs=False, max_output_size=None):
+    """Export the Colab Forms of a notebook as a module and a launcher
+    notebook.
+
+    Args:
+        nb_filename (str): The path to the notebook file.
+        output_filename (str, optional): The path to write the launcher
+            notebook to; the module is written to the same directory.
+            Defaults to None, which replaces the notebook with the launcher.
+        module_name (str, optional): The name of the module. Defaults to the
+            name given by `module_name_for`.
+        strip_outputs (bool, optional): Also strip stored outputs, execution
+            counts and widget state of the launcher. Defaults to False.
+        max_output_size (int, optional): With `strip_outputs`, keep outputs
+            up to this size in bytes. Defaults to None (remove all outputs).
+
+    Returns:
+        ModuleExport: The paths of the module and the launcher notebook.
+
+    Raises:
+        SyntaxError: If the code of a form cell is not valid Python.
+    """
+    if output_filename is None:
+        output_filename = nb_filename
+    if module_name is None:
+        module_name = module_name_for(output_filename)
+
+    notebook = nb_io.read_notebook(nb_filename)
+    module_source, launcher = export_notebook(
+        notebook, module_name, os.path.basename(nb_filename))
+    module_filename = None
+    if module_source is not None:
+        module_filename = os.path.join(
+            os.path.dirname(os.path.abspath(output_filename)),
+            module_name + '.py')
+        # Check the syntax before anything is written
+        compile(module_source, module_filename, 'exec')
+        with nb_io._atomic_open(module_filename) as f:
+            f.write(module_source.encode('utf-8'))
+        py_compile.compile(module_filename, doraise=True)
+        logger.debug(f"{nb_filename}: forms exported to {module_filename}")
+
+    pipeline = NotebookPipeline.from_notebook(launcher or notebook)
+    report = None
+    if strip_outputs:
+        report = pipeline.strip_outputs(max_output_size)
+    pipeline.save(output_filename)
+    return ModuleExport(module_filename, output_filename, report)
+
+
+def export_notebook(notebook, module_name, source_name='the notebook'):
+    """Split an in-memory notebook into a module and a launcher notebook.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook to export.
+        module_name (str): The name of the module.
+        source_name (str, optional): The name of the notebook, for the
+            docstring of the module.
+
+    Returns:
+        tuple: ``(module_source, launcher)``; the source of the module and
+        the launcher notebook, or ``(None, None)`` if the notebook contains
+        no Colab Forms.
+
+    Examples:
+        >>> nb = nbformat.v4.new_notebook(cells=[
+        ...     nbformat.v4.new_code_cell('data = [1, 2]'),
+        ...     nbformat.v4.new_code_cell('n = 1 # @param {"type":"integer"}\\n'
+        ...                               'print(data[:n])')])
+        >>> module_source, launcher = export_notebook(nb, 'nb_forms')
+        >>> for cell in launcher.cells:
+        ...     print(cell.source)
+        data = [1, 2]
+        import nb_forms
+        form1 = nb_forms.build_form1(globals())
+    """
+    functions = []
+    cells = []
+    import_index = None
+    for cell in notebook.cells:
+        if cell.cell_type != 'code' or not _is_form_cell(cell.source):
+            cells.append(cell)
+            continue
+        form_id = len(functions) + 1
+        if import_index is None:
+            import_index = len(cells)
+        spec = extract_form_spec(cell.source)
+        functions.append(_BUILDER.format(
+            form_id=form_id, spec=spec,
+            function=_form_function(cell.source, form_id, spec)))
+        cells.append(nbformat.v4.new_code_cell(
+            f"form{form_id} = {module_name}.build_form{form_id}(globals())"))
+
+    if not functions:
+        return None, None
+    cells.insert(import_index,
+                 nbformat.v4.new_code_cell(f"import {module_name}"))
+
+    module_source = _HEADER.format(module_name=module_name,
+                                   source_name=source_name)
+    module_source += '\n\n'.join(functions)
+
+    # Keep the metadata (e.g., kernelspec) of the original notebook
+    launcher = nbformat.v4.new_notebook()
+    launcher.metadata.update(notebook.metadata)
+    launcher.cells = cells
+    return module_source, launcher
+
+
+# The start of an exported module
+_HEADER = '''"""
+{module_name} - Forms of {source_name}
+
+Exported by widgetify; do not edit. Each form is built and displayed by its
+builder function, called with the namespace of the notebook to run it in.
+"""
+from widgetify.runtime import form
+
+
+'''
+
+# The function of a form, and its builder
+_BUILDER = '''{function}
+
+
+def build_form{form_id}(namespace):
+    return form({spec!r}, namespace=namespace)(form{form_id})
+'''
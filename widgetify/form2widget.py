@@ -6,8 +6,15 @@ notebooks and convert them into interactive ipywidgets that are compatible
 with Voilà, enabling easier deployment of Colab notebooks as web applications.
 
 The module parses Colab form parameters (annotated with `# @param` and
-`# @title`), generates corresponding ipywidgets code, and modifies the notebook
-accordingly.
+`# @title`) into a FormSpec, and replaces each form cell with a short cell
+that builds the widgets from the spec with `widgetify.runtime`.
+
+A dropdown with very many options can load them when the form is built
+instead of listing them in the notebook, with the ``options_source`` setting
+(see `runtime`); Colab shows such a parameter as a text box:
+::
+
+    ticker = "AAPL" # @param {type:"string", options_source:"file:tickers.txt"}
 
 Usage:
 
@@ -16,26 +23,51 @@ Example usage to convert a Colab notebook to Voilà-compatible widgets:
 
     from form2widget import widgetify
     widgetify('example_colab_forms.ipynb')
+
+In-memory notebooks and the bytes of notebook files are converted with
+`widgetify_notebook` and `widgetify_bytes`.
 """
 __author__ = "York <york.jong@gmail.com>"
-__date__ = "2024/09/19 (initial version) ~ 2024/09/22 (last revision)"
+__date__ = "2024/09/19 (initial version) ~ 2026/10/18 (last revision)"
 
 __all__ = [
     'widgetify',
+    'widgetify_notebook',
+    'widgetify_bytes',
 ]
 
-import ast
+import io
 import re
+import ast
+import json
+import builtins
 import logging
+import textwrap
+import tokenize
 
 import nbformat
 
+from . import nb_io
+from . import nb_pipeline
+from .scope import analyze_scope
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Placeholder for the form ID in cached cell conversions. A null character
+# cannot appear in Python source, so it never clashes with user code.
+_FORM_ID_MARK = '\0'
+
+# The imports of the prelude cell, each with the text that marks a converted
+# form cell as needing it
+_PRELUDE_IMPORTS = [
+    ('@form(', 'from widgetify.runtime import form'),
+]
 
-def widgetify(nb_filename):
+
+def widgetify(nb_filename, output_filename=None, cache=None,
+              strip_outputs=False, max_output_size=None):
     """Convert Colab Forms to Jupyter Widgets for Voilà compatibility.
 
     Extracts form parameters from code cells, generates ipywidgets code, and
@@ -44,13 +76,132 @@ def widgetify(nb_filename):
 
     Args:
         nb_filename (str): The path to the notebook file.
+        output_filename (str, optional): The path to write the converted
+            notebook to, leaving the source notebook untouched. Defaults to
+            None, which converts the notebook in place.
+        cache (cache.ConversionCache, optional): A cache of previous
+            conversions. A notebook that was converted before is restored
+            from the cache without parsing it, and unchanged form cells are
+            not regenerated. Defaults to None (no caching).
+        strip_outputs (bool, optional): Also strip stored outputs, execution
+            counts and widget state, as `nb_op.strip_outputs` does. Defaults
+            to False.
+        max_output_size (int, optional): With `strip_outputs`, keep outputs
+            up to this size in bytes. Defaults to None (remove all outputs).
+
+    Returns:
+        nb_op.PayloadReport: The payload report if outputs were stripped, or
+        None if they were not or the notebook was restored from the cache.
+    """
+    if output_filename is None:
+        output_filename = nb_filename
+    variant = f"strip:{max_output_size}" if strip_outputs else ''
+
+    if cache is not None:
+        with open(nb_filename, 'rb') as f:
+            nb_bytes = f.read()
+        converted_bytes = cache.get_notebook(nb_bytes, variant)
+        if converted_bytes is not None:
+            if converted_bytes != nb_bytes or output_filename != nb_filename:
+                nb_io.write_notebook_bytes(converted_bytes, output_filename)
+            logger.debug(f"{nb_filename}: restored from the cache")
+            return None
+
+    pipeline = nb_pipeline.NotebookPipeline(nb_filename)
+    pipeline.widgetify(cache=cache)
+    report = None
+    if strip_outputs:
+        report = pipeline.strip_outputs(max_output_size)
+    pipeline.save(output_filename)
+
+    if cache is not None:
+        with open(output_filename, 'rb') as f:
+            cache.put_notebook(nb_bytes, f.read(), variant)
+    return report
+
+
+def widgetify_notebook(notebook, cache=None, strip_outputs=False,
+                       max_output_size=None):
+    """Convert the Colab Forms of an in-memory notebook.
+
+    See `widgetify`. Cells are shared with the given notebook, which is
+    modified in place if outputs are stripped.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook to convert.
+        cache (cache.ConversionCache, optional): A cache of converted form
+            cells. Defaults to None (no caching).
+        strip_outputs (bool, optional): Also strip stored outputs, execution
+            counts and widget state. Defaults to False.
+        max_output_size (int, optional): With `strip_outputs`, keep outputs
+            up to this size in bytes. Defaults to None (remove all outputs).
+
+    Returns:
+        nbformat.NotebookNode: The converted notebook.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    pipeline = nb_pipeline.NotebookPipeline.from_notebook(notebook)
+    pipeline.widgetify(cache=cache)
+    if strip_outputs:
+        pipeline.strip_outputs(max_output_size)
+    return pipeline.notebook
+
+
+def widgetify_bytes(nb_bytes, cache=None, strip_outputs=False,
+                    max_output_size=None, **io_options):
+    """Convert the Colab Forms of the content of a notebook file.
+
+    See `widgetify`.
+
+    Args:
+        nb_bytes (bytes): The content of the notebook file.
+        cache (cache.ConversionCache, optional): A cache of previous
+            conversions. A notebook that was converted before is returned
+            from the cache without parsing it. Defaults to None (no caching).
+        strip_outputs (bool, optional): Also strip stored outputs, execution
+            counts and widget state. Defaults to False.
+        max_output_size (int, optional): With `strip_outputs`, keep outputs
+            up to this size in bytes. Defaults to None (remove all outputs).
+        **io_options: Options of `nb_io.read_notebook_bytes` and
+            `nb_io.notebook_to_bytes` (`trusted`, `json_backend`).
 
+    Returns:
+        bytes: The content of the converted notebook file; `nb_bytes` itself
+        if the notebook has nothing to convert.
+    """
+    variant = f"strip:{max_output_size}" if strip_outputs else ''
+    if cache is not None:
+        converted_bytes = cache.get_notebook(nb_bytes, variant)
+        if converted_bytes is not None:
+            return converted_bytes
+
+    pipeline = nb_pipeline.NotebookPipeline.from_bytes(nb_bytes,
+                                                       **io_options)
+    pipeline.widgetify(cache=cache)
+    if strip_outputs:
+        pipeline.strip_outputs(max_output_size)
+    converted_bytes = pipeline.to_bytes() if pipeline.modified else nb_bytes
+
+    if cache is not None:
+        cache.put_notebook(nb_bytes, converted_bytes, variant)
+    return converted_bytes
+
+
+def _widgetify(notebook, cache=None):
+    """Convert Colab Forms of an in-memory notebook.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook to convert.
+        cache (cache.ConversionCache, optional): A cache of converted form
+            cells.
+
+    Returns:
+        nbformat.NotebookNode: The converted notebook, or None if the notebook
+        contains no Colab Forms.
+    """
     new_cells = []
     form_id = 0
+    prelude_index = None
+    converted_sources = []
 
     for cell in notebook.cells:
         if cell.cell_type != 'code':
@@ -59,63 +210,272 @@ def widgetify(nb_filename):
             continue
 
         # Skip cells that don't contain Colab form parameters
-        if not re.search(r'.*=.*#\s*@param', cell.source):
+        if not _is_form_cell(cell.source):
             new_cells.append(cell)
             continue
 
         form_id += 1
+        if prelude_index is None:
+            prelude_index = len(new_cells)
+
+        updated_source = cache.get_cell(cell.source) if cache else None
+        if updated_source is None:
+            updated_source = _convert_form_cell(cell.source, _FORM_ID_MARK)
+            if cache:
+                cache.put_cell(cell.source, updated_source)
+        converted_sources.append(updated_source)
+        updated_source = updated_source.replace(_FORM_ID_MARK, str(form_id))
+        new_cells.append(nbformat.v4.new_code_cell(source=updated_source))
 
-        # Extract parameters from Colab form
-        form_params = extract_parameters(cell.source)
+    if not form_id:
+        return None
 
-        # Generate widgets code
-        widgets_code, update_code = generate_widgets(form_params, form_id)
+    # Import the modules once for all the forms, before the first one
+    new_cells.insert(prelude_index, _prelude_cell(converted_sources))
 
-        # Remove lines related to Colab form parameters and title
-        lines = [line for line
-                 in cell.source.splitlines()
-                 if '@param' not in line and '@title' not in line]
-        remaining_code = '\n        '.join(lines)
+    # Create a new notebook with the converted cells, keeping the metadata
+    # (e.g., kernelspec) of the original notebook
+    new_notebook = nbformat.v4.new_notebook()
+    new_notebook.metadata.update(notebook.metadata)
+    new_notebook.cells = new_cells
+    return new_notebook
 
-        # Extract global variables from the remaining code
-        global_vars = extract_global_vars('\n'.join(lines))
-        global_line = f"global {', '.join(global_vars)}" if global_vars else ""
 
-        # Combine widgets and remaining code into a new cell
-        updated_source = f"""
-import ipywidgets as widgets
-from IPython.display import display
-import pandas as pd
-from widgetify import create_input_dropdown
+def _prelude_cell(converted_sources):
+    """Create the code cell importing the modules used by converted forms.
 
-{widgets_code}
-submit_button{form_id} = widgets.Button(description="Submit")
-display(submit_button{form_id})
-voila_out{form_id} = widgets.Output()
-display(voila_out{form_id})
+    Only the imports that the forms actually use are included.
 
-def on_submit_clicked{form_id}(b):
-    # Get parameter values from widgets
-    {update_code}
+    Args:
+        converted_sources (list of str): The sources of the converted form
+            cells.
 
-    # Execute the remaining code
-    with voila_out{form_id}:
-        voila_out{form_id}.clear_output()
+    Returns:
+        nbformat.NotebookNode: The prelude code cell.
 
-        # Global variables
-        {global_line}
+    Examples:
+        >>> print(_prelude_cell(['@form({})\\ndef form1():\\n    pass']).source)
+        from widgetify.runtime import form
+    """
+    imports = [line for mark, line in _PRELUDE_IMPORTS
+               if any(mark in source for source in converted_sources)]
+    return nbformat.v4.new_code_cell(source='\n'.join(imports))
 
-        {remaining_code}
 
-submit_button{form_id}.on_click(on_submit_clicked{form_id})
-"""
-        new_cells.append(nbformat.v4.new_code_cell(source=updated_source))
+def _convert_form_cell(source, form_id):
+    """Convert the source of a Colab Form cell into a `runtime.form` call.
 
-    # Create a new notebook and write to the output file
-    new_notebook = nbformat.v4.new_notebook()
-    new_notebook.cells = new_cells
-    with open(nb_filename, 'w', encoding='utf-8') as f:
-        nbformat.write(new_notebook, f)
+    The form is described by its FormSpec, and the rest of the cell's code
+    becomes the body of the decorated function run on submit.
+
+    Args:
+        source (str): The source of the Colab Form cell.
+        form_id (int or str): The ID of the form.
+
+    Returns:
+        str: The source of the converted cell, without imports; they are in
+        the prelude cell created by `_prelude_cell`.
+
+    Examples:
+        >>> print(_convert_form_cell(
+        ...     'n = 1 # @param {"type":"integer"}\\ntotal = n + 1', 1))
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        @form({'fields': [{'name': 'n', 'type': 'integer', 'value': 1}],
+               'writes': ['total']})
+        def form1():
+            global total
+            total = n + 1
+    """
+    spec = extract_form_spec(source)
+    return f"@form({spec!r})\n{_form_function(source, form_id, spec)}"
+
+
+def _form_function(source, form_id, spec):
+    """Return the source of the function running the code of a form cell.
+
+    Args:
+        source (str): The source of the Colab Form cell.
+        form_id (int or str): The ID of the form.
+        spec (dict): The FormSpec of the form.
+
+    Returns:
+        str: The source of the function ``form{form_id}``.
+    """
+    # A cell using top-level await becomes a coroutine function, run as a
+    # task on the kernel's event loop
+    remaining_code = _remaining_code(source)
+    define = 'async def' if _uses_await(remaining_code) else 'def'
+
+    # The global variables written by the remaining code
+    if spec.get('writes'):
+        remaining_code = (f"global {', '.join(spec['writes'])}\n"
+                          f"{remaining_code}")
+    body = textwrap.indent(remaining_code.strip('\n'), '    ') or '    pass'
+
+    return f"{define} form{form_id}():\n{body}"
+
+
+def extract_form_spec(source_code):
+    """
+    Extract the FormSpec of a Colab form, as used by `runtime.form`.
+
+    Literal values are decoded; other values are kept as the source of an
+    expression (``expr``) evaluated when the form is built, so the spec is
+    JSON-serializable. The global variables the rest of the cell reads
+    (other than the form's own parameters) and writes are listed under
+    ``reads`` and ``writes``, if any, to link dependent forms; the variables
+    it mutates in place (e.g., ``df['x'] = n``) are also listed under
+    ``mutates``, and included in ``writes``. A form whose
+    `@title` has the ``{"run":"auto"}`` setting gets ``'run': 'auto'``.
+
+    Args:
+        source_code (str): The code of the Colab form cell.
+
+    Returns:
+        dict: The FormSpec, ``{'fields': [field, ...], 'reads': [name, ...],
+        'writes': [name, ...]}``.
+
+    Examples:
+        >>> extract_form_spec('stars = 5 # @param ["1","2","3"] {"type":"raw"}')
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        {'fields': [{'name': 'stars', 'type': 'raw', 'options': [1, 2, 3],
+                     'allow-input': False, 'value': 5}]}
+        >>> extract_form_spec('raw = 1+1 # @param {"type":"raw"}')
+        {'fields': [{'name': 'raw', 'type': 'raw', 'expr': '1+1'}]}
+        >>> extract_form_spec('t = "AAPL" # @param '
+        ...                   '{"options_source":"file:tickers.txt"}')
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        {'fields': [{'name': 't', 'type': 'string',
+                     'options_source': 'file:tickers.txt',
+                     'allow-input': False, 'value': 'AAPL'}]}
+        >>> extract_form_spec('# @title T {"run":"auto"}\\n'
+        ...                   'b = True # @param {"type":"boolean"}')
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        {'fields': [{'name': 'b', 'type': 'boolean', 'value': True}],
+         'run': 'auto'}
+        >>> extract_form_spec('k = 2 # @param {"type":"integer"}\\ny = k * x')
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        {'fields': [{'name': 'k', 'type': 'integer', 'value': 2}],
+         'reads': ['x'], 'writes': ['y']}
+        >>> extract_form_spec('n = 1 # @param {"type":"integer"}\\ndf[0] = n')
+        ...                         # doctest: +NORMALIZE_WHITESPACE
+        {'fields': [{'name': 'n', 'type': 'integer', 'value': 1}],
+         'reads': ['df'], 'writes': ['df'], 'mutates': ['df']}
+    """
+    fields = []
+    for name, param in extract_parameters(source_code).items():
+        field = {'name': name, 'type': param['type']}
+        if 'options' in param:
+            options = param['options']
+            if param['type'] == 'raw':
+                options = [opt.strip('"').strip("'") for opt in options]
+            field['options'] = [_literal_value(opt, opt) for opt in options]
+            field['allow-input'] = param['allow-input']
+        elif 'options_source' in param:
+            field['options_source'] = param['options_source']
+            field['allow-input'] = param['allow-input']
+        elif param['type'] == 'slider':
+            for key in ('min', 'max', 'step'):
+                field[key] = _literal_value(param[key], param[key])
+        value = _literal_value(param['value'])
+        if value is _NOT_LITERAL:
+            field['expr'] = param['value']
+        else:
+            field['value'] = value
+        fields.append(field)
+    spec = {'fields': fields}
+    if _title_settings(source_code).get('run') == 'auto':
+        spec['run'] = 'auto'
+
+    code = _remaining_code(source_code)
+    reads = (extract_read_vars(code) - {field['name'] for field in fields}
+             - set(dir(builtins)))
+    mutates = set(analyze_scope(code).mutates)
+    writes = extract_global_vars(code) | mutates
+    if reads:
+        spec['reads'] = sorted(reads)
+    if writes:
+        spec['writes'] = sorted(writes)
+    if mutates:
+        spec['mutates'] = sorted(mutates)
+    return spec
+
+
+def _parse(code):
+    """Parse code into an AST, allowing top-level `await`, `async for` and
+    `async with` as IPython does.
+    """
+    flags = ast.PyCF_ONLY_AST | getattr(ast, 'PyCF_ALLOW_TOP_LEVEL_AWAIT', 0)
+    return compile(code, '<cell>', 'exec', flags)
+
+
+def _uses_await(code):
+    """Return True if code uses `await`, `async for`, `async with` or an
+    async comprehension outside of function definitions.
+
+    Examples:
+        >>> _uses_await('data = await fetch()')
+        True
+        >>> _uses_await('async def f():\\n    await g()')
+        False
+    """
+    nodes = [_parse(code)]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.Await, ast.AsyncFor, ast.AsyncWith)):
+            return True
+        if isinstance(node, ast.comprehension) and node.is_async:
+            return True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                             ast.Lambda, ast.ClassDef)):
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _title_settings(source):
+    """Return the settings of the `@title` line of a form cell, e.g.,
+    ``{"run":"auto"}``, or an empty dict.
+    """
+    for line in source.splitlines():
+        if '@title' not in line:
+            continue
+        _, _, title = line.partition('@title')
+        start = title.find('{')
+        if start < 0:
+            break
+        settings, _ = _decode_json(title[start:])
+        if isinstance(settings, dict):
+            return settings
+        break
+    return {}
+
+
+def _remaining_code(source):
+    """Return the code of a form cell without its `@param` and `@title` lines.
+    """
+    return '\n'.join(line for line in source.splitlines()
+                     if '@param' not in line and '@title' not in line)
+
+
+# Returned by `_literal_value` for a source that is not a JSON literal
+_NOT_LITERAL = object()
+
+
+def _literal_value(source, default=_NOT_LITERAL):
+    """Decode the source of a literal whose value is JSON-serializable.
+
+    Returns:
+        The value, or `default` if the source is not such a literal.
+    """
+    try:
+        value = ast.literal_eval(source.strip())
+    except (ValueError, SyntaxError, TypeError, MemoryError,
+            RecursionError):
+        return default
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return default
 
 
 def extract_parameters(source_code):
@@ -152,75 +512,261 @@ def extract_parameters(source_code):
                    'options': ['"1"', '"2"', '"3"', '"4"', '"5"'],
                    'value': '5', 'allow-input': False}}
     """
-    assign_pat = re.compile(
-        r'(?P<name>.+?)\s*=\s*(?P<value>.+?)\s*(#\s*@param.*)?$')
-    options_pat = re.compile(r'#\s*@param\s*\[(.*)\]')
-    type_pat = re.compile(
-        r'#\s*@param.*\{\s*(?:type|"type")\s*:\s*"([^"]+)"\s*(?:,|})')
-    slider_pat = re.compile(
-        r'#\s*@param\s*\{\s*"type"\s*:\s*"slider"\s*,'
-        r'\s*"min"\s*:(.*),\s*"max"\s*:(.*),\s*"step"\s*:(.*)\}')
-    allow_input_pat = re.compile(
-        r'#\s*@param.*\{\s*'
-        r'(?:allow-input|"allow-input")\s*:\s*(true|false)\s*\}')
-
     form_params = {}
-    for line in source_code.splitlines():
-        # Check if the line contains an '=' and '# @param'
-        assign_match = assign_pat.search(line)
-        if not assign_match:
-            continue
-
-        # Extract the variable name and value part
-        name = assign_match.group('name').strip()
-        value = assign_match.group('value').strip()
-        value = value.replace('"', "'")
-
+    for name, value, annotation in _iter_param_lines(source_code):
         # Replace leading and trailing single quotes with double quotes
-        value = re.sub(r"^'|'$", '"', value)
+        value = _normalize_quotes(value)
 
-        options_match = options_pat.search(line)
-        type_match = type_pat.search(line)
-        if not options_match:
-            slider_match = slider_pat.search(line)
-
-        if options_match:
-            allow_input_match = allow_input_pat.search(line)
-
-            options = [opt.strip() for opt in options_match.group(1).split(",")]
-            options = [opt.replace('"', "'") for opt in options]
-
-            # Replace leading and trailing single quotes with double quotes
-            options = [re.sub(r"^'|'$", '"', opt) for opt in options]
-
-            type_name = type_match.group(1) if type_match else "string"
+        options, settings = _decode_annotation(annotation)
+        if options is not None:
             form_params[name] = {
-                "type": type_name,
-                "options": options,
+                "type": settings.get("type", "string"),
+                "options": [_literal_source(opt) for opt in options],
                 "value": value,
-                "allow-input": allow_input_match.group(1) == 'true'
-                    if allow_input_match else False,
+                "allow-input": settings.get("allow-input") is True,
             }
-            logger.info(f"form_params[{name}]: {form_params[name]}")
-        elif slider_match:
+        elif "options_source" in settings:
+            form_params[name] = {
+                "type": settings.get("type", "string"),
+                "options_source": settings["options_source"],
+                "value": value,
+                "allow-input": settings.get("allow-input") is True,
+            }
+        elif settings.get("type") == "slider":
             form_params[name] = {
                 "type": "slider",
-                "min": slider_match.group(1),
-                "max": slider_match.group(2),
-                "step": slider_match.group(3),
+                "min": _literal_source(settings.get("min", 0)),
+                "max": _literal_source(settings.get("max", 100)),
+                "step": _literal_source(settings.get("step", 1)),
                 "value": value,
             }
-            logger.info(f"form_params[{name}]: {form_params[name]}")
-        elif type_match:    # input box
+        elif "type" in settings:    # input box
             form_params[name] = {
-                "type": type_match.group(1),
+                "type": settings["type"],
                 "value": value,
             }
-            logger.info(f"form_params[{name}]: {form_params[name]}")
+        else:
+            continue
+        logger.info(f"form_params[{name}]: {form_params[name]}")
 
     return form_params
 
 
+# Matches the start of a Colab form parameter comment
+_param_comment_pat = re.compile(r'#\s*@param')
+
+# Matches an unquoted key of a JSON-like object, e.g., {allow-input: true}
+_bare_key_pat = re.compile(r'([{,]\s*)([A-Za-z_][\w-]*)(\s*:)')
+
+
+def _is_form_cell(source_code):
+    """Check if the code contains a Colab form parameter line, i.e., an
+    assignment followed by a `# @param` comment.
+
+    This scans each line once with plain string operations, so it stays
+    linear in the length of the code.
+
+    Examples:
+        >>> _is_form_cell('x = 1 # @param {"type":"integer"}')
+        True
+        >>> _is_form_cell('# @param x = 1')
+        False
+    """
+    if '@param' not in source_code:
+        return False
+    for line in source_code.splitlines():
+        i = line.find('@param')
+        if i < 0:
+            continue
+        j = line.rfind('#', 0, i)
+        if j > 0 and '=' in line[:j] and not line[j + 1:i].strip():
+            return True
+    return False
+
+
+def _iter_param_lines(source_code):
+    """Yield ``(name, value, annotation)`` for each Colab form parameter.
+
+    The code is tokenized once. For each `# @param` comment that follows an
+    assignment, `name` and `value` are the source text on either side of the
+    first top-level ``=``, and `annotation` is the comment text after
+    ``@param``. If the code cannot be tokenized as a whole (e.g., it contains
+    an unterminated string), the lines with `@param` are tokenized one by
+    one instead.
+    """
+    try:
+        yield from list(_tokenize_param_lines(source_code))
+    except (tokenize.TokenError, SyntaxError):
+        for line in source_code.splitlines():
+            if '@param' not in line:
+                continue
+            try:
+                yield from list(_tokenize_param_lines(line))
+            except (tokenize.TokenError, SyntaxError):
+                logger.warning(f"Unable to parse the line: {line}")
+
+
+def _tokenize_param_lines(source_code):
+    lines = source_code.splitlines(keepends=True)
+    stmt_start = None       # position of the first token of the statement
+    assign = None           # the first top-level '=' token of the statement
+    depth = 0               # nesting level of brackets
+
+    for token in tokenize.generate_tokens(io.StringIO(source_code).readline):
+        if token.type == tokenize.NEWLINE or (
+                token.type == tokenize.NL and depth == 0):
+            stmt_start = assign = None
+            continue
+        if token.type in (tokenize.NL, tokenize.INDENT, tokenize.DEDENT,
+                          tokenize.ENDMARKER):
+            continue
+        if token.type == tokenize.COMMENT:
+            match = _param_comment_pat.match(token.string)
+            if match and assign and depth == 0:
+                name = _source_slice(lines, stmt_start, assign.start)
+                value = _source_slice(lines, assign.end, token.start)
+                yield (name.strip(), value.strip(),
+                       token.string[match.end():])
+            continue
+
+        if stmt_start is None:
+            stmt_start = token.start
+        if token.type == tokenize.OP:
+            if token.string in '([{':
+                depth += 1
+            elif token.string in ')]}':
+                depth -= 1
+            elif token.string == '=' and depth == 0 and assign is None:
+                assign = token
+
+
+def _source_slice(lines, start, end):
+    """Return the source text between two ``(row, col)`` token positions.
+    """
+    (start_row, start_col), (end_row, end_col) = start, end
+    if start_row == end_row:
+        return lines[start_row - 1][start_col:end_col]
+    return (lines[start_row - 1][start_col:] +
+            ''.join(lines[start_row:end_row - 1]) +
+            lines[end_row - 1][:end_col])
+
+
+def _decode_annotation(annotation):
+    """Decode the text after `@param` into an options list and a settings
+    dict, e.g., ``["a","b"] {"allow-input":true}``.
+
+    Returns:
+        tuple: ``(options, settings)``; `options` is None if the annotation
+        has no option list.
+
+    Examples:
+        >>> _decode_annotation(' ["a, b","c"] {allow-input: true}')
+        (['a, b', 'c'], {'allow-input': True})
+        >>> _decode_annotation(" ['a', 'b'] {allow-input: true}")
+        (['a', 'b'], {'allow-input': True})
+        >>> _decode_annotation(' {"type":"slider","min":0,"max":9,"step":1}')
+        (None, {'type': 'slider', 'min': 0, 'max': 9, 'step': 1})
+    """
+    text = annotation.strip()
+    options = None
+    if text.startswith('['):
+        options, end = _decode_json(text)
+        if not isinstance(options, list):
+            options = None
+        text = text[end:].strip()
+    settings = {}
+    if text.startswith('{'):
+        settings, _ = _decode_json(text)
+        if not isinstance(settings, dict):
+            settings = {}
+    return options, settings
+
+
+def _decode_json(text):
+    """Decode the JSON value at the start of the text.
+
+    Python literals, as in ``['a', 'b']``, and unquoted object keys, as in
+    ``{type: "raw"}``, are also accepted.
+
+    Returns:
+        tuple: ``(value, end)``, where `end` is the index in `text` where the
+        value ends; `value` is None if the text cannot be decoded.
+
+    Examples:
+        >>> _decode_json("['a', 'b'] {allow-input: true}")
+        (['a', 'b'], 10)
+    """
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(text)
+    except ValueError:
+        pass
+    try:
+        return _decode_literal(text)
+    except (ValueError, SyntaxError, tokenize.TokenError):
+        pass
+    try:
+        value, _ = decoder.raw_decode(_bare_key_pat.sub(r'\1"\2"\3', text))
+    except ValueError:
+        logger.warning(f"Unable to decode the annotation: {text}")
+        return None, len(text)
+    # The end index is that of the quoted text; skip the rest of the text
+    return value, len(text)
+
+
+def _decode_literal(text):
+    """Decode the Python literal in the brackets at the start of the text.
+
+    Returns:
+        tuple: ``(value, end)``, where `end` is the index in `text` where the
+        literal ends.
+
+    Raises:
+        ValueError: If the text does not start with a bracketed literal.
+    """
+    depth = 0
+    for token in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token.type != tokenize.OP:
+            continue
+        if token.string in '([{':
+            depth += 1
+        elif token.string in ')]}':
+            depth -= 1
+            if depth == 0:
+                # The annotation is a single line
+                end = token.end[1]
+                return ast.literal_eval(text[:end]), end
+    raise ValueError(f"Unterminated literal: {text}")
+
+
+def _normalize_quotes(text):
+    """Replace double quotes with single quotes, then the leading and
+    trailing single quotes with double quotes.
+
+    Examples:
+        >>> _normalize_quotes("'ABC'")
+        '"ABC"'
+    """
+    text = text.replace('"', "'")
+    if text.startswith("'"):
+        text = '"' + text[1:]
+    if text.endswith("'"):
+        text = text[:-1] + '"'
+    return text
+
+
+def _literal_source(value):
+    """Return the Python source of a decoded JSON value.
+
+    Examples:
+        >>> _literal_source("Lunch"), _literal_source(1.5)
+        ('"Lunch"', '1.5')
+    """
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return repr(value)
+
+
 def generate_widgets(form_params, form_id=""):
     r"""
     Generate ipywidgets code from the extracted form parameters.
@@ -263,7 +809,8 @@ def generate_widgets(form_params, form_id=""):
                         f"step={content['step']}, value={value}, "
                         f"description='{name}'")
             elif content['type'] == 'date':
-                params = f"value=pd.to_datetime({value}), description='{name}'"
+                params = (f"value=datetime.datetime.strptime({value}, '%Y-%m-%d')"
+                          f".date(), description='{name}'")
             elif content['type'] == 'raw':
                 params = f"value=str({value}), description='{name}'"
             elif content['type'] in (
@@ -291,7 +838,10 @@ def extract_global_vars(code):
     """
     Extracts global variable names from a given block of Python code. This
     function parses the code, identifies any variables declared as global or
-    assigned at the top level, and returns their names as a set.
+    bound at the top level, and returns their names as a set.
+
+    Names bound inside functions, classes and comprehensions are local, and
+    not included. See `scope.analyze_scope`.
 
     Args:
         code (str): A string containing Python code from which global variables
@@ -299,24 +849,34 @@ def extract_global_vars(code):
 
     Returns:
         set: A set of global variable names found in the provided code.
+
+    Examples:
+        >>> sorted(extract_global_vars(
+        ...     'x += 1\\nfor i, j in p: pass\\ndef f():\\n    y = 1'))
+        ['f', 'i', 'j', 'x']
+    """
+    return set(analyze_scope(code).writes)
+
+
+def extract_read_vars(code):
     """
-    global_vars = set()
+    Extract the names of the global variables read by a block of Python
+    code.
 
-    class GlobalVarVisitor(ast.NodeVisitor):
-        def visit_Global(self, node):
-            global_vars.update(node.names)
+    Names loaded in functions are included unless they are local variables
+    of the function. Builtins are included. See `scope.analyze_scope`.
 
-    class AssignVisitor(ast.NodeVisitor):
-        def visit_Assign(self, node):
-            for target in node.targets:
-                if isinstance(target, ast.Name):
-                    global_vars.add(target.id)
+    Args:
+        code (str): A string containing Python code.
 
-    tree = ast.parse(code)
-    GlobalVarVisitor().visit(tree)
-    AssignVisitor().visit(tree)
+    Returns:
+        set: A set of variable names read by the code.
 
-    return global_vars
+    Examples:
+        >>> sorted(extract_read_vars('y = f(x)\\nprint(y)'))
+        ['f', 'print', 'x', 'y']
+    """
+    return set(analyze_scope(code).reads)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,22 @@
 """
 input_dropbox - Creating Jupyter Widgets with user input capability.
 
-This module provides a function `create_input_dropdown` to create an
-interactive Jupyter Widget that mimics the behavior of a Colab Form dropdown
-with user input enabled. The widget includes both a dropdown menu and an input
-box, allowing users to select from a list of options or type their own input,
-which is reflected in both the dropdown and the input box.
+This module provides the `InputDropdown` widget, and the function
+`create_input_dropdown` creating it, an interactive Jupyter Widget that mimics
+the behavior of a Colab Form dropdown with user input enabled. The widget
+includes both a dropdown menu and an input box, allowing users to select from
+a list of options or type their own input, which is reflected in both the
+dropdown and the input box.
+
+The input box sends its value to the kernel only when the input is committed
+(on Enter or when the box loses focus), so typing costs no comm traffic, and
+the options of the dropdown are sent again only when a new value is typed.
+
+For very large option lists, the options can be given as an `OptionIndex`,
+which loads them lazily from a list, an iterable, a callable or a text file,
+and keeps them sorted in the kernel. The dropdown then holds only the first
+matches of the text typed in the input box, so the comm traffic of loading
+the widget and of each keystroke does not grow with the number of options.
 
 Usage:
     Import this module and call `create_input_dropdown` to generate a widget
@@ -30,14 +41,260 @@ Example:
     print(dropdown.value)
 """
 __author__ = "York <york.jong@gmail.com>"
-__date__ = "2024/09/19 (initial version) ~ 2024/09/19 (last revision)"
+__date__ = "2024/09/19 (initial version) ~ 2026/10/18 (last revision)"
 
 __all__ = [
+    'InputDropdown',
+    'OptionIndex',
     'create_input_dropdown',
 ]
 
+import os
+import bisect
+import contextlib
+
+import traitlets
 import ipywidgets as widgets
 
+# The number of matches shown by an indexed dropdown
+_MAX_MATCHES = 20
+
+
+class OptionIndex:
+    """A sorted, lazily loaded index of options for prefix search.
+
+    Matching is case-insensitive, on the string form of the options.
+
+    Args:
+        source: The options, as a list or any iterable, a callable returning
+            an iterable, or the path to a text file with one option per line.
+            The source is read on first use.
+
+    Examples:
+        >>> index = OptionIndex(lambda: ['MSFT', 'AAPL', 'AMZN', 'GOOG'])
+        >>> index.matches('a', 5)
+        ['AAPL', 'AMZN']
+        >>> len(index), 'GOOG' in index, 'goog' in index
+        (4, True, False)
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._keys = None
+        self._options = None
+
+    def _load(self):
+        if self._options is not None:
+            return
+        source = self._source
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'r', encoding='utf-8') as f:
+                options = [line.rstrip('\r\n') for line in f if line.strip()]
+        else:
+            options = list(source() if callable(source) else source)
+        keyed = sorted((str(option).casefold(), i)
+                       for i, option in enumerate(options))
+        self._keys = [key for key, _ in keyed]
+        self._options = [options[i] for _, i in keyed]
+        self._source = None
+
+    def __len__(self):
+        self._load()
+        return len(self._options)
+
+    def __iter__(self):
+        self._load()
+        return iter(self._options)
+
+    def __contains__(self, value):
+        self._load()
+        key = str(value).casefold()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._options[i] == value:
+                return True
+            i += 1
+        return False
+
+    def matches(self, prefix, n=_MAX_MATCHES):
+        """Return the first options starting with a prefix.
+
+        Args:
+            prefix (str): The prefix; an empty prefix matches all options.
+            n (int, optional): The maximum number of matches.
+
+        Returns:
+            list: The matching options, in sorted order.
+        """
+        self._load()
+        key = prefix.casefold()
+        i = bisect.bisect_left(self._keys, key)
+        matches = []
+        while (len(matches) < n and i < len(self._keys) and
+               self._keys[i].startswith(key)):
+            matches.append(self._options[i])
+            i += 1
+        return matches
+
+
+class InputDropdown(widgets.HBox):
+    """A dropdown with an input box for values that are not among the
+    options, like a Colab Form dropdown with the `{"allow-input": true}`
+    setting.
+
+    A committed input that is not an option is added as the first option of
+    the dropdown, replacing the previous one, and selected.
+
+    Given an `OptionIndex` (or `max_options`), the dropdown is indexed: the
+    input box sends each keystroke, and the dropdown shows the selected value
+    and the first `max_options` options starting with the input; an input
+    equal to an option selects it.
+
+    Args:
+        options (list or OptionIndex): The options of the dropdown.
+        value (optional): The initial value, which should be one of the
+            options. Defaults to None (no selection).
+        description (str, optional): The label of the dropdown.
+        layout (widgets.Layout, optional): The layout of the dropdown and the
+            input box. Defaults to a layout with width set to 'auto'.
+        max_options (int, optional): The number of matches shown by an
+            indexed dropdown. Defaults to 20 for an `OptionIndex`, and to None
+            (not indexed) for a list.
+        allow_input (bool, optional): Whether an input that is not an option
+            can be selected. Defaults to True.
+        **kwargs: Other arguments of `ipywidgets.HBox`.
+
+    Attributes:
+        value: The selected value.
+        dropdown (widgets.Dropdown): The dropdown.
+        input_box (widgets.Text): The input box.
+        index (OptionIndex): The index of the options if the dropdown is
+            indexed, or None.
+
+    Examples:
+        >>> widget = InputDropdown(['a', 'b'], 'a', 'x')
+        >>> widget.input_box.value = 'c'
+        >>> widget.value, widget.dropdown.options
+        ('c', ('c', 'a', 'b'))
+        >>> widget.value = 'b'
+        >>> widget.input_box.value, widget.dropdown.options
+        ('b', ('c', 'a', 'b'))
+        >>> widget = InputDropdown([f'x{i}' for i in range(1000)], 'x7',
+        ...                        max_options=3, allow_input=False)
+        >>> widget.input_box.value = 'x99'
+        >>> widget.value, widget.dropdown.options
+        ('x99', ('x99', 'x990', 'x991'))
+        >>> widget.input_box.value = 'x1z'
+        >>> widget.value, widget.dropdown.options
+        ('x99', ('x99',))
+    """
+
+    value = traitlets.Any(None, allow_none=True)
+
+    def __init__(self, options, value=None, description='', layout=None,
+                 max_options=None, allow_input=True, **kwargs):
+        if layout is None:
+            layout = widgets.Layout(width='auto')
+        if isinstance(options, OptionIndex) or max_options is not None:
+            self.index = (options if isinstance(options, OptionIndex)
+                          else OptionIndex(options))
+            self.max_options = max_options or _MAX_MATCHES
+            if value not in self.index:
+                value = None
+            self._options = self.index.matches('', self.max_options)
+            if value is not None and value not in self._options:
+                self._options.insert(0, value)
+        else:
+            self.index = None
+            self.max_options = None
+            self._options = list(options)
+            if value not in self._options:
+                value = None
+        self.allow_input = allow_input
+        self._filtering = False
+        self.dropdown = widgets.Dropdown(
+            options=self._options,
+            value=value,
+            description=description,
+            layout=layout,
+        )
+        self.input_box = widgets.Text(
+            description='',
+            placeholder='Type to Input',
+            continuous_update=self.index is not None,
+            layout=layout,
+        )
+        super().__init__([self.dropdown, self.input_box], **kwargs)
+        self.value = self.dropdown.value
+        if self.value is not None:
+            self.input_box.value = str(self.value)
+        self.dropdown.observe(self._on_select, names='value')
+        self.input_box.observe(self._on_input, names='value')
+
+    @traitlets.observe('value')
+    def _on_value(self, change):
+        self._select(change['new'])
+
+    def _on_select(self, change):
+        """Update the value and the input box to the selected option."""
+        if self._filtering:
+            return
+        selected = change['new']
+        self.value = selected
+        if selected is not None:
+            # Options of a "raw" param may be numbers; the input box takes str
+            self.input_box.value = str(selected)
+
+    def _on_input(self, change):
+        """Select the committed input, adding it to the options if needed."""
+        text = change['new']
+        selected = (text and text != str(self.dropdown.value) and
+                    (self.allow_input or self._is_option(text)))
+        if self.index is not None:
+            self._show_matches(text, text if selected else
+                               self.dropdown.value)
+        elif selected:
+            self._select(text)
+
+    def _is_option(self, value):
+        if self.index is not None:
+            return value in self.index
+        return value in self._options
+
+    def _show_matches(self, text, value):
+        """Select a value, and show it and the first options matching a text
+        in the dropdown of an indexed dropdown, in one update of each.
+        """
+        matches = self.index.matches(text, self.max_options)
+        if value is not None and value not in matches:
+            matches.insert(0, value)
+        self._options = matches
+        if tuple(matches) != self.dropdown.options:
+            # Changing the options may reset the selection
+            with self._filter():
+                self.dropdown.options = matches
+                self.dropdown.value = value
+        self.dropdown.value = value
+        self.value = value
+
+    @contextlib.contextmanager
+    def _filter(self):
+        self._filtering = True
+        try:
+            yield
+        finally:
+            self._filtering = False
+
+    def _select(self, value):
+        if value is not None and value not in self.dropdown.options:
+            if not (self.allow_input or self._is_option(value)):
+                raise traitlets.TraitError(
+                    f"Invalid selection: {value!r} is not an option")
+            # Send the options only when they change
+            self.dropdown.options = [value] + [
+                option for option in self._options if option != value]
+        self.dropdown.value = value
+
 
 def create_input_dropdown(options, value, description,
                           layout=widgets.Layout(width='auto')):
@@ -56,55 +313,6 @@ def create_input_dropdown(options, value, description,
             with width set to 'auto'.
 
     Returns:
-        widget_box (HBox): An HBox containing the dropdown and an input box,
-        with a value property to get/set the dropdown value.
+        InputDropdown: The widget, whose `value` is the selected value.
     """
-    dropdown = widgets.Dropdown(
-        options=options,
-        value=value if value in options else None,
-        description=description,
-        layout=layout,
-    )
-    input_box = widgets.Text(
-        description='',
-        placeholder='Type to Input',
-        layout=layout,
-    )
-
-    def update_dropdown(change, dropdown, options):
-        '''Update the options in the dropdown based on search input'''
-        input = change['new']
-        if input not in options:
-            dropdown.options = [input] + options
-        dropdown.value = input
-
-    def update_input_box(change, input_box):
-        '''Update the search box based on the selected option in the dropdown'''
-        selected = change['new']
-        if selected:
-            input_box.value = selected
-
-    input_box.observe(lambda change:
-                       update_dropdown(change, dropdown, options),
-                       names='value')
-    dropdown.observe(lambda change:
-                     update_input_box(change, input_box),
-                     names='value')
-
-    widget_box = widgets.HBox([dropdown, input_box])
-
-    # Define the property getter for value
-    @property
-    def value(self):
-        return self.children[0].value
-
-    # Define the property setter for value
-    @value.setter
-    def value(self, new_value):
-        self.children[0].value = new_value
-
-    # Patch the widget_box to have the value property
-    type(widget_box).value = value
-
-    return widget_box
-
+    return InputDropdown(options, value, description, layout)
@@ -0,0 +1,165 @@
+"""
+metrics - Usage and Latency Metrics of Forms
+
+This module provides `FormMetrics`, which the forms of `widgetify.runtime`
+use to record how they are used: the number of submits, the number of runs
+(including the reactive re-runs of dependent forms), the latency
+distribution of the runs, the number of failed and cancelled runs, and the
+time of the last run. Each run can also be appended as a JSON line to a log
+file, to be analyzed outside the kernel.
+
+Usage:
+::
+
+    from widgetify import runtime
+
+    runtime.set_options(metrics_log='form_metrics.jsonl')
+    ...
+    runtime.metrics()   # {'form1': {'submits': 3, 'runs': 3, ...}, ...}
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'FormMetrics',
+]
+
+import json
+import math
+import time
+import logging
+import threading
+import collections
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The number of latest latencies kept for the distribution
+_MAX_SAMPLES = 1024
+
+# Serializes the writes to the log files of all forms
+_log_lock = threading.Lock()
+
+
+class FormMetrics:
+    """The usage and latency metrics of a form.
+
+    Args:
+        name (str): The name of the form.
+        log (str, optional): The path to a JSON lines file to append each run
+            to. Defaults to None (no log).
+
+    Attributes:
+        name (str): The name of the form.
+        log (str): The path to the JSON lines log file, or None.
+        submits (int): The number of submits.
+        runs (int): The number of runs.
+        errors (int): The number of runs that raised an exception.
+        cancelled (int): The number of runs that were cancelled.
+        last_run (float): The time the last run ended, in seconds since the
+            epoch, or None.
+        latencies (collections.deque): The durations in seconds of the latest
+            runs.
+
+    Examples:
+        >>> metrics = FormMetrics('form1')
+        >>> metrics.record_submit()
+        >>> for latency in (0.1, 0.2, 0.3, 0.4):
+        ...     metrics.record_run(latency, 'ok')
+        >>> metrics.record_run(0.5, 'error')
+        >>> summary = metrics.summary()
+        >>> summary['submits'], summary['runs'], summary['errors']
+        (1, 5, 1)
+        >>> summary['p50'], summary['max']
+        (0.3, 0.5)
+    """
+
+    def __init__(self, name, log=None):
+        self.name = name
+        self.log = log
+        self.submits = 0
+        self.runs = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.last_run = None
+        self.latencies = collections.deque(maxlen=_MAX_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record_submit(self):
+        """Count a submit of the form.
+        """
+        with self._lock:
+            self.submits += 1
+
+    def record_run(self, latency, status):
+        """Record a run of the form.
+
+        Args:
+            latency (float): The duration of the run in seconds.
+            status (str): ``'ok'``, ``'error'`` or ``'cancelled'``.
+        """
+        now = time.time()
+        with self._lock:
+            self.runs += 1
+            if status == 'error':
+                self.errors += 1
+            elif status == 'cancelled':
+                self.cancelled += 1
+            self.last_run = now
+            self.latencies.append(latency)
+        if self.log:
+            self._write_log({'form': self.name, 'time': now,
+                             'latency': latency, 'status': status})
+
+    @property
+    def since_last_run(self):
+        """float: The seconds since the last run ended, or None if the form
+        never ran.
+        """
+        if self.last_run is None:
+            return None
+        return time.time() - self.last_run
+
+    def percentile(self, p):
+        """Return a percentile of the latest latencies.
+
+        Args:
+            p (float): The percentile, from 0 to 100.
+
+        Returns:
+            float: The latency in seconds (nearest rank), or None if the form
+            never ran.
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        rank = math.ceil(p / 100 * len(latencies))
+        return latencies[min(max(rank, 1), len(latencies)) - 1]
+
+    def summary(self):
+        """Return the metrics as a JSON-serializable dict.
+
+        Returns:
+            dict: The counts, the mean, p50, p90, p99 and max latencies in
+            seconds, and the seconds since the last run.
+        """
+        with self._lock:
+            latencies = list(self.latencies)
+            summary = {'submits': self.submits, 'runs': self.runs,
+                       'errors': self.errors, 'cancelled': self.cancelled}
+        summary['mean'] = (sum(latencies) / len(latencies)
+                           if latencies else None)
+        for p in (50, 90, 99):
+            summary[f'p{p}'] = self.percentile(p)
+        summary['max'] = max(latencies, default=None)
+        summary['since_last_run'] = self.since_last_run
+        return summary
+
+    def _write_log(self, record):
+        try:
+            with _log_lock, open(self.log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError:
+            logger.exception(f"Cannot write the metrics of {self.name}")
@@ -5,24 +5,197 @@ This module provides functionality to execute Jupyter notebook code cells
 programmatically. It offers the ability to run code cells in a notebook,
 handling shell commands, IPython magic commands, and standard Python code.
 
+Each cell is translated into Python by IPython's input transformers (so
+``!`` and ``%`` lines, cell magics and indentation are handled as in a
+notebook), compiled once, and cached by a hash of its source; running the
+same cells again costs no compile time. The cells run in the caller's
+namespace, by default the namespace of the IPython user (or `__main__`).
+
+With ``parallel=True``, `run_code_cells` analyzes the variables each cell
+reads and writes, builds a dependency graph, and runs independent cells
+concurrently on a bounded thread pool. An item or attribute assignment
+(``d['a'] = 1``) and a method call (``df.update(other)``) count as writes of
+their variable, unless it is an imported module. A call of a function
+defined in the notebook reads and writes the globals the function (or a
+function it calls) reads, declares ``global`` or mutates. A mutation through
+another name, such as a function argument (``fill(df)``), and a call of a
+method defined in the notebook (``loader.load()``) are not detected. Shell and
+magic lines may change anything, so a cell containing them waits for all the
+cells before it and blocks all the cells after it, unless the cell declares
+the files (or packages) its commands read and write with comments:
+::
+
+    !wget -q https://example.com/data.zip  # @writes data.zip
+    # @reads data.zip
+    # @writes data/
+
+Shell commands (``!`` lines) run in a subprocess, whose standard output and
+error are streamed line by line to the current output, or to a given widget
+`Output`, while the command runs. A command can be given a timeout, after
+which it is killed, and its exit status and duration are returned as a
+`ShellResult`.
+
+Given a `nb_profile.Profiler`, the cells are run chunk by chunk (each run of
+Python statements, each shell command and each magic), and the wall time,
+CPU time and peak memory of each cell and chunk are recorded.
+
 Usage:
     The module is intended to work with Jupyter notebooks, allowing for the
     programmatic execution of code cells, either individually or in batches.
+::
+
+    from widgetify import nb_exec, nb_op
+
+    section = nb_op.extract_section(nb_filename, 'Install Required Packages')
+    nb_exec.run_code_cells(section)
 """
 __author__ = "York <york.jong@gmail.com>"
-__date__ = "2024/09/19 (initial version) ~ 2024/09/19 (last revision)"
+__date__ = "2024/09/19 (initial version) ~ 2026/10/18 (last revision)"
 
 __all__ = [
     'run_code_cells',
     'run_code_cell',
+    'compile_cell',
+    'compile_chunks',
+    'ScheduleReport',
+    'CellTiming',
+    'run_shell',
+    'ShellResult',
 ]
 
 import os
+import re
+import ast
+import sys
+import time
+import queue
+import signal
+import hashlib
+import linecache
+import functools
+import threading
+import subprocess
+import collections
+import contextvars
+import concurrent.futures
 
 from IPython import get_ipython
+from IPython.core.inputtransformer2 import TransformerManager
+
+# The number of compiled cells kept in the cache
+_CACHE_SIZE = 256
+
+# Matches a declaration of the files a cell reads or writes
+_declaration_pat = re.compile(r'#\s*@(reads|writes)\b(.*)')
+
+# The method calls of the IPython shell that run shell or magic commands,
+# and the kinds of chunks they make
+_SHELL_CALLS = {
+    'system': 'shell',
+    'getoutput': 'shell',
+    'run_line_magic': 'magic',
+    'run_cell_magic': 'magic',
+}
+
+# The options of the shell commands of the cell being run, and the list
+# collecting their results, as ``(options, results)``
+_shell_context = contextvars.ContextVar('nb_exec_shell', default=({}, None))
+
+
+class ShellResult(collections.namedtuple(
+        'ShellResult', ['command', 'returncode', 'duration', 'timed_out'])):
+    """The result of a shell command run by `run_shell`.
+
+    Attributes:
+        command (str): The command.
+        returncode (int): The exit status of the command; negative if it was
+            killed by a signal, e.g., on timeout.
+        duration (float): The wall time of the command in seconds.
+        timed_out (bool): True if the command was killed on timeout.
+    """
+
+
+class CellTiming(collections.namedtuple(
+        'CellTiming', ['index', 'start', 'end', 'deps', 'error'])):
+    """The timing of a cell run by `run_code_cells`.
+
+    Attributes:
+        index (int): The index of the cell among the code cells.
+        start (float): The start time in seconds after the first cell started.
+        end (float): The end time in seconds after the first cell started.
+        deps (tuple of int): The indices of the cells it waited for.
+        error (str): The error message if the cell failed, or None.
+    """
+
+    @property
+    def duration(self):
+        return self.end - self.start
 
 
-def run_code_cells(cells):
+class ScheduleReport:
+    """The per-cell timing report of `run_code_cells`.
+
+    Args:
+        timings (list of CellTiming): The timings, in cell order.
+        profile (nb_profile.ProfileReport, optional): The profiles of the
+            cells, if they were profiled.
+
+    Attributes:
+        timings (list of CellTiming): The timings, in cell order.
+        profile (nb_profile.ProfileReport): The profiles of the cells, or
+            None.
+
+    Examples:
+        >>> report = ScheduleReport([CellTiming(0, 0, 2, (), None),
+        ...                          CellTiming(1, 0, 1, (), None),
+        ...                          CellTiming(2, 2, 3, (0,), None)])
+        >>> report.serial_time, report.critical_path, report.wall_time
+        (4, 3, 3)
+    """
+
+    def __init__(self, timings, profile=None):
+        self.timings = timings
+        self.profile = profile
+
+    @property
+    def wall_time(self):
+        """float: The elapsed time of running all the cells.
+        """
+        return max((t.end for t in self.timings), default=0)
+
+    @property
+    def serial_time(self):
+        """float: The sum of the cell durations, i.e., the time of running
+        the cells one after another.
+        """
+        return sum(t.duration for t in self.timings)
+
+    @property
+    def critical_path(self):
+        """float: The total duration of the longest chain of dependent cells,
+        the shortest possible wall time.
+        """
+        path = {}
+        for t in self.timings:
+            path[t.index] = t.duration + max(
+                (path[dep] for dep in t.deps), default=0)
+        return max(path.values(), default=0)
+
+    def __str__(self):
+        lines = [f"{'cell':>4} {'start':>8} {'time':>8}  deps"]
+        for t in self.timings:
+            deps = ','.join(map(str, t.deps)) or '-'
+            status = f"  ERROR: {t.error}" if t.error else ''
+            lines.append(f"{t.index:>4} {t.start:>8.2f} {t.duration:>8.2f}  "
+                         f"{deps}{status}")
+        lines.append(f"wall {self.wall_time:.2f}s, serial "
+                     f"{self.serial_time:.2f}s, critical path "
+                     f"{self.critical_path:.2f}s")
+        return '\n'.join(lines)
+
+
+def run_code_cells(cells, namespace=None, parallel=False, max_workers=4,
+                   shell_timeout=None, output=None, profile=None):
     """Execute a list of Jupyter code cells.
 
     This function iterates over a list of Jupyter notebook cells and executes
@@ -31,79 +204,675 @@ def run_code_cells(cells):
 
     Args:
         cells (list of nbformat.NotebookNode): A list of Jupyter notebook cell
-        objects. The function will execute only the cells where `cell_type`
-        is `'code'`.
+            objects. The function will execute only the cells where
+            `cell_type` is `'code'`.
+        namespace (dict, optional): The global namespace to run the cells in.
+            Defaults to the namespace of the IPython user, or that of
+            `__main__` outside IPython.
+        parallel (bool, optional): Run independent cells concurrently, while
+            keeping the order of dependent cells. Defaults to False.
+        max_workers (int, optional): The maximum number of cells run at the
+            same time in parallel mode. Defaults to 4.
+        shell_timeout (float, optional): The timeout in seconds of each shell
+            command. Defaults to None (no timeout).
+        output (ipywidgets.Output, optional): The widget to stream the output
+            of shell commands to. Defaults to the current output.
+        profile (nb_profile.Profiler, optional): The profiler recording each
+            cell and chunk. Defaults to None (no profiling).
 
     Returns:
-        None: The function executes the code in the cells in the current
-        environment but does not return any output.
+        ScheduleReport: The timing of each code cell, and the profiles of
+        the cells if `profile` is given.
     """
+    shell_options = {'timeout': shell_timeout, 'output': output}
+    if namespace is None:
+        namespace = _default_namespace()
+    cells = [cell for cell in cells if cell.cell_type == 'code']
+    start = time.perf_counter()
+
+    if not parallel:
+        timings = []
+        for index, cell in enumerate(cells):
+            cell_start = time.perf_counter() - start
+            error = _run_cell(cell.source, namespace, shell_options,
+                              profile=profile, index=index)
+            timings.append(CellTiming(
+                index, cell_start, time.perf_counter() - start,
+                (index - 1,) if index else (), error))
+        return ScheduleReport(timings, profile and profile.report())
+
+    modules = set()
+    for cell in cells:
+        modules.update(_imported_names(cell.source))
+    functions = {}
     for cell in cells:
-        if cell.cell_type == 'code':
-            run_code_cell(cell)
+        functions.update(_defined_functions(cell.source, modules))
+    functions = _resolve_calls(functions)
+    deps = _dependencies([_cell_effects(cell.source, modules, functions)
+                          for cell in cells])
+    timings = {}
+    waiting = {index: set(cell_deps) for index, cell_deps in enumerate(deps)}
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        running = {}
+        while waiting or running:
+            for index in [i for i, d in waiting.items() if not d]:
+                del waiting[index]
+                running[executor.submit(
+                    _timed_run, cells[index].source, namespace, start,
+                    shell_options, profile, index)] = index
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                cell_start, cell_end, error = future.result()
+                timings[index] = CellTiming(index, cell_start, cell_end,
+                                            tuple(deps[index]), error)
+                for cell_deps in waiting.values():
+                    cell_deps.discard(index)
+    return ScheduleReport([timings[index] for index in sorted(timings)],
+                          profile and profile.report())
 
 
-def run_code_cell(cell):
+def run_code_cell(cell, namespace=None, shell_timeout=None, output=None,
+                  profile=None):
     """Executes a Jupyter notebook code cell, handling Python, shell, and magic
     commands.
 
+    An error is printed, and stops the rest of the cell, as in a notebook.
+
     Args:
         cell (nbformat.NotebookNode): A notebook cell object, typically from
-        a Jupyter notebook. The function only processes cells with
-        `cell_type` set to `'code'`.
+            a Jupyter notebook. The function only processes cells with
+            `cell_type` set to `'code'`.
+        namespace (dict, optional): The global namespace to run the cell in.
+            Defaults to the namespace of the IPython user, or that of
+            `__main__` outside IPython.
+        shell_timeout (float, optional): The timeout in seconds of each shell
+            command; a command that times out is killed and stops the cell.
+            Defaults to None (no timeout).
+        output (ipywidgets.Output, optional): The widget to stream the output
+            of shell commands to. Defaults to the current output.
+        profile (nb_profile.Profiler, optional): The profiler recording the
+            cell and its chunks. Defaults to None (no profiling).
 
     Returns:
-        None: The function executes the cell in the current environment, but
-        does not return any output.
+        list of ShellResult: The results of the shell commands of the cell.
     """
     if cell.cell_type != 'code':
-        return
+        return []
+    if namespace is None:
+        namespace = _default_namespace()
+    results = []
+    _run_cell(cell.source, namespace,
+              {'timeout': shell_timeout, 'output': output}, results, profile)
+    return results
+
+
+def _run_cell(source, namespace, shell_options=None, shell_results=None,
+              profile=None, index=None):
+    """Run the source of a cell, and print any error.
+
+    Args:
+        source (str): The source of the cell.
+        namespace (dict): The global namespace to run the cell in.
+        shell_options (dict, optional): The arguments of `run_shell` for the
+            shell commands.
+        shell_results (list, optional): A list to append the `ShellResult` of
+            each shell command to.
+        profile (nb_profile.Profiler, optional): The profiler recording the
+            cell, which is then run chunk by chunk.
+        index (int, optional): The index of the cell for the profiler.
+
+    Returns:
+        str: The error message, or None if the cell succeeded.
+    """
+    if profile is None:
+        return _exec_cell(source, namespace, shell_options, shell_results)
+    with profile.cell(source, index) as probe:
+        probe.error = _exec_cell(source, namespace, shell_options,
+                                 shell_results, probe)
+    return probe.error
+
+
+def _exec_cell(source, namespace, shell_options=None, shell_results=None,
+               probe=None):
+    try:
+        code = compile_cell(source) if probe is None else compile_chunks(
+            source)
+    except SyntaxError as e:
+        print(f"Error compiling Python code: {e}")
+        return f"{type(e).__name__}: {e}"
+
+    if 'get_ipython' not in namespace:
+        namespace['get_ipython'] = _get_shell
+    token = _shell_context.set((shell_options or {}, shell_results))
+    try:
+        if probe is None:
+            exec(code, namespace)
+        else:
+            for kind, line, chunk_code in code:
+                with probe.chunk(kind, line):
+                    exec(chunk_code, namespace)
+    except Exception as e:
+        print(f"Error executing Python code: {e}")
+        return f"{type(e).__name__}: {e}"
+    finally:
+        _shell_context.reset(token)
+    return None
+
+
+def _timed_run(source, namespace, start, shell_options=None, profile=None,
+               index=None):
+    cell_start = time.perf_counter() - start
+    error = _run_cell(source, namespace, shell_options, profile=profile,
+                      index=index)
+    return cell_start, time.perf_counter() - start, error
+
+
+def _cell_effects(source, modules=(), functions=None):
+    """Analyze what a cell reads and writes.
+
+    Names include every variable loaded or bound in the cell, also inside
+    functions, and the top-level modules it imports, which are read as
+    resources (e.g., a package installed by a ``!pip`` line). A variable
+    mutated in place is written too: the base variable of an item or
+    attribute assignment or deletion (``d['a'] = 1``, ``obj.x += 1``), and
+    of a method call (``d.update(b=2)``), which may mutate it, unless the
+    variable is an imported module. A call of a function in `functions`
+    reads and writes the globals the function does.
+
+    Args:
+        source (str): The source of the cell.
+        modules (set, optional): The names bound to modules by the imports
+            of the notebook, whose method calls are reads only.
+        functions (dict, optional): The globals read and written by each
+            function defined in the notebook (see `_defined_functions`).
+
+    Returns:
+        tuple: ``(reads, writes, barrier)``; `reads` and `writes` are sets of
+        names and declared files, and `barrier` is True if the cell runs
+        undeclared shell or magic commands (or cannot be parsed).
+
+    Examples:
+        >>> reads, writes, barrier = _cell_effects(
+        ...     '!wget -q URL  # @writes data.zip\\nimport os\\nx = f(y)')
+        >>> sorted(reads), sorted(writes), barrier
+        (['f', 'os', 'y'], ['data.zip', 'os', 'x'], False)
+        >>> [sorted(_cell_effects(source, {'np'})[1]) for source in
+        ...  ["d['a'] = 1", 'obj.n += 1', 'del d[0]', 'd.update(b=2)',
+        ...   'x = np.mean(d)', 'print(d)']]
+        [['d'], ['obj'], ['d'], ['d'], ['x'], []]
+        >>> functions = {'load': ({'path'}, {'data'})}
+        >>> reads, writes, _ = _cell_effects('load()', functions=functions)
+        >>> sorted(reads), sorted(writes)
+        (['load', 'path'], ['data'])
+    """
+    if functions is None:
+        functions = {}
+    reads, writes = set(), set()
+    declared = False
+    for line in source.splitlines():
+        match = _declaration_pat.search(line)
+        if match:
+            declared = True
+            (reads if match.group(1) == 'reads' else writes).update(
+                match.group(2).split())
+
+    try:
+        tree = ast.parse(TransformerManager().transform_cell(source))
+    except SyntaxError:
+        return reads, writes, True
+
+    shell = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (reads if isinstance(node.ctx, ast.Load) else writes).add(node.id)
+        elif (isinstance(node, (ast.Subscript, ast.Attribute)) and
+              not isinstance(node.ctx, ast.Load)):
+            # An in-place mutation of the base variable
+            base = _base_name(node)
+            if base is not None:
+                writes.add(base)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                               ast.ClassDef)):
+            writes.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                writes.add((alias.asname or alias.name).split('.')[0])
+            if isinstance(node, ast.ImportFrom):
+                if node.module and not node.level:
+                    reads.add(node.module.split('.')[0])
+            else:
+                reads.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.Global):
+            writes.update(node.names)
+        elif (isinstance(node, ast.Call) and
+              isinstance(node.func, ast.Attribute)):
+            if node.func.attr in _SHELL_CALLS:
+                shell = True
+            # A method call may mutate its object
+            base = _base_name(node.func)
+            if base is not None and base not in modules:
+                writes.add(base)
+        elif (isinstance(node, ast.Call) and
+              isinstance(node.func, ast.Name) and
+              node.func.id in functions):
+            # The globals of a function run by the cell
+            function_reads, function_writes = functions[node.func.id]
+            reads.update(function_reads)
+            writes.update(function_writes)
+    reads.discard('get_ipython')
+    return reads, writes, shell and not declared
+
+
+def _defined_functions(source, modules=()):
+    """Analyze the globals used by each top-level function of a cell.
+
+    A function reads the free variables it loads, and writes the variables
+    it declares ``global`` and the free variables it mutates in place (see
+    `_cell_effects`).
+
+    Args:
+        source (str): The source of the cell.
+        modules (set, optional): The names bound to modules by the imports
+            of the notebook, whose method calls are reads only.
+
+    Returns:
+        dict: ``{name: (reads, writes, calls)}``; `calls` is the set of
+        names the function calls.
+
+    Examples:
+        >>> functions = _defined_functions(
+        ...     'def load(n):\\n    global data\\n    data = read(path, n)')
+        >>> [sorted(names) for names in functions['load']]
+        [['path', 'read'], ['data'], ['read']]
+    """
+    try:
+        tree = ast.parse(TransformerManager().transform_cell(source))
+    except SyntaxError:
+        return {}
+
+    functions = {}
+    for function in tree.body:
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        loaded, stored, mutated, declared, calls = (set(), set(), set(),
+                                                    set(), set())
+        for node in ast.walk(function):
+            if isinstance(node, ast.arg):
+                stored.add(node.arg)
+            elif isinstance(node, ast.Name):
+                (loaded if isinstance(node.ctx, ast.Load) else
+                 stored).add(node.id)
+            elif (isinstance(node, (ast.Subscript, ast.Attribute)) and
+                  not isinstance(node.ctx, ast.Load)):
+                mutated.add(_base_name(node))
+            elif isinstance(node, ast.Global):
+                declared.update(node.names)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                   ast.ClassDef)) and node is not function:
+                stored.add(node.name)
+            elif isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name):
+                    calls.add(node.func.id)
+                elif isinstance(node.func, ast.Attribute):
+                    base = _base_name(node.func)
+                    if base not in modules:
+                        mutated.add(base)
+        local = stored - declared
+        mutated.discard(None)
+        functions[function.name] = (loaded - local,
+                                    declared | (mutated - local), calls)
+    return functions
+
+
+def _resolve_calls(functions):
+    """Add the globals of the functions each function calls to its own.
+
+    Args:
+        functions (dict): ``{name: (reads, writes, calls)}`` as returned by
+            `_defined_functions`.
+
+    Returns:
+        dict: ``{name: (reads, writes)}`` including the called functions.
+
+    Examples:
+        >>> functions = _resolve_calls({
+        ...     'main': ({'load'}, set(), {'load'}),
+        ...     'load': (set(), {'data'}, set())})
+        >>> sorted(functions['main'][1])
+        ['data']
+    """
+    effects = {name: (set(reads), set(writes))
+               for name, (reads, writes, _) in functions.items()}
+    changed = True
+    while changed:
+        changed = False
+        for name, (_, _, calls) in functions.items():
+            reads, writes = effects[name]
+            for callee in calls & effects.keys():
+                callee_reads, callee_writes = effects[callee]
+                if not (callee_reads <= reads and callee_writes <= writes):
+                    reads |= callee_reads
+                    writes |= callee_writes
+                    changed = True
+    return effects
 
-    code = cell.source.strip()
-    lines = code.split('\n')
-
-    # Buffer to accumulate Python code lines
-    python_code = []
-
-    for line in lines:
-        line = line.strip()
-        if line.startswith('!'):
-            # First, execute any accumulated Python code
-            if python_code:
-                try:
-                    exec('\n'.join(python_code), globals())
-                except Exception as e:
-                    print(f"Error executing Python code: {e}")
-                python_code = []  # Clear the buffer
-
-            # Execute the shell command
-            os.system(line[1:])
-
-        elif line.startswith('%'):
-            # First, execute any accumulated Python code
-            if python_code:
-                try:
-                    exec('\n'.join(python_code), globals())
-                except Exception as e:
-                    print(f"Error executing Python code: {e}")
-                python_code = []  # Clear the buffer
-
-            # Execute the magic command
-            magic_command = line[1:].split()[0]
-            magic_args = ' '.join(line.split()[1:])
+
+def _base_name(node):
+    """Return the variable at the base of an item or attribute access, or
+    None if the base is not a variable (e.g., a call).
+    """
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _imported_names(source):
+    """Return the names a cell binds with import statements.
+    """
+    try:
+        tree = ast.parse(TransformerManager().transform_cell(source))
+    except SyntaxError:
+        return set()
+    return {(alias.asname or alias.name).split('.')[0]
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.Import, ast.ImportFrom))
+            for alias in node.names}
+
+
+def _dependencies(effects):
+    """Return the indices of the earlier cells each cell must wait for.
+
+    A cell waits for an earlier one that writes something it reads or
+    writes, or reads something it writes. A barrier cell waits for all the
+    earlier cells, and all the later cells wait for it.
+
+    Examples:
+        >>> _dependencies([_cell_effects(source) for source in
+        ...                ['d = {}', "d['a'] = 1", 'd.update(b=2)', 'print(d)']])
+        [[], [0], [0, 1], [0, 1, 2]]
+    """
+    deps = []
+    last_barrier = None
+    for j, (reads, writes, barrier) in enumerate(effects):
+        if barrier:
+            cell_deps = list(range(j))
+            last_barrier = j
+        else:
+            cell_deps = [
+                i for i in range(j)
+                if i == last_barrier or
+                effects[i][1] & (reads | writes) or effects[i][0] & writes]
+        deps.append(cell_deps)
+    return deps
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def compile_cell(source):
+    """Translate the source of a code cell into Python and compile it.
+
+    The result is cached by source, so a cell is transformed and compiled
+    only once. Shell commands are run by `run_shell` instead of the IPython
+    shell.
+
+    Args:
+        source (str): The source of the code cell.
+
+    Returns:
+        code: The code object of the cell. Its filename is registered with
+        `linecache`, so tracebacks show the lines of the cell.
+
+    Raises:
+        SyntaxError: If the cell is not valid Python after transformation.
+
+    Examples:
+        >>> ns = {}
+        >>> exec(compile_cell('for i in range(2):\\n    x = i'), ns)
+        >>> ns['x']
+        1
+        >>> compile_cell('x = 1') is compile_cell('x = 1')
+        True
+    """
+    tree, filename = _parse_cell(source)
+    tree = _SystemCallRewriter().visit(tree)
+    return compile(ast.fix_missing_locations(tree), filename, 'exec')
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def compile_chunks(source):
+    """Translate the source of a code cell into Python and compile it into
+    chunks, to be run and profiled one after another.
+
+    Each shell command and each magic is a chunk, and so is each run of
+    top-level Python statements between them.
+
+    Args:
+        source (str): The source of the code cell.
+
+    Returns:
+        list of tuple: ``(kind, line, code)`` for each chunk, where `kind` is
+        ``'python'``, ``'shell'`` or ``'magic'``, and `line` is the first line
+        of the chunk in the translated cell.
+
+    Raises:
+        SyntaxError: If the cell is not valid Python after transformation.
+
+    Examples:
+        >>> [(kind, line) for kind, line, _ in compile_chunks(
+        ...     'import os\\nx = 1\\n!echo $x\\n%time y = x')]
+        [('python', 1), ('shell', 3), ('magic', 4)]
+    """
+    tree, filename = _parse_cell(source)
+    groups = []
+    for node in tree.body:
+        kind = _chunk_kind(node)
+        if groups and kind == 'python' and groups[-1][0] == 'python':
+            groups[-1][1].append(node)
+        else:
+            groups.append((kind, [node]))
+
+    chunks = []
+    for kind, body in groups:
+        module = _SystemCallRewriter().visit(ast.Module(body, []))
+        chunks.append((kind, body[0].lineno, compile(
+            ast.fix_missing_locations(module), filename, 'exec')))
+    return chunks
+
+
+def _parse_cell(source):
+    """Translate the source of a cell into Python, register it with
+    `linecache`, and parse it.
+
+    Returns:
+        tuple: ``(tree, filename)``.
+    """
+    python_source = TransformerManager().transform_cell(source)
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    filename = f"<cell-{digest[:12]}>"
+    linecache.cache[filename] = (
+        len(python_source), None, python_source.splitlines(True), filename)
+    return ast.parse(python_source, filename), filename
+
+
+def _chunk_kind(node):
+    """Return the chunk kind of a top-level statement.
+    """
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Call) and
+                isinstance(child.func, ast.Attribute) and
+                child.func.attr in _SHELL_CALLS and
+                isinstance(child.func.value, ast.Call) and
+                isinstance(child.func.value.func, ast.Name) and
+                child.func.value.func.id == 'get_ipython'):
+            return _SHELL_CALLS[child.func.attr]
+    return 'python'
+
+
+class _SystemCallRewriter(ast.NodeTransformer):
+    """Rewrite the ``get_ipython().system(cmd)`` calls of ``!`` lines into
+    calls of `_system`.
+    """
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if (isinstance(func, ast.Attribute) and func.attr == 'system' and
+                isinstance(func.value, ast.Call) and
+                isinstance(func.value.func, ast.Name) and
+                func.value.func.id == 'get_ipython'):
+            node.func = ast.copy_location(ast.parse(
+                f"__import__({__name__!r}, fromlist=['_system'])._system",
+                mode='eval').body, func)
+        return node
+
+
+def _system(cmd):
+    """Run the command of a ``!`` line with the options of the current cell.
+
+    As in IPython, ``{expr}`` and ``$name`` in the command are expanded
+    with the variables of the cell.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command timed out.
+    """
+    shell = get_ipython()
+    if shell is not None:
+        # Depth 1 is the frame of the cell calling this function
+        cmd = shell.var_expand(cmd, depth=1)
+    options, results = _shell_context.get()
+    result = run_shell(cmd, **options)
+    if results is not None:
+        results.append(result)
+    if shell is not None:
+        shell.user_ns['_exit_code'] = result.returncode
+    if result.timed_out:
+        raise subprocess.TimeoutExpired(cmd, options['timeout'])
+
+
+def run_shell(command, output=None, timeout=None):
+    """Run a shell command in a subprocess, streaming its output.
+
+    The lines of the standard output and error of the command are written
+    as they come to `sys.stdout` and `sys.stderr` (in a kernel, the output
+    of the current cell), or to an `Output` widget.
+
+    Args:
+        command (str): The shell command.
+        output (ipywidgets.Output, optional): The widget to write the output
+            to. Defaults to None (`sys.stdout` and `sys.stderr`).
+        timeout (float, optional): The timeout in seconds, after which the
+            command and its child processes are killed. Defaults to None (no
+            timeout).
+
+    Returns:
+        ShellResult: The exit status and the duration of the command.
+
+    Examples:
+        >>> result = run_shell('echo hello')
+        hello
+        >>> result.returncode, result.timed_out
+        (0, False)
+    """
+    start = time.perf_counter()
+    deadline = None if timeout is None else start + timeout
+    process = subprocess.Popen(
+        command, shell=True, stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=(os.name == 'posix'))
+
+    lines = queue.Queue()
+    for stream, name in ((process.stdout, 'stdout'),
+                         (process.stderr, 'stderr')):
+        threading.Thread(target=_read_lines, args=(stream, name, lines),
+                         daemon=True).start()
+
+    timed_out = False
+    n_open = 2
+    try:
+        while n_open:
+            # Wake up regularly, so the kernel can interrupt the wait
+            wait = 0.1
+            if deadline is not None:
+                wait = min(wait, deadline - time.perf_counter())
+                if wait <= 0:
+                    timed_out = True
+                    break
             try:
-                get_ipython().run_line_magic(magic_command, magic_args)
-            except Exception as e:
-                print(f"Error executing magic command: {e}")
+                name, line = lines.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if line is None:
+                n_open -= 1
+            else:
+                _write_line(name, line, output)
+    finally:
+        if n_open:
+            _kill(process)
+    returncode = process.wait()
+    if timed_out:
+        _write_line('stderr', f"Command timed out after {timeout}s: "
+                              f"{command}\n", output)
+    return ShellResult(command, returncode, time.perf_counter() - start,
+                       timed_out)
+
+
+def _read_lines(stream, name, lines):
+    """Put the decoded lines of a stream into a queue, then None.
+    """
+    with stream:
+        for line in iter(stream.readline, b''):
+            lines.put((name, line.decode('utf-8', errors='replace')))
+    lines.put((name, None))
+
 
+def _write_line(name, line, output=None):
+    if output is not None:
+        if name == 'stdout':
+            output.append_stdout(line)
+        else:
+            output.append_stderr(line)
+        return
+    stream = sys.stdout if name == 'stdout' else sys.stderr
+    stream.write(line)
+    stream.flush()
+
+
+def _kill(process):
+    """Kill a process, and its process group on POSIX.
+    """
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
         else:
-            # Accumulate Python code
-            python_code.append(line)
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _default_namespace():
+    shell = get_ipython()
+    if shell is not None:
+        return shell.user_ns
+    return sys.modules['__main__'].__dict__
+
+
+def _get_shell():
+    """Return the IPython shell, or a stand-in outside IPython.
+    """
+    return get_ipython() or _SystemShell()
+
+
+class _SystemShell:
+    """A stand-in for the IPython shell outside IPython, which supports
+    capturing the output of shell commands (``x = !cmd``) only.
+    """
+
+    def getoutput(self, cmd):
+        return os.popen(cmd).read().splitlines()
 
-    # After the loop, execute any remaining Python code
-    if python_code:
-        try:
-            exec('\n'.join(python_code), globals())
-        except Exception as e:
-            print(f"Error executing Python code: {e}")
+    def run_line_magic(self, magic_name, line):
+        raise RuntimeError(f"%{magic_name} needs an IPython kernel")
 
+    def run_cell_magic(self, magic_name, line, cell):
+        raise RuntimeError(f"%%{magic_name} needs an IPython kernel")
@@ -0,0 +1,457 @@
+"""
+nb_io - Notebook Reading and Writing
+
+This module is the I/O layer of `widgetify` and `nb_op`. By default it reads
+and writes notebooks with `nbformat`, validating them against the notebook
+schema. It also provides faster and memory-bounded modes for large notebooks:
+
+* **trusted** mode skips the JSON schema validation on read and write.
+* **json_backend** selects the JSON library; ``'orjson'`` uses the optional
+  `orjson` package, and ``'auto'`` uses it when it is installed.
+* **streaming** mode does not decode cell outputs into Python objects. The
+  notebook file is memory-mapped, the byte range of each cell's outputs is
+  recorded in a `RawOutputs` placeholder, and the writer copies those bytes
+  from the source file in chunks. Peak memory then stays near the size of the
+  cell sources rather than the size of the file, even for notebooks with
+  hundreds of megabytes of embedded plots. Streaming implies trusted mode.
+
+The default mode can be changed process-wide with `set_options`.
+
+Notebooks can also be read from and serialized to bytes in memory, e.g., for
+a notebook received over the network, with `read_notebook_bytes` and
+`notebook_to_bytes`.
+
+Usage:
+::
+
+    from widgetify import nb_io
+
+    nb_io.set_options(streaming=True, json_backend='auto')
+    notebook = nb_io.read_notebook('big.ipynb')
+    nb_io.write_notebook(notebook, 'big.ipynb')
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'RawOutputs',
+    'set_options',
+    'read_notebook',
+    'read_notebook_bytes',
+    'write_notebook',
+    'write_notebook_bytes',
+    'notebook_to_bytes',
+]
+
+import io
+import os
+import re
+import copy
+import json
+import mmap
+import uuid
+import shutil
+import logging
+import tempfile
+
+import nbformat
+from nbformat.v4.rwbase import split_lines, strip_transient
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The I/O options used when none are given explicitly; see `set_options`
+default_options = {
+    'trusted': False,
+    'streaming': False,
+    'json_backend': 'json',
+}
+
+# Size of the chunks in which raw outputs are copied
+_CHUNK_SIZE = 1024 * 1024
+
+# Matches a JSON string or a bracket, the only tokens the output scanner needs
+_token_pat = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.DOTALL)
+_colon_pat = re.compile(rb'\s*:')
+
+
+class RawOutputs(list):
+    """An empty list standing in for the outputs of a cell read in streaming
+    mode.
+
+    The outputs stay in the notebook file as raw JSON bytes and are copied by
+    `write_notebook` without being decoded. Replacing the `outputs` of the cell
+    with a regular list discards them.
+
+    Attributes:
+        nb_filename (str): The notebook file holding the outputs.
+        offset (int): The byte offset of the outputs' JSON array in the file;
+            updated when `write_notebook` replaces the file.
+        size (int): The size in bytes of the outputs' JSON array.
+    """
+
+    def __init__(self, nb_filename, offset, size):
+        super().__init__()
+        self.nb_filename = nb_filename
+        self.offset = offset
+        self.size = size
+
+    def __repr__(self):
+        return f"RawOutputs({self.nb_filename!r}, {self.offset}, {self.size})"
+
+
+def set_options(trusted=None, streaming=None, json_backend=None):
+    """Change the default I/O options of the current process.
+
+    Options left as None keep their current value.
+
+    Args:
+        trusted (bool, optional): Skip JSON schema validation.
+        streaming (bool, optional): Pass cell outputs through without
+            decoding them.
+        json_backend (str, optional): ``'json'``, ``'orjson'``, or ``'auto'``.
+    """
+    options = {'trusted': trusted, 'streaming': streaming,
+               'json_backend': json_backend}
+    default_options.update(
+        {key: value for key, value in options.items() if value is not None})
+
+
+def read_notebook(nb_filename, trusted=None, streaming=None,
+                  json_backend=None):
+    """Read a notebook file as an nbformat v4 `NotebookNode`.
+
+    Args:
+        nb_filename (str): The path to the notebook file.
+        trusted (bool, optional): Skip JSON schema validation. Defaults to
+            the process-wide option (see `set_options`).
+        streaming (bool, optional): Leave cell outputs in the file as
+            `RawOutputs`. Defaults to the process-wide option.
+        json_backend (str, optional): ``'json'``, ``'orjson'``, or ``'auto'``.
+            Defaults to the process-wide option.
+
+    Returns:
+        nbformat.NotebookNode: The notebook.
+    """
+    trusted, streaming, loads, _ = _resolve_options(
+        trusted, streaming, json_backend)
+
+    if streaming:
+        notebook = _read_streaming(nb_filename, loads)
+        if notebook is not None:
+            return notebook
+
+    if not trusted and loads is json.loads:
+        with open(nb_filename, 'r', encoding='utf-8') as f:
+            return nbformat.read(f, as_version=4)
+
+    with open(nb_filename, 'rb') as f:
+        nb_dict = loads(f.read())
+    return _to_notebook(nb_dict, trusted)
+
+
+def read_notebook_bytes(nb_bytes, trusted=None, json_backend=None):
+    """Read the content of a notebook file as an nbformat v4 `NotebookNode`.
+
+    Args:
+        nb_bytes (bytes): The content of the notebook file.
+        trusted (bool, optional): Skip JSON schema validation. Defaults to
+            the process-wide option (see `set_options`).
+        json_backend (str, optional): ``'json'``, ``'orjson'``, or ``'auto'``.
+            Defaults to the process-wide option.
+
+    Returns:
+        nbformat.NotebookNode: The notebook.
+
+    Examples:
+        >>> nb = read_notebook_bytes(notebook_to_bytes(
+        ...     nbformat.v4.new_notebook(cells=[
+        ...         nbformat.v4.new_markdown_cell('# Title')])))
+        >>> nb.cells[0].source
+        '# Title'
+    """
+    trusted, _, loads, _ = _resolve_options(trusted, False, json_backend)
+    if not trusted and loads is json.loads:
+        return nbformat.reads(nb_bytes.decode('utf-8'), as_version=4)
+    return _to_notebook(loads(nb_bytes), trusted)
+
+
+def notebook_to_bytes(notebook, trusted=None, json_backend=None):
+    """Serialize a notebook into the content of a notebook file.
+
+    The outputs of cells read in streaming mode are copied from their source
+    file.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook to serialize.
+        trusted (bool, optional): Skip JSON schema validation. Defaults to
+            the process-wide option (see `set_options`).
+        json_backend (str, optional): ``'json'``, ``'orjson'``, or ``'auto'``.
+            Defaults to the process-wide option.
+
+    Returns:
+        bytes: The content of the notebook file.
+    """
+    f = io.BytesIO()
+    _write(notebook, f, trusted, json_backend)
+    return f.getvalue()
+
+
+def write_notebook(notebook, nb_filename, trusted=None, json_backend=None):
+    """Write a notebook atomically.
+
+    The notebook is written to a temporary file in the destination directory,
+    which then replaces the destination file with an atomic rename. The
+    outputs of cells read in streaming mode are copied from their source file.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook to write.
+        nb_filename (str): The path to write to.
+        trusted (bool, optional): Skip JSON schema validation. Defaults to
+            the process-wide option (see `set_options`).
+        json_backend (str, optional): ``'json'``, ``'orjson'``, or ``'auto'``.
+            Defaults to the process-wide option.
+    """
+    with _atomic_open(nb_filename) as f:
+        copied = _write(notebook, f, trusted, json_backend)
+
+    # Outputs read from the file just replaced are now at new offsets in it
+    target = os.path.realpath(nb_filename)
+    for raw_outputs, offset in copied:
+        if os.path.realpath(raw_outputs.nb_filename) == target:
+            raw_outputs.offset = offset
+
+
+def _write(notebook, f, trusted=None, json_backend=None):
+    """Serialize a notebook to a binary file.
+
+    Returns:
+        list of tuple: ``(raw_outputs, offset)`` for each `RawOutputs`
+        copied, where `offset` is the position its bytes were written at.
+    """
+    trusted, _, _, dumps = _resolve_options(trusted, None, json_backend)
+
+    raw_outputs = {i: cell.outputs for i, cell in enumerate(notebook.cells)
+                   if isinstance(cell.get('outputs'), RawOutputs)}
+    if not raw_outputs and not trusted and dumps is None:
+        nb_text = nbformat.writes(notebook)
+        if not nb_text.endswith('\n'):
+            nb_text += '\n'
+        f.write(nb_text.encode('utf-8'))
+        return []
+
+    if not trusted and not raw_outputs:
+        nbformat.validate(notebook)
+
+    # Serialize with a placeholder for each raw outputs
+    nb_dict = copy.deepcopy(notebook)
+    split_lines(nb_dict)
+    strip_transient(nb_dict)
+    token = f"widgetify-raw-outputs-{uuid.uuid4().hex}-"
+    for i in raw_outputs:
+        nb_dict.cells[i].outputs = f"{token}{i}"
+    if dumps is None:
+        nb_bytes = json.dumps(nb_dict, indent=1, sort_keys=True,
+                              separators=(',', ': '),
+                              ensure_ascii=False).encode('utf-8')
+    else:
+        nb_bytes = dumps(nb_dict)
+    if not nb_bytes.endswith(b'\n'):
+        nb_bytes += b'\n'
+
+    pieces = re.split(rb'"' + token.encode() + rb'(\d+)"', nb_bytes)
+    f.write(pieces[0])
+    copied = []
+    for i in range(1, len(pieces), 2):
+        outputs = raw_outputs[int(pieces[i])]
+        copied.append((outputs, f.tell()))
+        _copy_raw(outputs, f)
+        f.write(pieces[i + 1])
+    return copied
+
+
+def write_notebook_bytes(nb_bytes, nb_filename):
+    """Write the bytes of a serialized notebook atomically.
+
+    Args:
+        nb_bytes (bytes): The content of the notebook file.
+        nb_filename (str): The path to write to.
+    """
+    with _atomic_open(nb_filename) as f:
+        f.write(nb_bytes)
+
+
+def _resolve_options(trusted, streaming, json_backend):
+    """Fill in the default options and pick the JSON functions.
+
+    Returns:
+        tuple: ``(trusted, streaming, loads, dumps)``; `dumps` is None for
+        the standard `json` backend.
+    """
+    if trusted is None:
+        trusted = default_options['trusted']
+    if streaming is None:
+        streaming = default_options['streaming']
+    if json_backend is None:
+        json_backend = default_options['json_backend']
+
+    if json_backend == 'auto':
+        json_backend = 'orjson' if orjson else 'json'
+    if json_backend == 'orjson':
+        if orjson is None:
+            raise ImportError("json_backend 'orjson' requires the orjson "
+                              "package; pip install orjson")
+        return (trusted or streaming, streaming, orjson.loads,
+                lambda obj: orjson.dumps(
+                    obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    if json_backend != 'json':
+        raise ValueError(f"Unknown JSON backend: {json_backend}")
+    return trusted or streaming, streaming, json.loads, None
+
+
+def _to_notebook(nb_dict, trusted):
+    """Convert a decoded notebook file into an nbformat v4 `NotebookNode`.
+    """
+    major, minor = nbformat.reader.get_version(nb_dict)
+    if major not in nbformat.versions:
+        raise nbformat.NBFormatError(f"Unsupported nbformat version {major}")
+    notebook = nbformat.versions[major].to_notebook_json(nb_dict, minor=minor)
+    if major != 4:
+        notebook = nbformat.convert(notebook, 4)
+    if not trusted:
+        nbformat.validate(notebook)
+    return notebook
+
+
+def _read_streaming(nb_filename, loads):
+    """Read a notebook, leaving the outputs of its cells in the file.
+
+    Returns:
+        nbformat.NotebookNode: The notebook, or None if it is not an nbformat
+        v4 notebook and must be read in full.
+    """
+    with open(nb_filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            spans = _find_output_spans(data)
+            pieces = []
+            pos = 0
+            for _, start, end in spans:
+                pieces.append(data[pos:start])
+                pieces.append(b'[]')
+                pos = end
+            pieces.append(data[pos:])
+
+    nb_dict = loads(b''.join(pieces))
+    del pieces
+    if nbformat.reader.get_version(nb_dict)[0] != 4:
+        return None
+
+    notebook = nbformat.v4.nbjson.to_notebook(nb_dict)
+    for cell_index, start, end in spans:
+        if start + 2 < end:     # skip empty arrays
+            notebook.cells[cell_index].outputs = RawOutputs(
+                os.path.abspath(nb_filename), start, end - start)
+    return notebook
+
+
+def _find_output_spans(data):
+    """Find the byte range of the `outputs` array of each cell.
+
+    Only strings and brackets are scanned; the content of strings, such as
+    base64 image data, is skipped by the regular expression engine.
+
+    Returns:
+        list of tuple: ``(cell_index, start, end)`` for each `outputs` array.
+
+    Examples:
+        >>> data = (b'{"cells": [{"outputs": [1]}], '
+        ...         b'"metadata": {"tool": {"outputs": [2]}}}')
+        >>> [(i, data[start:end]) for i, start, end
+        ...  in _find_output_spans(data)]
+        [(0, b'[1]')]
+    """
+    spans = []
+    stack = []          # the key of each open container
+    key = None          # the key of the next value
+    cell_index = -1
+    output_start = None
+    for match in _token_pat.finditer(data):
+        token = match.group() if match.end() - match.start() < 16 else None
+        if token is None or token[0] == 0x22:     # a string
+            if _colon_pat.match(data, match.end()):
+                key = token
+            continue
+
+        if token in (b'[', b'{'):
+            if len(stack) == 2 and stack[1] == b'"cells"' and token == b'{':
+                cell_index += 1
+            if (len(stack) == 3 and stack[1] == b'"cells"' and
+                    key == b'"outputs"' and token == b'['):
+                output_start = match.start()
+            stack.append(key)
+            key = None
+        else:
+            stack.pop()
+            key = None
+            if (len(stack) == 3 and stack[1] == b'"cells"' and
+                    output_start is not None):
+                spans.append((cell_index, output_start, match.end()))
+                output_start = None
+    return spans
+
+
+def _copy_raw(raw_outputs, f):
+    """Copy the raw outputs' bytes from their notebook file to a file.
+    """
+    with open(raw_outputs.nb_filename, 'rb') as src:
+        src.seek(raw_outputs.offset)
+        remaining = raw_outputs.size
+        while remaining:
+            chunk = src.read(min(remaining, _CHUNK_SIZE))
+            if not chunk:
+                raise IOError(f"{raw_outputs.nb_filename} changed since it "
+                              f"was read")
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+class _atomic_open:
+    """Open a temporary file for writing and rename it over `nb_filename`
+    when closed without an error.
+    """
+
+    def __init__(self, nb_filename):
+        self.nb_filename = nb_filename
+
+    def __enter__(self):
+        dirname = os.path.dirname(os.path.abspath(self.nb_filename))
+        fd, self.tmp_filename = tempfile.mkstemp(
+            dir=dirname, prefix='.', suffix='.ipynb.tmp')
+        self.file = os.fdopen(fd, 'wb')
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        if exc_type is not None:
+            os.unlink(self.tmp_filename)
+            return
+        try:
+            if os.path.exists(self.nb_filename):
+                shutil.copymode(self.nb_filename, self.tmp_filename)
+            else:
+                # mkstemp creates the file with mode 0600; use the umask
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(self.tmp_filename, 0o666 & ~umask)
+            os.replace(self.tmp_filename, self.nb_filename)
+        except BaseException:
+            os.unlink(self.tmp_filename)
+            raise
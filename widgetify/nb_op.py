@@ -4,11 +4,12 @@ nb_op - Notebook Operations
 This module provides utilities for performing common operations on Jupyter
 Notebooks using `nbformat`, such as inserting titles, removing sections,
 commenting code cells, and more. It is designed to automate notebook
-modifications like inserting markdown titles, removing specific sections, and
-handling Colab-specific cells.
+modifications like inserting markdown titles, removing specific sections,
+handling Colab-specific cells, and stripping stored outputs before serving a
+notebook with Voilà.
 """
 __author__ = "York <york.jong@gmail.com>"
-__date__ = "2024/09/19 (initial version) ~ 2024/09/19 (last revision)"
+__date__ = "2024/09/19 (initial version) ~ 2026/10/18 (last revision)"
 
 __all__ = [
     'insert_title_cells',
@@ -17,14 +18,25 @@ __all__ = [
     'search_section',
     'extract_section',
     'remove_section',
+    'remove_sections',
+    'Outline',
+    'Section',
+    'strip_outputs',
+    'PayloadReport',
 ]
 
-import re
+import json
+import bisect
 import logging
+import collections
 
 import nbformat
 from nbformat.corpus.words import generate_corpus_id as random_cell_id
 
+from . import nb_io
+from . import nb_pipeline
+from . import form2widget
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -42,10 +54,16 @@ def insert_title_cells(nb_filename):
     Args:
         nb_filename (str): The path to the notebook file to modify.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        pipeline.insert_title_cells()
+
+
+def _insert_title_cells(notebook):
+    """Insert title cells into an in-memory notebook.
 
+    Returns:
+        bool: True if any title cell was inserted.
+    """
     new_cells = []
 
     for cell in notebook.cells:
@@ -54,7 +72,7 @@ def insert_title_cells(nb_filename):
             title_line = ''
 
             # Check if the cell contains Colab Form or ipywidgets code
-            if (re.search(r'.*=.*#\s*@param', cell.source) or
+            if (form2widget._is_form_cell(cell.source) or
                 all(keyword in cell.source
                     for keyword in ['ipywidgets', '\ndisplay('])):
 
@@ -86,16 +104,16 @@ def insert_title_cells(nb_filename):
         # Add all cells (including the newly inserted markdown cells)
         new_cells.append(cell)
 
+    if len(new_cells) == len(notebook.cells):
+        return False
+
     # Update the notebook with the new cells
     notebook.cells = new_cells
 
     #n_changes, notebook = nbformat.validator.normalize(notebook)
     #logger.debug(f"Normalized {n_changes} cells")
     #nbformat.validator.validate(notebook)
-
-    # Write the modified notebook back to the file
-    with open(nb_filename, 'w', encoding='utf-8') as f:
-        nbformat.write(notebook, f)
+    return True
 
 
 def remove_open_in_colab_cell(nb_filename):
@@ -104,10 +122,16 @@ def remove_open_in_colab_cell(nb_filename):
     Args:
         nb_filename (str): The path to the notebook file to modify.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        pipeline.remove_open_in_colab_cell()
+
+
+def _remove_open_in_colab_cell(notebook):
+    """Remove the open-in-colab cell from an in-memory notebook.
 
+    Returns:
+        bool: True if a cell was removed.
+    """
     new_cells = []
 
     for cell in notebook.cells:
@@ -119,12 +143,12 @@ def remove_open_in_colab_cell(nb_filename):
         # Add all other cells to the new list
         new_cells.append(cell)
 
+    if len(new_cells) == len(notebook.cells):
+        return False
+
     # Update the notebook with the remaining cells
     notebook.cells = new_cells
-
-    # Write the modified notebook to the output file
-    with open(nb_filename, 'w', encoding='utf-8') as f:
-        nbformat.write(notebook, f)
+    return True
 
 
 def extract_and_comment_first_code_cell(nb_filename):
@@ -140,10 +164,17 @@ def extract_and_comment_first_code_cell(nb_filename):
         which behaves like a dictionary but is used by nbformat to represent
         notebook elements.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        return pipeline.extract_and_comment_first_code_cell()
+
 
+def _extract_and_comment_first_code_cell(notebook):
+    """Comment out the first code cell of an in-memory notebook.
+
+    Returns:
+        nbformat.notebooknode.NotebookNode: A copy of the first code cell
+        before it was commented out, or None if no code cell is found.
+    """
     # Find the first code cell
     first_code_cell = None
     for cell in notebook.cells:
@@ -154,11 +185,7 @@ def extract_and_comment_first_code_cell(nb_filename):
                                      in cell.source.splitlines()])
             break
 
-    # Save the modified notebook
-    if first_code_cell:
-        with open(nb_filename, 'w', encoding='utf-8') as f:
-            nbformat.write(notebook, f)
-    else:
+    if not first_code_cell:
         logger.error("No code cell found")
 
     return first_code_cell
@@ -184,16 +211,13 @@ def search_section(nb_filename, text):
         The function searches only in markdown cells and checks if the line
         starts with a heading marker (e.g., '#', '##').
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    return nb_pipeline.NotebookPipeline(nb_filename).search_section(text)
 
-    for cell in notebook.cells:
-        if cell.cell_type == 'markdown':
-            for line in cell.source.splitlines():
-                if line.startswith('#') and text in line:
-                    return line
-    return None
+
+def _search_section(notebook, text, outline=None):
+    """Search for a markdown heading in an in-memory notebook.
+    """
+    return (outline or Outline(notebook)).search(text)
 
 
 def extract_section(nb_filename, section_name, markdown_only=False):
@@ -223,44 +247,19 @@ def extract_section(nb_filename, section_name, markdown_only=False):
         encounters a heading of the same or higher level than the given
         section's heading.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
-
-    # Calculate the section level from the section name
-    section_level = section_name.split(' ')[0].count('#')
+    pipeline = nb_pipeline.NotebookPipeline(nb_filename)
+    return pipeline.extract_section(section_name, markdown_only)
 
-    extract_cells = []
-    extract_mode = False
-    start_extract = False
 
-    for cell in notebook.cells:
-        if cell.cell_type == 'markdown':
-            lines = cell.source.splitlines()
-            # Calculate the heading level of the current markdown cell
-            heading_level = next(
-                (line.split(' ')[0].count('#') for line in lines
-                 if line.strip().startswith('#')),
-                None
-            )
-
-            # Detect if the cell matches the section to start extracting
-            if not start_extract:
-                if any(section_name in line for line in lines):
-                    start_extract = True
-                    extract_mode = True  # Start extracting this section
-            elif extract_mode:
-                if heading_level is not None and heading_level <= section_level:
-                    break
-
-        if extract_mode:
-            if markdown_only:
-                if cell.cell_type == 'markdown':
-                    extract_cells.append(cell)
-            else:
-                extract_cells.append(cell)
-
-    return extract_cells
+def _extract_section(notebook, section_name, markdown_only=False,
+                     outline=None):
+    """Extract a section from an in-memory notebook.
+    """
+    section = (outline or Outline(notebook)).find(section_name)
+    if section is None:
+        return []
+    return [cell for cell in notebook.cells[section.start:section.end]
+            if not markdown_only or cell.cell_type == 'markdown']
 
 
 def remove_section(nb_filename, section_name, markdown_only=False):
@@ -287,51 +286,304 @@ def remove_section(nb_filename, section_name, markdown_only=False):
         until a markdown heading of the same or higher level is encountered.
         The rest of the notebook content will remain unchanged.
     """
-    # Read the original notebook file
-    with open(nb_filename, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        pipeline.remove_section(section_name, markdown_only)
 
-    # Calculate the section level from the section name
-    section_level = section_name.split(' ')[0].count('#')
 
-    new_cells = []
-    remove_mode = False
-    start_removal = False
+def remove_sections(nb_filename, section_names, markdown_only=False):
+    """Remove several sections and their content from a Jupyter Notebook.
 
-    for cell in notebook.cells:
-        if cell.cell_type == 'markdown':
-            lines = cell.source.splitlines()
-            # Calculate the heading level of the current markdown cell
-            heading_level = next(
-                (line.split(' ')[0].count('#') for line in lines
-                 if line.strip().startswith('#')),
-                None
-            )
-
-            # Detect if the markdown cell matches the section to start removing
-            if not start_removal:
-                if any(section_name in line for line in lines):
-                    start_removal = True
-                    remove_mode = True  # Start removing this section
-                    continue
-
-            # Stop removing when the markdown heading level is less than or
-            # equal to the section_level
-            if (remove_mode and heading_level is not None
-                and heading_level <= section_level):
-                remove_mode = False
-
-        if remove_mode:
-            # Remove markdown cell only i.e., keep code cell and raw cell
-            if markdown_only and (cell.cell_type != 'markdown'):
-                new_cells.append(cell)
-        else:
-            new_cells.append(cell)
+    The notebook is read, scanned and written once, however many sections
+    are removed. Each section is found and delimited as by `remove_section`
+    in the original notebook; a section that is not found is skipped.
+
+    Args:
+        nb_filename (str): The path to the Jupyter Notebook file.
+        section_names (list of str): The names of the sections to remove,
+            including the heading level (e.g., '## Section Name').
+        markdown_only (bool, optional): If True, only the markdown cells of
+            the sections are removed. Defaults to False.
+    """
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        pipeline.remove_sections(section_names, markdown_only)
+
+
+def _remove_section(notebook, section_name, markdown_only=False,
+                    outline=None):
+    """Remove a section from an in-memory notebook.
+
+    Returns:
+        bool: True if any cell was removed.
+    """
+    return _remove_sections(notebook, [section_name], markdown_only, outline)
+
+
+def _remove_sections(notebook, section_names, markdown_only=False,
+                     outline=None):
+    """Remove sections from an in-memory notebook in a single pass.
+
+    Returns:
+        bool: True if any cell was removed.
+    """
+    outline = outline or Outline(notebook)
+    removed = set()
+    for section_name in section_names:
+        section = outline.find(section_name)
+        if section is None:
+            continue
+        # The heading cell is removed even with markdown_only; it is always
+        # a markdown cell
+        removed.add(section.start)
+        removed.update(
+            i for i in range(section.start + 1, section.end)
+            if not markdown_only or notebook.cells[i].cell_type == 'markdown')
+    if not removed:
+        return False
 
     # Update the notebook with the remaining cells
-    notebook.cells = new_cells
+    notebook.cells = [cell for i, cell in enumerate(notebook.cells)
+                      if i not in removed]
+    return True
+
+
+class Section(collections.namedtuple(
+        'Section', ['heading', 'level', 'start', 'end'])):
+    """A section of a notebook.
+
+    Attributes:
+        heading (str): The heading line of the section.
+        level (int): The heading level, i.e., the number of '#'.
+        start (int): The index of the markdown cell of the heading.
+        end (int): The index of the first cell after the section, i.e., of
+            the next heading cell of the same or a higher level, or the
+            number of cells.
+    """
+
+
+class Outline:
+    """The heading outline of an in-memory notebook.
+
+    The markdown cells are scanned once, and their heading levels computed
+    once, so sections can be looked up, extracted and removed without
+    rescanning the notebook. The outline must be rebuilt after the cells of
+    the notebook change; `nb_pipeline.NotebookPipeline.outline` does so.
+
+    The heading level of a markdown cell is that of its first heading line.
+
+    Args:
+        notebook (nbformat.NotebookNode): The notebook.
+
+    Attributes:
+        sections (list of Section): The sections of the heading cells, in
+            notebook order, each ending at the next heading cell of the same
+            or a higher level.
+
+    Examples:
+        >>> nb = nbformat.v4.new_notebook(cells=[
+        ...     nbformat.v4.new_markdown_cell('# Intro'),
+        ...     nbformat.v4.new_markdown_cell('## Setup'),
+        ...     nbformat.v4.new_code_cell('!pip install x'),
+        ...     nbformat.v4.new_markdown_cell('## Run')])
+        >>> outline = Outline(nb)
+        >>> [(s.heading, s.level, s.start, s.end) for s in outline.sections]
+        [('# Intro', 1, 0, 4), ('## Setup', 2, 1, 3), ('## Run', 2, 3, 4)]
+        >>> outline.find('## Setup')
+        Section(heading='## Setup', level=2, start=1, end=3)
+    """
+
+    def __init__(self, notebook):
+        self.notebook = notebook
+        self.n_cells = len(notebook.cells)
+        # The lines of each markdown cell, as (cell index, lines)
+        self._markdown = []
+        # The heading cells, as parallel lists of cell indices and levels
+        self._heading_indices = []
+        self._heading_levels = []
+        self.sections = []
+        for i, cell in enumerate(notebook.cells):
+            if cell.cell_type != 'markdown':
+                continue
+            lines = cell.source.splitlines()
+            self._markdown.append((i, lines))
+            heading = next((line for line in lines
+                            if line.strip().startswith('#')), None)
+            if heading is not None:
+                self._heading_indices.append(i)
+                self._heading_levels.append(_heading_level(heading))
+                self.sections.append(Section(
+                    heading, self._heading_levels[-1], i, None))
+        self.sections = [
+            section._replace(end=self._section_end(section.start,
+                                                   section.level))
+            for section in self.sections]
+
+    def is_current(self, notebook):
+        """Return True if the outline was built from a notebook and its
+        number of cells is unchanged.
+        """
+        return (notebook is self.notebook and
+                len(notebook.cells) == self.n_cells)
+
+    def search(self, text):
+        """Return the first markdown heading line containing a text.
+
+        Args:
+            text (str): The text to search for.
+
+        Returns:
+            str: The heading line, or None.
+        """
+        for _, lines in self._markdown:
+            for line in lines:
+                if line.startswith('#') and text in line:
+                    return line
+        return None
+
+    def find(self, section_name):
+        """Find a section by name.
+
+        The section starts at the first markdown cell with a line containing
+        `section_name`, and ends at the next heading cell of the level of
+        `section_name` or a higher one.
+
+        Args:
+            section_name (str): The name of the section, including the
+                heading level (e.g., '## Section Name').
+
+        Returns:
+            Section: The section, or None if it is not found.
+        """
+        level = _heading_level(section_name)
+        for i, lines in self._markdown:
+            for line in lines:
+                if section_name in line:
+                    return Section(line, level, i, self._section_end(i, level))
+        return None
+
+    def _section_end(self, start, level):
+        position = bisect.bisect_right(self._heading_indices, start)
+        for i, heading_level in zip(self._heading_indices[position:],
+                                    self._heading_levels[position:]):
+            if heading_level <= level:
+                return i
+        return self.n_cells
+
+
+def _heading_level(line):
+    """Return the heading level of a line, as the number of '#' of its first
+    word.
+    """
+    return line.split(' ')[0].count('#')
+
+
+def strip_outputs(nb_filename, max_output_size=None):
+    """Strip stored outputs and heavy metadata to prepare a notebook for
+    Voilà, and print a before/after payload report.
+
+    Stored outputs are removed, or only those larger than `max_output_size`
+    if it is given. Execution counts and the saved widget state are removed
+    too; the kernelspec and other notebook metadata are kept.
+
+    Args:
+        nb_filename (str): The path to the notebook file to modify.
+        max_output_size (int, optional): The maximum size in bytes of an
+            output to keep. Defaults to None, which removes all outputs.
+
+    Returns:
+        PayloadReport: The payload sizes before and after stripping.
+    """
+    with nb_pipeline.NotebookPipeline(nb_filename) as pipeline:
+        report = pipeline.strip_outputs(max_output_size)
+    print(f"{nb_filename}: {report}")
+    return report
+
+
+class PayloadReport:
+    """The payload of a notebook before and after `strip_outputs`.
+
+    Attributes:
+        before (int): The payload size in bytes before stripping.
+        after (int): The payload size in bytes after stripping.
+        outputs_removed (int): The number of outputs removed.
+        counts_cleared (int): The number of execution counts cleared.
+        widget_states_removed (int): The number of widget states removed.
+    """
+
+    def __init__(self, before, after, outputs_removed=0, counts_cleared=0,
+                 widget_states_removed=0):
+        self.before = before
+        self.after = after
+        self.outputs_removed = outputs_removed
+        self.counts_cleared = counts_cleared
+        self.widget_states_removed = widget_states_removed
+
+    @property
+    def changed(self):
+        """bool: True if anything was stripped."""
+        return bool(self.outputs_removed or self.counts_cleared or
+                    self.widget_states_removed)
+
+    def __str__(self):
+        saved = (1 - self.after / self.before) * 100 if self.before else 0
+        return (f"payload {self.before:,} -> {self.after:,} bytes "
+                f"(-{saved:.0f}%); {self.outputs_removed} outputs removed, "
+                f"{self.counts_cleared} execution counts cleared, "
+                f"{self.widget_states_removed} widget states removed")
+
+
+def _strip_outputs(notebook, max_output_size=None):
+    """Strip outputs and heavy metadata from an in-memory notebook.
+
+    Returns:
+        PayloadReport: The payload sizes before and after stripping.
+    """
+    before = _payload_size(notebook)
+    outputs_removed = counts_cleared = widget_states_removed = 0
+
+    if notebook.metadata.pop('widgets', None) is not None:
+        widget_states_removed += 1
+
+    for cell in notebook.cells:
+        if cell.metadata.pop('widgets', None) is not None:
+            widget_states_removed += 1
+        if cell.cell_type != 'code':
+            continue
+
+        if cell.execution_count is not None:
+            cell.execution_count = None
+            counts_cleared += 1
+
+        if isinstance(cell.outputs, nb_io.RawOutputs):
+            # Raw outputs are kept or removed as a whole, without decoding
+            if max_output_size is None or cell.outputs.size > max_output_size:
+                outputs_removed += 1
+                cell.outputs = []
+            continue
+
+        outputs = [output for output in cell.outputs
+                   if max_output_size is not None and
+                   _json_size(output) <= max_output_size]
+        outputs_removed += len(cell.outputs) - len(outputs)
+        for output in outputs:
+            if output.get('execution_count') is not None:
+                output.execution_count = None
+        cell.outputs = outputs
+
+    return PayloadReport(before, _payload_size(notebook), outputs_removed,
+                         counts_cleared, widget_states_removed)
+
+
+def _payload_size(notebook):
+    """Return the size in bytes of a notebook serialized as compact JSON.
+
+    Raw outputs of a notebook read in streaming mode count with their size
+    in the file, without being decoded.
+    """
+    raw_size = sum(cell.outputs.size for cell in notebook.cells
+                   if isinstance(cell.get('outputs'), nb_io.RawOutputs))
+    return _json_size(notebook) + raw_size
 
-    # Write the modified notebook to the output file
-    with open(nb_filename, 'w', encoding='utf-8') as f:
-        nbformat.write(notebook, f)
 
+def _json_size(obj):
+    return len(json.dumps(obj, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8'))
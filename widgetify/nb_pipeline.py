@@ -0,0 +1,309 @@
+"""
+nb_pipeline - Single-load Notebook Transformation Pipeline
+
+This module provides `NotebookPipeline`, which reads a Jupyter notebook once,
+applies any sequence of `nb_op` operations and the `widgetify` conversion to
+the in-memory `NotebookNode`, and writes the result once at the end. The
+write is skipped when no operation changed the notebook, and is done with an
+atomic rename otherwise, so a crash never leaves a half-written notebook.
+
+Usage:
+::
+
+    from widgetify.nb_pipeline import NotebookPipeline
+
+    with NotebookPipeline('example_colab_forms.ipynb') as pipeline:
+        pipeline.remove_open_in_colab_cell()
+        pipeline.insert_title_cells()
+        pipeline.remove_sections(['#### Install Required Packages',
+                                  '#### Debug'])
+        pipeline.widgetify()
+
+A pipeline can also start from an in-memory notebook or the bytes of a
+notebook file, e.g., received over the network, with `from_notebook` and
+`from_bytes`, and serialize the result with `to_bytes` instead of saving it.
+
+The section operations share a heading outline of the notebook (see
+`nb_op.Outline`), built once and rebuilt only after the notebook changes.
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'NotebookPipeline',
+]
+
+import os
+import logging
+
+from . import nb_io
+from . import nb_op
+from . import form2widget
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class NotebookPipeline:
+    """Load a notebook once, transform it in memory, and write it once.
+
+    Operations that modify the notebook return the pipeline itself, so calls
+    can be chained. Query operations (e.g., `search_section`) return their
+    result instead. When used as a context manager, the notebook is saved on
+    a normal exit and left untouched if an exception is raised.
+
+    Args:
+        nb_filename (str): The path to the notebook file, or None with
+            `notebook`.
+        notebook (nbformat.NotebookNode, optional): An in-memory notebook to
+            transform instead of reading `nb_filename`. Defaults to None.
+        **io_options: Options of `nb_io.read_notebook` and
+            `nb_io.write_notebook` (`trusted`, `streaming`, `json_backend`).
+            Defaults to the process-wide options of `nb_io`.
+
+    Attributes:
+        nb_filename (str): The path the notebook was read from, or None for
+            an in-memory notebook.
+        notebook (nbformat.NotebookNode): The in-memory notebook.
+        modified (bool): True if any operation changed the notebook since it
+            was loaded or last saved.
+        outline (nb_op.Outline): The heading outline of the notebook.
+    """
+
+    def __init__(self, nb_filename=None, notebook=None, **io_options):
+        if (nb_filename is None) == (notebook is None):
+            raise ValueError("Either nb_filename or notebook is required")
+        self.nb_filename = nb_filename
+        self.io_options = io_options
+        if notebook is None:
+            notebook = nb_io.read_notebook(nb_filename, **io_options)
+        self.notebook = notebook
+        self.modified = False
+        self._outline = None
+
+    @classmethod
+    def from_notebook(cls, notebook, **io_options):
+        """Create a pipeline transforming an in-memory notebook.
+
+        The notebook is transformed in place, except by `widgetify`, which
+        replaces `notebook` with the converted notebook.
+
+        Args:
+            notebook (nbformat.NotebookNode): The notebook.
+            **io_options: Options of `nb_io.write_notebook` (`trusted`,
+                `json_backend`).
+
+        Returns:
+            NotebookPipeline: The pipeline.
+        """
+        return cls(notebook=notebook, **io_options)
+
+    @classmethod
+    def from_bytes(cls, nb_bytes, **io_options):
+        """Create a pipeline transforming the content of a notebook file.
+
+        Args:
+            nb_bytes (bytes): The content of the notebook file.
+            **io_options: Options of `nb_io.read_notebook_bytes` and
+                `nb_io.write_notebook` (`trusted`, `json_backend`).
+
+        Returns:
+            NotebookPipeline: The pipeline.
+        """
+        io_options.pop('streaming', None)
+        return cls(notebook=nb_io.read_notebook_bytes(nb_bytes, **io_options),
+                   **io_options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.save()
+
+    def apply(self, operation, *args, **kwargs):
+        """Apply a custom operation to the in-memory notebook.
+
+        Args:
+            operation (callable): A function called as
+                ``operation(notebook, *args, **kwargs)``. It must return a
+                truthy value if it modified the notebook.
+            *args: Positional arguments passed to `operation`.
+            **kwargs: Keyword arguments passed to `operation`.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        if operation(self.notebook, *args, **kwargs):
+            self.modified = True
+            self._outline = None
+        return self
+
+    @property
+    def outline(self):
+        """nb_op.Outline: The heading outline of the notebook, built on first
+        use and after the notebook changes.
+        """
+        if self._outline is None or not self._outline.is_current(
+                self.notebook):
+            self._outline = nb_op.Outline(self.notebook)
+        return self._outline
+
+    def insert_title_cells(self):
+        """Insert a markdown title cell above each Colab Form or widgets cell.
+
+        See `nb_op.insert_title_cells`.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        return self.apply(nb_op._insert_title_cells)
+
+    def remove_open_in_colab_cell(self):
+        """Remove the open-in-colab cell.
+
+        See `nb_op.remove_open_in_colab_cell`.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        return self.apply(nb_op._remove_open_in_colab_cell)
+
+    def extract_and_comment_first_code_cell(self):
+        """Extract the first code cell and comment out its content.
+
+        See `nb_op.extract_and_comment_first_code_cell`.
+
+        Returns:
+            nbformat.notebooknode.NotebookNode: The first code cell, or None
+            if no code cell is found.
+        """
+        first_code_cell = nb_op._extract_and_comment_first_code_cell(
+            self.notebook)
+        if first_code_cell:
+            self.modified = True
+            self._outline = None
+        return first_code_cell
+
+    def search_section(self, text):
+        """Search for a markdown heading containing the specified text.
+
+        See `nb_op.search_section`.
+
+        Returns:
+            str: The full line of the matching heading, or None.
+        """
+        return nb_op._search_section(self.notebook, text, self.outline)
+
+    def extract_section(self, section_name, markdown_only=False):
+        """Extract a specific section and its content.
+
+        See `nb_op.extract_section`.
+
+        Returns:
+            list: The cells belonging to the section.
+        """
+        return nb_op._extract_section(self.notebook, section_name,
+                                      markdown_only, self.outline)
+
+    def remove_section(self, section_name, markdown_only=False):
+        """Remove a specific section and its content.
+
+        See `nb_op.remove_section`.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        return self.apply(nb_op._remove_section, section_name, markdown_only,
+                          self.outline)
+
+    def remove_sections(self, section_names, markdown_only=False):
+        """Remove several sections and their content in a single pass.
+
+        See `nb_op.remove_sections`.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        return self.apply(nb_op._remove_sections, section_names,
+                          markdown_only, self.outline)
+
+    def strip_outputs(self, max_output_size=None):
+        """Strip stored outputs, execution counts and widget state.
+
+        See `nb_op.strip_outputs`.
+
+        Returns:
+            nb_op.PayloadReport: The payload sizes before and after stripping.
+        """
+        report = nb_op._strip_outputs(self.notebook, max_output_size)
+        if report.changed:
+            self.modified = True
+        return report
+
+    def widgetify(self, cache=None):
+        """Convert Colab Forms to Jupyter Widgets.
+
+        See `form2widget.widgetify`.
+
+        Args:
+            cache (cache.ConversionCache, optional): A cache of converted
+                form cells.
+
+        Returns:
+            NotebookPipeline: The pipeline itself.
+        """
+        new_notebook = form2widget._widgetify(self.notebook, cache)
+        if new_notebook is not None:
+            self.notebook = new_notebook
+            self.modified = True
+            self._outline = None
+        return self
+
+    def save(self, nb_filename=None):
+        """Write the notebook if it was modified.
+
+        The notebook is serialized to a temporary file in the destination
+        directory, which then atomically replaces the destination file (see
+        `nb_io.write_notebook`).
+
+        Args:
+            nb_filename (str, optional): The path to write to. Defaults to the
+                path the notebook was read from. Writing to another path
+                always writes, even if the notebook was not modified.
+
+        Returns:
+            bool: True if the file was written, False if the write was
+            skipped.
+
+        Raises:
+            ValueError: If no path is given for an in-memory notebook.
+        """
+        if nb_filename is None:
+            nb_filename = self.nb_filename
+        if nb_filename is None:
+            raise ValueError("No path to save an in-memory notebook to")
+        same_file = (self.nb_filename is not None and
+                     os.path.exists(nb_filename) and
+                     os.path.samefile(nb_filename, self.nb_filename))
+        if same_file and not self.modified:
+            logger.debug(f"{nb_filename}: unchanged, skip writing")
+            return False
+
+        nb_io.write_notebook(self.notebook, nb_filename,
+                             trusted=self.io_options.get('trusted'),
+                             json_backend=self.io_options.get('json_backend'))
+        if same_file:
+            self.modified = False
+        return True
+
+    def to_bytes(self):
+        """Serialize the notebook into the content of a notebook file.
+
+        Returns:
+            bytes: The content of the notebook file.
+        """
+        return nb_io.notebook_to_bytes(
+            self.notebook, trusted=self.io_options.get('trusted'),
+            json_backend=self.io_options.get('json_backend'))
@@ -0,0 +1,369 @@
+"""
+nb_profile - Per-cell Execution Profiling
+
+This module provides `Profiler`, which `nb_exec.run_code_cells` and
+`nb_exec.run_code_cell` use to record, for each cell and for each Python,
+shell or magic chunk of a cell, its wall time, CPU time and peak memory.
+With ``detail='cprofile'`` or ``detail='tracemalloc'``, the top functions
+by cumulative time, or the top lines by allocated memory, are also kept for
+the slowest cells.
+
+The profiles are collected into a `ProfileReport`, which can be printed or
+saved as a JSON file, and each cell profile is passed to the hooks added
+with `add_hook` as soon as the cell ends, e.g., to forward the numbers to a
+metrics system.
+
+CPU time is the time of the thread running the cell, plus that of the child
+processes it waited for (e.g., shell commands). Memory is traced with
+`tracemalloc` while profiled cells run; it is process-wide, so the peaks of
+cells run concurrently in parallel mode include each other's allocations.
+
+Usage:
+::
+
+    from widgetify import nb_exec, nb_profile
+
+    profiler = nb_profile.Profiler(detail='cprofile')
+    report = nb_exec.run_code_cells(cells, profile=profiler)
+    print(report.profile)
+    report.profile.save('profile.json')
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'Profiler',
+    'ProfileReport',
+    'CellProfile',
+    'ChunkProfile',
+    'add_hook',
+    'remove_hook',
+]
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+import contextlib
+import collections
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The functions called with each cell profile
+_hooks = []
+
+# The number of profiled cells running, and whether tracing was started for
+# them, guarded by the lock
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+class ChunkProfile(collections.namedtuple(
+        'ChunkProfile',
+        ['kind', 'line', 'wall_time', 'cpu_time', 'peak_memory'])):
+    """The profile of a chunk of a cell.
+
+    Attributes:
+        kind (str): ``'python'``, ``'shell'`` or ``'magic'``.
+        line (int): The first line of the chunk in the translated cell.
+        wall_time (float): The wall time in seconds.
+        cpu_time (float): The CPU time in seconds.
+        peak_memory (int): The peak traced memory in bytes.
+    """
+
+
+class CellProfile(collections.namedtuple(
+        'CellProfile',
+        ['index', 'source', 'wall_time', 'cpu_time', 'peak_memory', 'chunks',
+         'error', 'details'])):
+    """The profile of a cell.
+
+    Attributes:
+        index (int): The index of the cell among the profiled code cells.
+        source (str): The first line of the cell.
+        wall_time (float): The wall time in seconds.
+        cpu_time (float): The CPU time in seconds.
+        peak_memory (int): The peak traced memory in bytes.
+        chunks (list of ChunkProfile): The profiles of the chunks run.
+        error (str): The error message if the cell failed, or None.
+        details (list of dict): The top functions or lines of the detailed
+            profile, or None.
+    """
+
+    def to_dict(self):
+        """Return the profile as a JSON-serializable dict.
+        """
+        profile = self._asdict()
+        profile['chunks'] = [chunk._asdict() for chunk in self.chunks]
+        return profile
+
+
+class ProfileReport:
+    """The cell profiles of a run.
+
+    Args:
+        cells (list of CellProfile): The profiles, in cell order.
+
+    Attributes:
+        cells (list of CellProfile): The profiles, in cell order.
+
+    Examples:
+        >>> report = ProfileReport([
+        ...     CellProfile(0, 'import os', 0.5, 0.25, 1024, [], None, None),
+        ...     CellProfile(1, '!pip install x', 2.0, 0.5, 0, [], None, None)])
+        >>> [cell.index for cell in report.slowest(1)]
+        [1]
+        >>> print(report)
+        cell   wall (s)    cpu (s)  peak (KiB)  source
+           0      0.500      0.250         1.0  import os
+           1      2.000      0.500         0.0  !pip install x
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    def slowest(self, n=None):
+        """Return the `n` slowest cells by wall time, slowest first.
+        """
+        cells = sorted(self.cells, key=lambda cell: -cell.wall_time)
+        return cells if n is None else cells[:n]
+
+    def to_dict(self):
+        """Return the report as a JSON-serializable dict.
+        """
+        return {'cells': [cell.to_dict() for cell in self.cells]}
+
+    def save(self, filename):
+        """Write the report to a JSON file.
+
+        Args:
+            filename (str): The path to the JSON file.
+        """
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def __str__(self):
+        lines = [f"{'cell':>4} {'wall (s)':>10} {'cpu (s)':>10} "
+                 f"{'peak (KiB)':>11}  source"]
+        for cell in self.cells:
+            status = f"  ERROR: {cell.error}" if cell.error else ''
+            lines.append(f"{cell.index:>4} {cell.wall_time:>10.3f} "
+                         f"{cell.cpu_time:>10.3f} "
+                         f"{cell.peak_memory / 1024:>11.1f}  "
+                         f"{cell.source}{status}")
+        return '\n'.join(lines)
+
+
+def add_hook(hook):
+    """Add a function to call with each `CellProfile` as its cell ends.
+
+    The hook is called on the thread that ran the cell. An exception raised
+    by a hook is logged and otherwise ignored.
+
+    Args:
+        hook (callable): The function, taking a `CellProfile`.
+
+    Returns:
+        callable: The hook, so the function can be used as a decorator.
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """Remove a function added with `add_hook`.
+    """
+    _hooks.remove(hook)
+
+
+class Profiler:
+    """Collect the profiles of the cells run by `nb_exec`.
+
+    Args:
+        detail (str, optional): ``'cprofile'`` to keep the top functions by
+            cumulative time, or ``'tracemalloc'`` to keep the top lines by
+            allocated memory, of the slowest cells. Defaults to None (no
+            detail).
+        top_cells (int, optional): The number of slowest cells whose details
+            are kept. Defaults to 3.
+        top_n (int, optional): The number of functions or lines kept per
+            cell. Defaults to 10.
+
+    Examples:
+        >>> profiler = Profiler()
+        >>> with profiler.cell('x = 1') as probe:
+        ...     with probe.chunk('python', 1):
+        ...         x = sum(range(1000))
+        >>> cell, = profiler.report().cells
+        >>> cell.index, cell.source, [c.kind for c in cell.chunks]
+        (0, 'x = 1', ['python'])
+    """
+
+    def __init__(self, detail=None, top_cells=3, top_n=10):
+        if detail not in (None, 'cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profile detail: {detail!r}")
+        self.detail = detail
+        self.top_cells = top_cells
+        self.top_n = top_n
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def cell(self, source, index=None):
+        """Profile a cell run in the `with` block.
+
+        Args:
+            source (str): The source of the cell.
+            index (int, optional): The index of the cell. Defaults to the
+                number of cells profiled so far.
+
+        Yields:
+            _CellProbe: The probe, whose `chunk` method profiles each chunk,
+            and whose `error` attribute is set to the error of the cell.
+        """
+        if index is None:
+            with self._lock:
+                index = len(self._profiles)
+        probe = _CellProbe(
+            cProfile.Profile() if self.detail == 'cprofile' else None)
+        _start_tracing()
+        if self.detail == 'tracemalloc':
+            before = tracemalloc.take_snapshot()
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_time()
+        try:
+            yield probe
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = _cpu_time() - cpu_start
+            details = None
+            if probe.profile is not None:
+                details = self._function_details(probe.profile)
+            elif self.detail == 'tracemalloc':
+                details = self._line_details(before)
+            _stop_tracing()
+
+            lines = source.strip().splitlines()
+            cell_profile = CellProfile(
+                index, lines[0] if lines else '', wall_time, cpu_time,
+                max((chunk.peak_memory for chunk in probe.chunks), default=0),
+                probe.chunks, probe.error, details)
+            with self._lock:
+                self._profiles.append(cell_profile)
+            for hook in list(_hooks):
+                try:
+                    hook(cell_profile)
+                except Exception:
+                    logger.exception(f"Profile hook {hook!r} failed")
+
+    def report(self):
+        """Return the report of the cells profiled so far.
+
+        Returns:
+            ProfileReport: The profiles in cell order, with the details of
+            the `top_cells` slowest cells only.
+        """
+        with self._lock:
+            profiles = sorted(self._profiles, key=lambda p: p.index)
+        slowest = {profile.index
+                   for profile in ProfileReport(profiles).slowest(
+                       self.top_cells)}
+        return ProfileReport([
+            profile if profile.index in slowest
+            else profile._replace(details=None)
+            for profile in profiles])
+
+    def _function_details(self, profile):
+        profile.create_stats()
+        if not profile.stats:
+            return []
+        rows = sorted(pstats.Stats(profile).stats.items(),
+                      key=lambda item: -item[1][3])
+        return [{'function': f"{os.path.basename(filename)}:{line}({name})",
+                 'calls': calls, 'total_time': total_time,
+                 'cumulative_time': cumulative_time}
+                for (filename, line, name),
+                (_, calls, total_time, cumulative_time, _)
+                in rows[:self.top_n + 1]
+                if name != '<built-in method builtins.exec>'][:self.top_n]
+
+    def _line_details(self, before):
+        after = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = after.compare_to(before, 'lineno')
+        return [{'line': str(stat.traceback[0]), 'size': stat.size_diff,
+                 'count': stat.count_diff}
+                for stat in stats[:self.top_n]]
+
+
+class _CellProbe:
+    """The chunk profiles and the error of a profiled cell.
+    """
+
+    def __init__(self, profile=None):
+        self.chunks = []
+        self.error = None
+        self.profile = profile
+
+    @contextlib.contextmanager
+    def chunk(self, kind, line):
+        """Profile a chunk of the cell run in the `with` block.
+        """
+        profile = self.profile
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active, e.g., in a parallel cell
+                profile = None
+        _reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_time()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self.chunks.append(ChunkProfile(
+                kind, line, time.perf_counter() - wall_start,
+                _cpu_time() - cpu_start, tracemalloc.get_traced_memory()[1]))
+
+
+def _cpu_time():
+    """Return the CPU time of the current thread and the waited-for child
+    processes.
+    """
+    times = os.times()
+    return time.thread_time() + times.children_user + times.children_system
+
+
+def _reset_peak():
+    # tracemalloc.reset_peak is new in Python 3.9
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    if reset_peak is not None:
+        reset_peak()
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if not _tracing_users and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if not _tracing_users and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
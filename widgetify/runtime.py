@@ -0,0 +1,913 @@
+"""
+runtime - Building Jupyter Widgets Forms from FormSpecs
+
+This module is imported by converted notebooks. A converted form cell
+describes its form as a FormSpec, a JSON-serializable dict produced by
+`form2widget.extract_form_spec`, and decorates a function holding the rest of
+the cell's code:
+::
+
+    from widgetify.runtime import form
+
+    @form({'fields': [{'name': 'num', 'type': 'number', 'value': 0.88}]})
+    def form1():
+        print('num:', num)
+
+The decorator builds the widgets, the Submit button and the output area from
+the spec, and displays them. On submit, the values of the widgets are assigned
+to the global variables named after the fields, and the function is run with
+its output captured in the output area.
+
+Forms are reactive: after a submit, the forms of the same notebook that read
+a variable the submitted form changed are run again, and so on transitively,
+in dependency order. A downstream form whose inputs are equal to those of its
+last run is skipped.
+
+Forms whose `@title` has the ``{"run":"auto"}`` setting are also submitted
+when a widget value changes. A burst of changes, such as dragging a slider or
+typing, is debounced into a single run; a newer change supersedes a run that
+is still waiting.
+
+In background mode (see `set_options`), a submitted form runs on a worker
+thread, so a long computation does not freeze the other widgets of the
+kernel. While it runs, the Submit button shows the run is in progress and a
+Cancel button appears; further submits are coalesced into one more run with
+the latest values. The standard output and error of the worker thread go to
+the form's output area.
+
+A form cell using top-level `await` (or `async for`/`async with`) is
+converted into a coroutine function. Its submits run as tasks on the kernel's
+event loop, so the I/O-bound work of several forms overlaps; the Cancel
+button cancels the task.
+
+Each form records its usage and latency in a `metrics.FormMetrics`: the
+number of submits and runs, the latency distribution of the runs, the number
+of errors, and the time since the last run. `metrics` returns them for all
+the forms, and with the ``metrics_log`` option, each run is also appended to
+a JSON lines file.
+
+A FormSpec has the form ``{'fields': [field, ...]}``, where each field has:
+
+* ``name``: The name of the variable.
+* ``type``: One of ``string``, ``raw``, ``number``, ``integer``, ``boolean``,
+  ``date`` and ``slider``.
+* ``value``: The initial value, or ``expr``: the source of an expression
+  evaluated in the notebook's namespace to get the initial value.
+* ``options`` and ``allow-input``: The choices of a dropdown, and whether
+  other input is allowed. A dropdown with very many options is indexed (see
+  `set_options`), and shows only the options matching its input box.
+* ``options_source``: Instead of ``options``, where the options of an indexed
+  dropdown are loaded from when the widget is built, so they are stored
+  neither in the notebook nor in the spec: ``file:PATH``, a text file with one
+  option per line, or the name of a variable of the notebook or of a module
+  attribute (``package.module.name``), holding the options or a callable
+  returning them.
+* ``min``, ``max`` and ``step``: The range of a slider.
+
+The optional ``reads`` and ``writes`` lists of a FormSpec name the global
+variables the function reads and assigns, besides the fields, and the
+optional ``'run': 'auto'`` item makes the form run on change. The optional
+``mutates`` list names the variables the function mutates in place (e.g.,
+``df['x'] = n``); as they stay the same objects, they are taken as changed
+after every successful run instead of being compared.
+
+A form function can also be defined in a module, e.g., one exported by
+`widgetify.export`, and bound to the namespace of the notebook with the
+``namespace`` argument of `form`, so its code reads and assigns the
+notebook's variables while its bytecode comes from the module.
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'form',
+    'Form',
+    'RunCancelled',
+    'build_widget',
+    'set_options',
+    'metrics',
+]
+
+import sys
+import time
+import types
+import importlib
+import ctypes
+import asyncio
+import datetime
+import logging
+import threading
+import traceback
+import contextlib
+import contextvars
+import concurrent.futures
+
+import ipywidgets as widgets
+from IPython.display import display
+
+from .input_dropdown import create_input_dropdown, InputDropdown, OptionIndex
+from .metrics import FormMetrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The widget classes of the input box field types
+_INPUT_WIDGETS = {
+    'string': widgets.Text,
+    'raw': widgets.Text,
+    'number': widgets.FloatText,
+    'integer': widgets.IntText,
+    'boolean': widgets.Checkbox,
+    'date': widgets.DatePicker,
+}
+
+# The layout shared by all dropdowns, so the front-end holds one layout model
+# instead of one per dropdown
+_auto_layout = None
+
+# The forms of each namespace in the order they were created, keyed by the
+# id of the namespace, as {id: (namespace, {function name: Form})}
+_registry = {}
+
+# Stands for an unset variable in the snapshots of variables
+_UNSET = object()
+
+# The worker threads running the forms in background mode
+_executor = None
+
+# The Output widget receiving the standard output and error of the worker
+# thread or asyncio task that is running a form
+_current_output = contextvars.ContextVar('widgetify_output', default=None)
+
+default_options = {
+    # Run the dependent forms again after a submit
+    'reactive': True,
+    # Seconds a widget value of an auto-run form must stay unchanged before
+    # the form is run
+    'delay': 0.3,
+    # Run submitted forms on worker threads
+    'background': False,
+    # The number of worker threads
+    'workers': 4,
+    # The JSON lines file each run of a form is appended to
+    'metrics_log': None,
+    # Dropdowns with more options are indexed, showing only the options
+    # matching the text typed in their input box
+    'indexed_options': 1000,
+}
+
+
+class RunCancelled(KeyboardInterrupt):
+    """Raised in a worker thread to cancel the run of a form.
+    """
+
+
+def set_options(reactive=None, delay=None, background=None, workers=None,
+                metrics_log=None, indexed_options=None):
+    """Change the default options of the forms created afterwards.
+
+    Options left as None keep their current value; `metrics_log` also
+    applies to the forms already created.
+
+    Args:
+        reactive (bool, optional): Run the dependent forms again after a
+            submit.
+        delay (float, optional): The debounce delay in seconds of auto-run
+            forms.
+        background (bool, optional): Run submitted forms on worker threads.
+        workers (int, optional): The number of worker threads. It only takes
+            effect before the first background run.
+        metrics_log (str, optional): The path to a JSON lines file to append
+            each run of a form to, or ``''`` to stop logging.
+        indexed_options (int, optional): The number of options above which a
+            dropdown is an indexed `InputDropdown`, which sends the browser
+            only the options matching its input.
+    """
+    options = {'reactive': reactive, 'delay': delay,
+               'background': background, 'workers': workers,
+               'metrics_log': metrics_log, 'indexed_options': indexed_options}
+    default_options.update(
+        {key: value for key, value in options.items() if value is not None})
+    if metrics_log is not None:
+        for _, forms in _registry.values():
+            for f in forms.values():
+                f.metrics.log = metrics_log or None
+
+
+def metrics():
+    """Return the usage and latency metrics of the forms.
+
+    Returns:
+        dict: The `FormMetrics.summary` of each form, by function name, in
+        the order the forms were created.
+    """
+    return {name: f.metrics.summary()
+            for _, forms in _registry.values()
+            for name, f in forms.items()}
+
+
+def form(spec, reactive=None, delay=None, background=None, namespace=None):
+    """Return a decorator that turns a function into a displayed form.
+
+    Args:
+        spec (dict): The FormSpec of the form.
+        reactive (bool, optional): Run the dependent forms again after a
+            submit. Defaults to the option of `set_options`.
+        delay (float, optional): The debounce delay in seconds of an
+            auto-run form. Defaults to the option of `set_options`.
+        background (bool, optional): Run submits on a worker thread.
+            Defaults to the option of `set_options`.
+        namespace (dict, optional): The global namespace to run the function
+            in, instead of the namespace it was defined in, e.g., the
+            `globals()` of a notebook for a function defined in a module.
+            Defaults to None.
+
+    Returns:
+        callable: A decorator taking the function that runs the form's code,
+        and returning the displayed `Form`.
+    """
+    def decorator(fn):
+        if namespace is not None:
+            fn = _bind(fn, namespace)
+        new_form = Form(spec, fn, reactive, delay, background)
+        new_form.display()
+        return new_form
+    return decorator
+
+
+def _bind(fn, namespace):
+    """Return a copy of a function whose global namespace is `namespace`.
+
+    The copy shares the code object, so no code is compiled.
+
+    Examples:
+        >>> def f():
+        ...     return x
+        >>> _bind(f, {'x': 1})()
+        1
+    """
+    bound = types.FunctionType(fn.__code__, namespace, fn.__name__,
+                               fn.__defaults__, fn.__closure__)
+    bound.__kwdefaults__ = fn.__kwdefaults__
+    bound.__qualname__ = fn.__qualname__
+    bound.__doc__ = fn.__doc__
+    return bound
+
+
+class Form:
+    """A form of widgets built from a FormSpec.
+
+    The form is registered with the other forms of the namespace of `fn`;
+    a form created again from a function of the same name (i.e., a re-run
+    cell) replaces the previous one.
+
+    Args:
+        spec (dict): The FormSpec of the form.
+        fn (callable): The function run on submit, without arguments. The
+            field values are assigned to its global namespace.
+        reactive (bool, optional): Run the dependent forms again after a
+            submit. Defaults to the option of `set_options`.
+        delay (float, optional): The debounce delay in seconds of an
+            auto-run form. Defaults to the option of `set_options`.
+        background (bool, optional): Run submits on a worker thread.
+            Defaults to the option of `set_options`.
+
+    Attributes:
+        spec (dict): The FormSpec of the form.
+        fn (callable): The function run on submit.
+        reactive (bool): Whether the dependent forms are run after a submit.
+        reads (set): The global variables read by `fn`, besides the fields.
+        writes (set): The global variables assigned by the form, including
+            the fields and `mutates`.
+        mutates (set): The global variables mutated in place by `fn`.
+        widgets (list): The widgets of the fields, in the order of the spec.
+        box (ipywidgets.VBox): The box holding the widgets of the fields.
+        submit_button (ipywidgets.Button): The Submit button.
+        output (ipywidgets.Output): The area capturing the output of `fn`.
+        auto_run (bool): Whether a change of a widget value submits the form.
+        background (bool): Whether submits run on a worker thread.
+        cancel_button (ipywidgets.Button): The Cancel button, shown while a
+            background run is in progress.
+        metrics (metrics.FormMetrics): The usage and latency metrics, carried
+            over from the form it replaces, if any.
+    """
+
+    def __init__(self, spec, fn, reactive=None, delay=None, background=None):
+        if reactive is None:
+            reactive = default_options['reactive']
+        if delay is None:
+            delay = default_options['delay']
+        if background is None:
+            background = default_options['background']
+        self.spec = spec
+        self.fn = fn
+        self.reactive = reactive
+        self.background = background
+        self.reads = set(spec.get('reads', ()))
+        self.mutates = set(spec.get('mutates', ()))
+        self.writes = ({field['name'] for field in spec['fields']} |
+                       set(spec.get('writes', ())) | self.mutates)
+        self.widgets = [build_widget(field, fn.__globals__)
+                        for field in spec['fields']]
+        self.box = widgets.VBox(self.widgets)
+        self.submit_button = widgets.Button(description="Submit")
+        self.output = widgets.Output()
+        self.submit_button.on_click(lambda button: self.submit())
+        self.cancel_button = widgets.Button(
+            description="Cancel", layout=widgets.Layout(display='none'))
+        self.cancel_button.on_click(lambda button: self.cancel())
+
+        # The state of the background and async runs: whether a run is in
+        # progress, whether another one was requested, and the running worker
+        # thread or task
+        self.is_async = asyncio.iscoroutinefunction(fn)
+        self._lock = threading.Lock()
+        self._busy = False
+        self._pending = False
+        self._thread_id = None
+        self._task = None
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+        self.auto_run = spec.get('run') == 'auto'
+        self._debouncer = _Debouncer(delay, self.submit)
+        if self.auto_run:
+            for widget in self.widgets:
+                widget.observe(lambda change: self._debouncer(),
+                               names='value')
+
+        # The values of `reads` at the last run, or None if never run
+        self._inputs = None
+        namespace = fn.__globals__
+        forms = _registry.setdefault(id(namespace), (namespace, {}))[1]
+        previous = forms.get(fn.__name__)
+        self.metrics = (previous.metrics if previous is not None else
+                        FormMetrics(fn.__name__,
+                                    default_options['metrics_log']))
+        forms[fn.__name__] = self
+
+    @property
+    def values(self):
+        """dict: The current values of the fields, by variable name.
+        """
+        return {field['name']: widget.value
+                for field, widget in zip(self.spec['fields'], self.widgets)}
+
+    def display(self):
+        """Display the widgets, the Submit button and the output area.
+        """
+        buttons = self.submit_button
+        if self.background or self.is_async:
+            buttons = widgets.HBox([self.submit_button, self.cancel_button])
+        display(self.box, buttons, self.output)
+
+    def cancel(self):
+        """Cancel the waiting and running submits of the form.
+
+        An auto-run waiting for the debounce delay and a coalesced submit are
+        dropped. A background run in progress is interrupted by raising
+        `RunCancelled` in its worker thread; a thread blocked in a system
+        call (e.g., `time.sleep`) is interrupted when the call returns. An
+        async run is cancelled at its current `await`.
+        """
+        self._debouncer.cancel()
+        with self._lock:
+            self._pending = False
+            if self._task is not None:
+                self._task.cancel()
+            if self._thread_id is not None:
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(self._thread_id),
+                    ctypes.py_object(RunCancelled))
+
+    def submit(self):
+        """Assign the field values to their variables and run the function,
+        then run the dependent forms if the form is reactive.
+
+        An exception raised by the function is shown in the output area, and
+        stops the dependent forms from running.
+
+        In background mode, or if the function is a coroutine function, the
+        run is started on a worker thread or as a task of the kernel's event
+        loop, or, if a run is in progress, another run is requested once it
+        ends.
+
+        Returns:
+            list of Form: The dependent forms that were run; always empty in
+            background mode and for a coroutine function.
+        """
+        self.metrics.record_submit()
+        return self._start()
+
+    def _start(self):
+        """Start a submitted run; see `submit`.
+        """
+        self._debouncer.cancel()
+        if not (self.background or self.is_async):
+            return self._submit()
+
+        with self._lock:
+            if self._busy:
+                self._pending = True
+                return []
+            self._busy = True
+        self._show_running(True)
+
+        if self.is_async:
+            coro = self._run_tasks()
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                loop.create_task(coro)
+            elif self._loop is not None and self._loop.is_running():
+                # Submitted from a worker thread
+                asyncio.run_coroutine_threadsafe(coro, self._loop)
+            else:
+                asyncio.run(coro)
+            return []
+
+        global _executor
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                default_options['workers'], thread_name_prefix='widgetify')
+        _executor.submit(self._run_in_background)
+        return []
+
+    def _submit(self):
+        if self.is_async:
+            # A dependent coroutine form runs as a task of its own, which
+            # runs its own dependents when it ends
+            self._start()
+            return []
+        changed = self.run()
+        if not self.reactive or not changed:
+            return []
+        return _run_dependents(self, changed)
+
+    def run(self):
+        """Assign the field values to their variables and run the function.
+
+        Returns:
+            set: The variables of `writes` whose values changed, or an empty
+            set if the function raised an exception.
+        """
+        namespace = self.fn.__globals__
+        before = _snapshot(namespace, self.writes)
+        namespace.update(self.values)
+        self._inputs = _snapshot(namespace, self.reads)
+
+        succeeded = False
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            if threading.current_thread() is threading.main_thread():
+                with self.output:
+                    self.output.clear_output()
+                    self.fn()
+                    succeeded = True
+            else:
+                # The Output context manager captures the messages of the
+                # kernel's current request, which a worker thread does not
+                # have
+                self.output.outputs = ()
+                with _route_output(self.output):
+                    try:
+                        self.fn()
+                        succeeded = True
+                    except Exception:
+                        self.output.append_stderr(traceback.format_exc())
+            status = 'ok' if succeeded else 'error'
+        except RunCancelled:
+            status = 'cancelled'
+            raise
+        finally:
+            self.metrics.record_run(time.perf_counter() - start, status)
+        if not succeeded:
+            return set()
+        return self._changed(before)
+
+    async def _run_tasks(self):
+        """Run the submits of a coroutine form until no more are requested.
+        """
+        with self._lock:
+            self._task = asyncio.current_task()
+        while True:
+            try:
+                changed = await self.run_async()
+                if self.reactive and changed:
+                    _run_dependents(self, changed)
+            except asyncio.CancelledError:
+                self.output.append_stderr("Cancelled\n")
+            except Exception:
+                logger.exception(f"{self.fn.__name__} failed")
+            with self._lock:
+                if not self._pending:
+                    self._busy = False
+                    self._task = None
+                    break
+                self._pending = False
+        self._show_running(False)
+
+    async def run_async(self):
+        """Assign the field values to their variables and await the
+        coroutine function.
+
+        Returns:
+            set: The variables of `writes` whose values changed, or an empty
+            set if the function raised an exception.
+        """
+        namespace = self.fn.__globals__
+        before = _snapshot(namespace, self.writes)
+        namespace.update(self.values)
+        self._inputs = _snapshot(namespace, self.reads)
+
+        # Other tasks run while this one awaits, so the output is routed by
+        # task instead of with the Output context manager
+        self.output.outputs = ()
+        start = time.perf_counter()
+        status = 'error'
+        with _route_output(self.output):
+            try:
+                await self.fn()
+                status = 'ok'
+            except asyncio.CancelledError:
+                status = 'cancelled'
+                raise
+            except Exception:
+                self.output.append_stderr(traceback.format_exc())
+                return set()
+            finally:
+                self.metrics.record_run(time.perf_counter() - start, status)
+        return self._changed(before)
+
+    def _changed(self, before):
+        """Return the variables of `writes` changed by a successful run.
+
+        Args:
+            before (dict): The values of `writes` before the run.
+        """
+        namespace = self.fn.__globals__
+        changed = {name for name, value in before.items()
+                   if not _same(value, namespace.get(name, _UNSET))}
+        # A variable mutated in place is still the same object; a module
+        # (e.g., np in np.random.seed(n)) is not data
+        changed.update(
+            name for name in self.mutates if name in namespace and
+            not isinstance(namespace[name], types.ModuleType))
+        return changed
+
+    def _run_in_background(self):
+        """Run the submits of the form on a worker thread until no more are
+        requested.
+        """
+        done = False
+        try:
+            while True:
+                cancelled = False
+                try:
+                    with self._lock:
+                        self._thread_id = threading.get_ident()
+                    self._submit()
+                except RunCancelled:
+                    cancelled = True
+                except Exception:
+                    logger.exception(f"{self.fn.__name__} failed")
+                finally:
+                    self._end_cancellable()
+                if cancelled:
+                    self.output.append_stderr("Cancelled\n")
+                with self._lock:
+                    if not self._pending:
+                        self._busy = False
+                        done = True
+                        break
+                    self._pending = False
+        finally:
+            # A RunCancelled delivered outside the run must not leave the
+            # form busy forever
+            if not done:
+                with self._lock:
+                    self._busy = False
+                    self._pending = False
+            self._show_running(False)
+
+    def _end_cancellable(self):
+        """Stop `cancel` from interrupting the current thread, and drop a
+        `RunCancelled` it requested that was not raised yet.
+
+        The exception is raised asynchronously, at the next check of the
+        interpreter, so it may still be pending after the run ended.
+        """
+        while True:
+            try:
+                with self._lock:
+                    self._thread_id = None
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                        ctypes.c_ulong(threading.get_ident()), None)
+                return
+            except RunCancelled:
+                # Raised before the lock was taken; the run already ended
+                pass
+
+    def _show_running(self, running):
+        self.submit_button.description = "Running..." if running else "Submit"
+        self.cancel_button.layout.display = None if running else 'none'
+
+    def _inputs_changed(self):
+        """Return True if the variables the form reads changed since its last
+        run.
+        """
+        if self._inputs is None:
+            return True
+        namespace = self.fn.__globals__
+        return any(not _same(value, namespace.get(name, _UNSET))
+                   for name, value in self._inputs.items())
+
+
+class _Debouncer:
+    """Call a function once calls have stopped for a delay.
+
+    Each call restarts the delay, so the function runs once after a burst of
+    calls. The delay is timed on the running asyncio event loop, i.e., the
+    kernel's, so the function runs in the kernel's main thread; without a
+    running loop, the function is called at once.
+    """
+
+    def __init__(self, delay, func):
+        self.delay = delay
+        self.func = func
+        self._handle = None
+
+    def __call__(self):
+        self.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.func()
+            return
+        self._handle = loop.call_later(self.delay, self._fire)
+
+    def cancel(self):
+        """Cancel the pending call, if any.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _fire(self):
+        self._handle = None
+        self.func()
+
+
+def _run_dependents(source, changed):
+    """Run the forms depending on the changed variables of a form.
+
+    The forms reachable from `source` through variables written by one form
+    and read by another are run in topological order, with the notebook
+    order breaking ties and cycles. A form is skipped if none of the
+    variables it reads changed since its last run, unless it reads a
+    variable mutated in place.
+
+    A coroutine form is started as a task instead, which runs the forms
+    depending on the variables it changed once it ends; the forms depending
+    only on those variables are left to it.
+
+    Returns:
+        list of Form: The forms that were run or started.
+
+    Examples:
+        >>> namespace = {}
+        >>> exec('def form1():\\n'
+        ...      '    global total\\n'
+        ...      '    total = n * 2\\n'
+        ...      'async def form2():\\n'
+        ...      '    global result\\n'
+        ...      '    result = total + 1\\n', namespace)
+        >>> source = Form({'fields': [{'name': 'n', 'type': 'integer',
+        ...                            'value': 3}], 'writes': ['total']},
+        ...               namespace['form1'])
+        >>> dependent = Form({'fields': [], 'reads': ['total'],
+        ...                   'writes': ['result']}, namespace['form2'])
+        >>> # Outside a kernel, the output area is cleared with terminal codes
+        >>> import io
+        >>> with contextlib.redirect_stdout(io.StringIO()):
+        ...     run = source.submit()
+        >>> [f.fn.__name__ for f in run]
+        ['form2']
+        >>> namespace['total'], namespace['result']
+        (6, 7)
+    """
+    namespace = source.fn.__globals__
+    forms = [f for f in _registry[id(namespace)][1].values()
+             if f is not source]
+
+    # Find the forms reachable from the source, and their dependencies
+    readers = {}
+    for f in forms:
+        for name in f.reads:
+            readers.setdefault(name, []).append(f)
+    reachable = []
+    pending = list(changed)
+    seen = {id(source)}
+    for name in pending:
+        for f in readers.get(name, ()):
+            if id(f) not in seen:
+                seen.add(id(f))
+                reachable.append(f)
+                pending.extend(f.writes)
+
+    # Order them topologically (Kahn's algorithm)
+    order = []
+    remaining = [f for f in forms if f in reachable]
+    while remaining:
+        for f in remaining:
+            if not any(g is not f and g.writes & f.reads
+                       for g in remaining):
+                break
+        else:
+            # A cycle; take the first form in notebook order
+            f = remaining[0]
+        remaining.remove(f)
+        order.append(f)
+
+    # The changed variables mutated in place, which compare equal to the
+    # values a form last read
+    in_place = changed & source.mutates
+    run = []
+    for f in order:
+        if not (f.reads & changed) or not (f.reads & in_place or
+                                           f._inputs_changed()):
+            continue
+        logger.debug(f"Re-running {f.fn.__name__}")
+        if f.is_async:
+            f._submit()
+        else:
+            f_changed = f.run()
+            changed = changed | f_changed
+            in_place = in_place | (f_changed & f.mutates)
+        run.append(f)
+    return run
+
+
+class _RoutedStream:
+    """A text stream sending the writes of the worker threads and tasks
+    running a form to the form's Output widget, and the other writes to the
+    original stream.
+    """
+
+    def __init__(self, stream, name):
+        self._stream = stream
+        self._name = name
+
+    def write(self, text):
+        output = _current_output.get()
+        if output is None:
+            return self._stream.write(text)
+        # Extend the last output if it is of the same stream, as the front-end
+        # does with the stream messages of a cell
+        outputs = output.outputs
+        if (outputs and outputs[-1].get('output_type') == 'stream' and
+                outputs[-1].get('name') == self._name):
+            last = dict(outputs[-1], text=outputs[-1]['text'] + text)
+            output.outputs = outputs[:-1] + (last,)
+        elif self._name == 'stdout':
+            output.append_stdout(text)
+        else:
+            output.append_stderr(text)
+        return len(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@contextlib.contextmanager
+def _route_output(output):
+    """Send the standard output and error of the current thread or task to
+    an Output widget.
+    """
+    if not isinstance(sys.stdout, _RoutedStream):
+        sys.stdout = _RoutedStream(sys.stdout, 'stdout')
+    if not isinstance(sys.stderr, _RoutedStream):
+        sys.stderr = _RoutedStream(sys.stderr, 'stderr')
+    token = _current_output.set(output)
+    try:
+        yield
+    finally:
+        _current_output.reset(token)
+
+
+def _snapshot(namespace, names):
+    return {name: namespace.get(name, _UNSET) for name in names}
+
+
+def _same(a, b):
+    """Return True if two variable values are the same or equal.
+
+    Values that cannot be compared to a bool (e.g., arrays) are considered
+    different unless they are the same object.
+    """
+    if a is b:
+        return True
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except Exception:
+        return False
+
+
+def build_widget(field, namespace=None):
+    """Build the widget of a FormSpec field.
+
+    Args:
+        field (dict): The field of a FormSpec.
+        namespace (dict, optional): The namespace to evaluate an ``expr``
+            initial value in.
+
+    Returns:
+        ipywidgets.Widget: The widget, whose `value` is the field value.
+
+    Examples:
+        >>> build_widget({'name': 'n', 'type': 'integer', 'value': 3})
+        IntText(value=3, description='n')
+        >>> build_widget({'name': 'r', 'type': 'raw', 'expr': '1+1'})
+        Text(value='2', description='r')
+    """
+    global _auto_layout
+
+    if 'value' in field:
+        value = field['value']
+    else:
+        value = eval(field['expr'], namespace or {})
+    description = field['name']
+
+    if 'options_source' in field:
+        if _auto_layout is None:
+            _auto_layout = widgets.Layout(width='auto')
+        return InputDropdown(
+            OptionIndex(_option_source(field['options_source'], namespace)),
+            value, description, _auto_layout,
+            allow_input=bool(field.get('allow-input')))
+
+    if 'options' in field:
+        options = list(field['options'])
+        if value not in options:
+            value = options[0]
+        if _auto_layout is None:
+            _auto_layout = widgets.Layout(width='auto')
+        if len(options) > default_options['indexed_options']:
+            return InputDropdown(OptionIndex(options), value, description,
+                                 _auto_layout,
+                                 allow_input=bool(field.get('allow-input')))
+        if field.get('allow-input'):
+            return create_input_dropdown(options, value, description,
+                                         _auto_layout)
+        return widgets.Dropdown(options=options, value=value,
+                                description=description, layout=_auto_layout)
+
+    kind = field['type']
+    if kind == 'slider':
+        bounds = (field['min'], field['max'], field['step'], value)
+        slider = (widgets.FloatSlider
+                  if any(isinstance(x, float) for x in bounds)
+                  else widgets.IntSlider)
+        return slider(min=field['min'], max=field['max'], step=field['step'],
+                      value=value, description=description)
+    if kind == 'date':
+        value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    elif kind == 'raw':
+        value = str(value)
+    return _INPUT_WIDGETS[kind](value=value, description=description)
+
+
+def _option_source(source, namespace=None):
+    """Resolve the ``options_source`` of a FormSpec field into the source of
+    an `OptionIndex`.
+
+    A variable or module attribute is looked up when the index is first
+    used, and called if it is callable.
+
+    Examples:
+        >>> _option_source('file:tickers.txt')
+        'tickers.txt'
+        >>> index = OptionIndex(_option_source(
+        ...     'tickers', {'tickers': lambda: ['MSFT', 'AAPL']}))
+        >>> index.matches('')
+        ['AAPL', 'MSFT']
+        >>> OptionIndex(_option_source('string.ascii_uppercase')).matches('q')
+        ['Q']
+    """
+    if source.startswith('file:'):
+        return source[len('file:'):]
+
+    def load():
+        module_name, _, name = source.rpartition('.')
+        if module_name:
+            value = getattr(importlib.import_module(module_name), name)
+        else:
+            value = (namespace or {})[name]
+        return value() if callable(value) else value
+    return load
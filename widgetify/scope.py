@@ -0,0 +1,312 @@
+"""
+scope - Scope Analysis of Notebook Cells
+
+This module provides `analyze_scope`, which finds the global variables a
+block of Python code (e.g., the code of a form cell) reads and writes, in a
+single scope-aware pass over its syntax tree:
+
+* A write is a name bound at module level, by any kind of assignment
+  (including augmented and annotated assignments and unpacking), a `for` or
+  `with` target, an import, a function or class definition, an `except`
+  clause or a `match` pattern, or a name declared `global` in a function.
+* A read is a name loaded at module level, or loaded in a function, class,
+  lambda or comprehension without being bound there or in an enclosing
+  function.
+
+A variable mutated in place is also listed as mutated: the base variable of
+an item or attribute assignment or deletion (``df['x'] = 1``), and of a
+method call (``data.append(x)``), which may mutate it, unless the code
+imports it. Since such a variable stays the same object, comparing its value
+before and after the code runs does not show the change.
+
+Local variables of functions, lambdas and comprehensions are neither reads
+nor writes. The results are cached by source, since the same cells are
+analyzed again by each conversion and dependency analysis.
+
+Usage:
+::
+
+    from widgetify.scope import analyze_scope
+
+    reads, writes, mutates = analyze_scope(code)
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'analyze_scope',
+    'ScopeInfo',
+]
+
+import ast
+import functools
+import collections
+
+# The number of analyzed sources kept in the cache
+_CACHE_SIZE = 1024
+
+
+class ScopeInfo(collections.namedtuple('ScopeInfo',
+                                        ['reads', 'writes', 'mutates'])):
+    """The global variables read and written by a block of code.
+
+    Attributes:
+        reads (frozenset): The names of the global variables read.
+        writes (frozenset): The names of the global variables written.
+        mutates (frozenset): The names of the global variables mutated in
+            place.
+    """
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def analyze_scope(code):
+    """Find the global variables a block of Python code reads and writes.
+
+    Top-level `await`, `async for` and `async with` are allowed, as in
+    IPython.
+
+    Args:
+        code (str): The Python code.
+
+    Returns:
+        ScopeInfo: The names read, written and mutated. Builtins are included
+        in the reads if the code uses them.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+
+    Examples:
+        >>> info = analyze_scope(
+        ...     'import numpy as np\\n'
+        ...     'total += 1\\n'
+        ...     'a, (b, c) = f(x)\\n'
+        ...     'for i in range(n): pass\\n'
+        ...     'def g(y):\\n'
+        ...     '    z = y + k\\n'
+        ...     '    return [w for w in z]\\n')
+        >>> sorted(info.writes)
+        ['a', 'b', 'c', 'g', 'i', 'np', 'total']
+        >>> sorted(info.reads)
+        ['f', 'k', 'n', 'range', 'total', 'x']
+        >>> sorted(analyze_scope(
+        ...     "import os\\n"
+        ...     "df['x'] = n\\n"
+        ...     "data.append(os.getcwd())\\n"
+        ...     "def f(obj):\\n"
+        ...     "    obj.n = 1\\n"
+        ...     "    del cache[0]\\n").mutates)
+        ['cache', 'data', 'df']
+    """
+    flags = ast.PyCF_ONLY_AST | getattr(ast, 'PyCF_ALLOW_TOP_LEVEL_AWAIT', 0)
+    visitor = _ScopeVisitor()
+    visitor.visit(compile(code, '<cell>', 'exec', flags))
+    return visitor.result()
+
+
+class _Scope:
+    """The names bound, declared and loaded in a scope.
+    """
+
+    def __init__(self, kind, parent=None):
+        # 'module', 'function', 'class' or 'comprehension'
+        self.kind = kind
+        self.parent = parent
+        self.bound = set()
+        self.globals = set()
+        self.nonlocals = set()
+        self.loads = set()
+        self.mutates = set()
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    def is_global(self, name):
+        """Return True if a name loaded in this scope is a global variable.
+        """
+        if name in self.globals:
+            return True
+        if name in self.bound or name in self.nonlocals:
+            return False
+        scope = self.parent
+        while scope.kind != 'module':
+            if name in scope.globals:
+                return True
+            # Class scopes are not visible to the scopes nested in them
+            if scope.kind != 'class' and (name in scope.bound or
+                                          name in scope.nonlocals):
+                return False
+            scope = scope.parent
+        return True
+
+
+class _ScopeVisitor(ast.NodeVisitor):
+    """Collect the scopes of a module in a single pass.
+    """
+
+    def __init__(self):
+        self.module = _Scope('module')
+        self.scope = self.module
+        self.imports = set()
+
+    def result(self):
+        reads = set(self.module.loads)
+        writes = set(self.module.bound)
+        mutates = set(self.module.mutates)
+        pending = list(self.module.children)
+        for scope in pending:
+            writes.update(scope.globals)
+            reads.update(name for name in scope.loads
+                         if scope.is_global(name))
+            mutates.update(name for name in scope.mutates
+                           if scope.is_global(name))
+            pending.extend(scope.children)
+        return ScopeInfo(frozenset(reads), frozenset(writes),
+                         frozenset(mutates - self.imports))
+
+    def _enter(self, kind, nodes, args=None):
+        """Visit nodes in a new scope nested in the current one.
+        """
+        outer = self.scope
+        self.scope = _Scope(kind, outer)
+        if args is not None:
+            for arg in (args.posonlyargs if hasattr(args, 'posonlyargs')
+                        else []) + args.args + args.kwonlyargs:
+                self.scope.bound.add(arg.arg)
+            for arg in (args.vararg, args.kwarg):
+                if arg is not None:
+                    self.scope.bound.add(arg.arg)
+        for node in nodes:
+            self.visit(node)
+        self.scope = outer
+
+    def _visit_signature(self, args):
+        """Visit the defaults and annotations of a function, which are
+        evaluated in the enclosing scope.
+        """
+        for default in args.defaults + args.kw_defaults:
+            if default is not None:
+                self.visit(default)
+        for arg in ((args.posonlyargs if hasattr(args, 'posonlyargs')
+                     else []) + args.args + args.kwonlyargs +
+                    [args.vararg, args.kwarg]):
+            if arg is not None and arg.annotation is not None:
+                self.visit(arg.annotation)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.scope.loads.add(node.id)
+        else:
+            self.scope.bound.add(node.id)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._mutate(node)
+        self.generic_visit(node)
+
+    visit_Attribute = visit_Subscript
+
+    def visit_Call(self, node):
+        # A method call may mutate its object
+        if isinstance(node.func, ast.Attribute):
+            self._mutate(node.func)
+        self.generic_visit(node)
+
+    def _mutate(self, node):
+        """Record the variable at the base of an item or attribute access as
+        mutated.
+        """
+        while isinstance(node, (ast.Subscript, ast.Attribute)):
+            node = node.value
+        if isinstance(node, ast.Name):
+            self.scope.mutates.add(node.id)
+
+    def visit_AugAssign(self, node):
+        # An augmented assignment reads its target too
+        if isinstance(node.target, ast.Name):
+            self.scope.loads.add(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        self.scope.globals.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self.scope.nonlocals.update(node.names)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = (alias.asname or alias.name).split('.')[0]
+            self.scope.bound.add(name)
+            self.imports.add(name)
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self.scope.bound.add(alias.asname or alias.name)
+                self.imports.add(alias.asname or alias.name)
+
+    def visit_FunctionDef(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._visit_signature(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self.scope.bound.add(node.name)
+        self._enter('function', node.body, node.args)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_signature(node.args)
+        self._enter('function', [node.body], node.args)
+
+    def visit_ClassDef(self, node):
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self.scope.bound.add(node.name)
+        self._enter('class', node.body)
+
+    def visit_ListComp(self, node):
+        # The first iterable is evaluated in the enclosing scope
+        generators = node.generators
+        self.visit(generators[0].iter)
+        nodes = []
+        for i, generator in enumerate(generators):
+            nodes.append(generator.target)
+            if i:
+                nodes.append(generator.iter)
+            nodes.extend(generator.ifs)
+        if isinstance(node, ast.DictComp):
+            nodes.extend([node.key, node.value])
+        else:
+            nodes.append(node.elt)
+        self._enter('comprehension', nodes)
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+    visit_DictComp = visit_ListComp
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        # An assignment expression in a comprehension binds in the enclosing
+        # scope
+        scope = self.scope
+        while scope.kind == 'comprehension':
+            scope = scope.parent
+        scope.bound.add(node.target.id)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.scope.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self.scope.bound.add(node.name)
+        self.generic_visit(node)
+
+    visit_MatchStar = visit_MatchAs
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self.scope.bound.add(node.rest)
+        self.generic_visit(node)
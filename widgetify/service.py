@@ -0,0 +1,582 @@
+"""
+service - Local Notebook Conversion Service
+
+This module provides `ConversionService`, a small HTTP service on a local TCP
+port or a Unix socket, which converts the notebooks posted to it and returns
+the converted notebooks, so that tools converting notebooks one at a time
+(e.g., an editor plugin or a Voilà pre-processing hook) do not pay the start
+up of Python, nbformat and widgetify for each notebook.
+
+The conversions run in a pool of worker processes that is started and warmed
+up (each worker imports its modules and converts a sample notebook) before
+the service accepts requests. The number of requests converted at once is
+limited; a request waiting longer than the queue timeout for a free slot is
+rejected with ``503 Service Unavailable``. Each response reports its latency
+in the ``X-Widgetify-Latency`` (seconds) and ``Server-Timing`` headers, and
+the latency distribution is available from ``GET /health``.
+
+Endpoints:
+
+* ``POST /widgetify``: Convert the notebook in the request body. The query
+  string selects further operations: ``strip_outputs=1``,
+  ``max_output_size=BYTES``, ``insert_title_cells=1``,
+  ``remove_open_in_colab_cell=1``, and ``remove_section=HEADING`` (repeated
+  for several sections).
+* ``GET /health``: The state and the metrics of the service as JSON.
+
+Usage:
+::
+
+    widgetify-serve --port 8765 --workers 4
+    curl --data-binary @form.ipynb 'http://127.0.0.1:8765/widgetify'
+
+    widgetify-serve --unix /tmp/widgetify.sock
+    curl --unix-socket /tmp/widgetify.sock --data-binary @form.ipynb \\
+        'http://localhost/widgetify?strip_outputs=1'
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'ConversionService',
+    'main',
+]
+
+import os
+import sys
+import json
+import stat
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+import socketserver
+import http.server
+import urllib.parse
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import nbformat
+
+from . import __version__
+from . import nb_io
+from .cache import ConversionCache, default_cache_dir
+from .metrics import FormMetrics
+from .form2widget import widgetify_bytes
+from .nb_pipeline import NotebookPipeline
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# The content type of notebooks
+_NOTEBOOK_TYPE = 'application/x-ipynb+json'
+
+# The flag options of POST /widgetify, in the order they are applied
+_FLAGS = ('remove_open_in_colab_cell', 'insert_title_cells', 'strip_outputs')
+
+# The notebook each worker converts while warming up
+_WARMUP_NOTEBOOK = nbformat.v4.new_notebook(cells=[
+    nbformat.v4.new_markdown_cell('# Warm-up'),
+    nbformat.v4.new_code_cell(
+        '# @title Warm-up\n'
+        'text = "a" # @param {type:"string"}\n'
+        'n = 1 # @param {type:"slider", min:0, max:10}\n'
+        'choice = "x" # @param ["x", "y"]\n'
+        'print(text, n, choice)\n'),
+])
+
+
+class ConversionService:
+    """A local HTTP service converting notebooks in a warm process pool.
+
+    Args:
+        host (str, optional): The host to listen on. Defaults to
+            ``'127.0.0.1'``.
+        port (int, optional): The TCP port to listen on; 0 picks a free
+            port. Defaults to 8765.
+        unix_socket (str, optional): The path of a Unix socket to listen on
+            instead of a TCP port. Defaults to None.
+        workers (int, optional): The number of worker processes. Defaults to
+            the number of CPUs.
+        max_concurrency (int, optional): The maximum number of requests
+            converted at once. Defaults to `workers`.
+        queue_timeout (float, optional): The seconds a request waits for a
+            free slot before it is rejected. Defaults to 10.
+        max_body_size (int, optional): The maximum size of a posted notebook
+            in bytes. Defaults to 256 MiB.
+        cache_dir (str, optional): The directory of a conversion cache shared
+            by the workers. Defaults to None (no caching).
+        io_options (dict, optional): Options of `nb_io.set_options` for the
+            workers.
+        metrics_log (str, optional): The path to a JSON lines file to append
+            each request to. Defaults to None (no log).
+
+    Attributes:
+        address (tuple or str): The ``(host, port)`` or the socket path the
+            service listens on, once started.
+        metrics (metrics.FormMetrics): The request counts and latencies.
+        rejected (int): The number of requests rejected as too many.
+        in_flight (int): The number of requests being converted.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, unix_socket=None,
+                 workers=None, max_concurrency=None, queue_timeout=10.0,
+                 max_body_size=256 * 1024 * 1024, cache_dir=None,
+                 io_options=None, metrics_log=None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self.queue_timeout = queue_timeout
+        self.max_body_size = max_body_size
+        self.cache_dir = cache_dir
+        self.io_options = io_options
+        self.address = None
+        self.metrics = FormMetrics('service', log=metrics_log)
+        self.rejected = 0
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def start(self):
+        """Start and warm up the worker pool, then serve requests on a
+        background thread.
+
+        Returns:
+            ConversionService: The service itself.
+
+        Raises:
+            FileExistsError: If the path of the Unix socket exists and is not
+                a socket.
+        """
+        if self.unix_socket:
+            # A stale socket of a previous run
+            _remove_socket(self.unix_socket)
+        self._start_pool()
+        if self.unix_socket:
+            self._server = _UnixHTTPServer(self.unix_socket, _Handler)
+        else:
+            self._server = _TCPHTTPServer((self.host, self.port), _Handler)
+        self._server.service = self
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='widgetify-service',
+                                        daemon=True)
+        self._thread.start()
+        logger.info(f"Serving on {self.url} with {self.workers} workers")
+        return self
+
+    def serve_forever(self):
+        """Start the service and block until it is interrupted.
+        """
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop serving requests and stop the worker pool.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if self.unix_socket:
+                try:
+                    _remove_socket(self.unix_socket)
+                except OSError as e:
+                    logger.warning(f"Cannot remove {self.unix_socket}: {e}")
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def url(self):
+        """str: The base URL of the service, once started.
+        """
+        if isinstance(self.address, str):
+            return f"http+unix://{urllib.parse.quote(self.address, safe='')}"
+        host, port = self.address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        """Return the state and the metrics of the service.
+
+        Returns:
+            dict: The numbers of workers, slots, requests in flight and
+            rejected requests, and the request counts and latencies of
+            `metrics.FormMetrics.summary`.
+        """
+        with self._lock:
+            stats = {'workers': self.workers,
+                     'max_concurrency': self.max_concurrency,
+                     'in_flight': self.in_flight,
+                     'rejected': self.rejected}
+        stats.update(self.metrics.summary())
+        return stats
+
+    def convert(self, nb_bytes, options):
+        """Convert a notebook in the worker pool, within the concurrency
+        limit.
+
+        Args:
+            nb_bytes (bytes): The content of the notebook file.
+            options (dict): The options of the conversion (see `_convert`).
+
+        Returns:
+            tuple: ``(converted_bytes, wait, duration)``; the content of the
+            converted notebook, the seconds waited for a slot, and the
+            seconds the conversion took in the worker. `converted_bytes` is
+            None if the request was rejected.
+
+        Raises:
+            concurrent.futures.process.BrokenProcessPool: If a worker process
+                died; the pool is restarted for the next requests.
+            Exception: The error of the conversion.
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            return None, time.perf_counter() - start, 0.0
+        try:
+            with self._lock:
+                self.in_flight += 1
+                executor = self._executor
+            try:
+                future = executor.submit(_convert, nb_bytes, options)
+                wait = time.perf_counter() - start
+                converted_bytes, duration = future.result()
+            except BrokenProcessPool:
+                self._restart_pool(executor)
+                raise
+            return converted_bytes, wait, duration
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _start_pool(self):
+        """Start the worker processes, and wait until each of them has
+        converted the warm-up notebook.
+        """
+        start = time.perf_counter()
+        context = multiprocessing.get_context()
+        ready = context.Semaphore(0)
+        executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=_init_worker,
+            initargs=(self.cache_dir, self.io_options, ready))
+        try:
+            # Workers may be started only as tasks are submitted; one task
+            # per worker starts them all
+            for _ in range(self.workers):
+                executor.submit(os.getpid)
+            for _ in range(self.workers):
+                if not ready.acquire(timeout=60):
+                    raise RuntimeError("The worker processes did not start")
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        self._executor = executor
+        logger.debug(f"Warmed up {self.workers} workers in "
+                     f"{time.perf_counter() - start:.2f}s")
+
+    def _restart_pool(self, broken):
+        """Replace a broken worker pool with a new, warmed-up one.
+
+        Requests that find the same pool broken restart it once. If the new
+        pool cannot be started, the broken one is kept, and the next request
+        tries again.
+        """
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.warning("A worker process died; restarting the pool")
+            broken.shutdown(wait=False)
+            try:
+                self._start_pool()
+            except Exception:
+                logger.exception("Cannot restart the worker pool")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Handle the requests of a `ConversionService`.
+    """
+
+    server_version = f"widgetify/{__version__}"
+    protocol_version = 'HTTP/1.1'
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionError:
+            # The client closed a kept-alive connection
+            pass
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != '/health':
+            self._send_error(404, "Not found")
+            return
+        self._send(200, json.dumps(self.server.service.stats()).encode(),
+                   'application/json')
+
+    def do_POST(self):
+        start = time.perf_counter()
+        service = self.server.service
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/widgetify':
+            self._send_error(404, "Not found")
+            return
+        try:
+            options = _parse_options(url.query)
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError) as e:
+            self._send_error(400, f"Bad request: {e}")
+            return
+        if length > service.max_body_size:
+            self._send_error(413, "Notebook too large")
+            return
+        nb_bytes = self.rfile.read(length)
+        service.metrics.record_submit()
+
+        status = 'ok'
+        converted_bytes = None
+        try:
+            converted_bytes, wait, duration = service.convert(nb_bytes,
+                                                              options)
+        except BrokenProcessPool:
+            status = 'error'
+            self._send_error(503, "A worker process died; retry the request",
+                             {'Retry-After': '1'})
+            return
+        except Exception as e:
+            status = 'error'
+            logger.debug(f"Conversion failed: {e!r}")
+            self._send_error(422, f"Cannot convert the notebook: {e}")
+            return
+        finally:
+            latency = time.perf_counter() - start
+            if status == 'error' or converted_bytes is not None:
+                service.metrics.record_run(latency, status)
+
+        if converted_bytes is None:
+            self._send_error(503, "Too many concurrent requests",
+                             {'Retry-After': '1'})
+            return
+        self._send(200, converted_bytes, _NOTEBOOK_TYPE, {
+            'X-Widgetify-Latency': f"{latency:.6f}",
+            'Server-Timing': (f"wait;dur={wait * 1e3:.3f}, "
+                              f"convert;dur={duration * 1e3:.3f}, "
+                              f"total;dur={latency * 1e3:.3f}"),
+        })
+
+    def _send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, code, message, headers=None):
+        # The request body may be left unread
+        self.close_connection = True
+        headers = dict(headers or {}, Connection='close')
+        self._send(code, json.dumps({'error': message}).encode(),
+                   'application/json', headers)
+
+    def address_string(self):
+        # The client address of a Unix socket is an empty string
+        if isinstance(self.client_address, str):
+            return self.client_address or 'unix'
+        return super().address_string()
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class _TCPHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_socket(path):
+    """Remove a Unix socket file, if it exists.
+
+    Raises:
+        FileExistsError: If the path exists and is not a socket.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.unlink(path)
+
+
+def _parse_options(query):
+    """Parse the query string of POST /widgetify into conversion options.
+    """
+    params = urllib.parse.parse_qs(query, keep_blank_values=True)
+    unknown = set(params) - set(_FLAGS) - {'max_output_size',
+                                           'remove_section'}
+    if unknown:
+        raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+    options = {flag: params[flag][-1].lower() not in ('', '0', 'false', 'no')
+               for flag in _FLAGS if flag in params}
+    if 'max_output_size' in params:
+        options['max_output_size'] = int(params['max_output_size'][-1])
+        options['strip_outputs'] = True
+    if 'remove_section' in params:
+        options['remove_sections'] = params['remove_section']
+    return options
+
+
+# The conversion cache of the current worker process
+_worker_cache = None
+
+
+def _init_worker(cache_dir, io_options=None, ready=None):
+    """Set the I/O options, open the conversion cache, and convert the
+    warm-up notebook once per worker process, then release `ready`.
+    """
+    global _worker_cache
+    nb_io.set_options(**(io_options or {}))
+    _worker_cache = ConversionCache(cache_dir) if cache_dir else None
+    _convert(nb_io.notebook_to_bytes(_WARMUP_NOTEBOOK),
+             {'insert_title_cells': True, 'strip_outputs': True})
+    if ready is not None:
+        ready.release()
+
+
+def _convert(nb_bytes, options):
+    """Convert a notebook, for use in a worker process.
+
+    Args:
+        nb_bytes (bytes): The content of the notebook file.
+        options (dict): ``remove_open_in_colab_cell``, ``insert_title_cells``
+            and ``remove_sections``, applied before the conversion, and
+            ``strip_outputs`` and ``max_output_size``.
+
+    Returns:
+        tuple: ``(converted_bytes, duration)``.
+    """
+    start = time.perf_counter()
+    strip_outputs = options.get('strip_outputs', False)
+    max_output_size = options.get('max_output_size')
+    if not (options.get('remove_open_in_colab_cell') or
+            options.get('insert_title_cells') or
+            options.get('remove_sections')):
+        converted_bytes = widgetify_bytes(nb_bytes, _worker_cache,
+                                          strip_outputs, max_output_size)
+        return converted_bytes, time.perf_counter() - start
+
+    pipeline = NotebookPipeline.from_bytes(nb_bytes)
+    if options.get('remove_open_in_colab_cell'):
+        pipeline.remove_open_in_colab_cell()
+    if options.get('insert_title_cells'):
+        pipeline.insert_title_cells()
+    if options.get('remove_sections'):
+        pipeline.remove_sections(options['remove_sections'])
+    pipeline.widgetify(cache=_worker_cache)
+    if strip_outputs:
+        pipeline.strip_outputs(max_output_size)
+    converted_bytes = pipeline.to_bytes() if pipeline.modified else nb_bytes
+    return converted_bytes, time.perf_counter() - start
+
+
+def main(argv=None):
+    """Run the `widgetify-serve` command.
+
+    Args:
+        argv (list of str, optional): The command line arguments, excluding
+            the program name. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog='widgetify-serve',
+        description='Serve notebook conversions on a local port or socket.')
+    parser.add_argument(
+        '--host', default='127.0.0.1',
+        help='host to listen on (default: %(default)s)')
+    parser.add_argument(
+        '--port', type=int, default=8765,
+        help='TCP port to listen on (default: %(default)s)')
+    parser.add_argument(
+        '--unix', metavar='PATH',
+        help='listen on a Unix socket instead of a TCP port')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=os.cpu_count(),
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '--max-concurrency', type=int,
+        help='maximum number of requests converted at once '
+             '(default: number of workers)')
+    parser.add_argument(
+        '--queue-timeout', type=float, default=10.0,
+        help='seconds a request waits for a free slot before it is '
+             'rejected (default: %(default)s)')
+    parser.add_argument(
+        '--cache-dir', default=default_cache_dir(),
+        help='directory of the conversion cache (default: %(default)s)')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='convert every notebook without using the cache')
+    parser.add_argument(
+        '--trusted', action='store_true',
+        help='skip JSON schema validation of the notebooks')
+    parser.add_argument(
+        '--json-backend', choices=('json', 'orjson', 'auto'), default='json',
+        help='JSON library for reading and writing (default: %(default)s)')
+    parser.add_argument(
+        '--metrics-log', metavar='PATH',
+        help='append the latency of each request to this JSON lines file')
+    parser.add_argument(
+        '--version', action='version', version=f'%(prog)s {__version__}')
+    args = parser.parse_args(argv)
+
+    if args.unix and not hasattr(socketserver, 'UnixStreamServer'):
+        print("widgetify-serve: Unix sockets are not supported",
+              file=sys.stderr)
+        return 2
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    try:
+        ConversionService(
+            args.host, args.port, args.unix, args.workers,
+            args.max_concurrency, args.queue_timeout,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            io_options={'trusted': args.trusted,
+                        'json_backend': args.json_backend},
+            metrics_log=args.metrics_log).serve_forever()
+    except FileExistsError as e:
+        print(f"widgetify-serve: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
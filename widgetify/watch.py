@@ -0,0 +1,189 @@
+"""
+watch - Incremental Re-widgetifying of Edited Notebooks
+
+This module provides `NotebookWatcher`, which polls a source directory for
+edited notebooks and converts each of them into a separate output notebook,
+leaving the source untouched. Only the form cells whose source changed since
+the previous build are converted again; the others are reused from memory.
+A burst of saves to the same notebook is debounced into one rebuild, and the
+output is replaced atomically, so a Voilà server reading the output directory
+never sees a half-written notebook.
+
+Usage:
+::
+
+    from widgetify.watch import NotebookWatcher
+
+    def prepare(pipeline):
+        pipeline.remove_open_in_colab_cell()
+        pipeline.insert_title_cells()
+
+    NotebookWatcher('notebooks', 'voila_notebooks', prepare=prepare).run()
+"""
+__author__ = "York <york.jong@gmail.com>"
+__date__ = "2026/10/18 (initial version) ~ 2026/10/18 (last revision)"
+
+__all__ = [
+    'NotebookWatcher',
+]
+
+import os
+import time
+import logging
+
+from .nb_pipeline import NotebookPipeline
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class NotebookWatcher:
+    """Watch a directory and rebuild the converted copy of edited notebooks.
+
+    Args:
+        src_dir (str): The directory of the source notebooks, searched
+            recursively.
+        out_dir (str): The directory to write the converted notebooks to,
+            mirroring the layout of `src_dir`.
+        prepare (callable, optional): A function called as
+            ``prepare(pipeline)`` with a `NotebookPipeline` before the
+            conversion, to apply further `nb_op` operations.
+        interval (float, optional): Seconds between two polls. Defaults to
+            1.0.
+        debounce (float, optional): Seconds a notebook must stay unchanged
+            before it is rebuilt. Defaults to 0.5.
+    """
+
+    def __init__(self, src_dir, out_dir, prepare=None,
+                 interval=1.0, debounce=0.5):
+        self.src_dir = src_dir
+        self.out_dir = out_dir
+        self.prepare = prepare
+        self.interval = interval
+        self.debounce = debounce
+
+        # {nb_filename: (mtime_ns, size)} of the last poll
+        self._stats = {}
+        # {nb_filename: time of the last detected change}
+        self._pending = {}
+        # {nb_filename: _CellMemo of the last build}
+        self._memos = {}
+
+    def run(self):
+        """Poll and rebuild until interrupted with Ctrl-C.
+        """
+        logger.info(f"Watching {self.src_dir} -> {self.out_dir}")
+        try:
+            while True:
+                self.poll()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+
+    def poll(self):
+        """Check the source directory once and rebuild settled notebooks.
+
+        Returns:
+            list of str: The source notebooks that were rebuilt.
+        """
+        now = time.monotonic()
+        stats = _scan(self.src_dir, exclude_dir=self.out_dir)
+        for nb_filename, stat in stats.items():
+            if self._stats.get(nb_filename) != stat:
+                self._pending[nb_filename] = now
+        for nb_filename in set(self._stats) - set(stats):
+            self._pending.pop(nb_filename, None)
+            self._memos.pop(nb_filename, None)
+        self._stats = stats
+
+        rebuilt = []
+        for nb_filename, changed_at in list(self._pending.items()):
+            if now - changed_at < self.debounce:
+                continue
+            del self._pending[nb_filename]
+            try:
+                self.rebuild(nb_filename)
+                rebuilt.append(nb_filename)
+            except Exception as e:
+                logger.error(f"{nb_filename}: {type(e).__name__}: {e}")
+        return rebuilt
+
+    def rebuild(self, nb_filename):
+        """Convert a source notebook into its output notebook.
+
+        Args:
+            nb_filename (str): The path to the source notebook.
+
+        Returns:
+            str: The path to the output notebook.
+        """
+        output_filename = os.path.join(
+            self.out_dir, os.path.relpath(nb_filename, self.src_dir))
+        os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+
+        pipeline = NotebookPipeline(nb_filename)
+        if self.prepare:
+            self.prepare(pipeline)
+
+        old_memo = self._memos.get(nb_filename, _CellMemo())
+        sources = [cell.source for cell in pipeline.notebook.cells]
+        n_changed = sum(source not in old_memo.sources for source in sources)
+
+        memo = _CellMemo(old_memo, sources)
+        pipeline.widgetify(cache=memo)
+        pipeline.save(output_filename)
+        self._memos[nb_filename] = memo
+
+        logger.info(f"{nb_filename}: {n_changed} of {len(sources)} cells "
+                    f"changed, {memo.n_converted} forms converted "
+                    f"-> {output_filename}")
+        return output_filename
+
+
+class _CellMemo:
+    """An in-memory cache of converted form cells for one notebook.
+
+    It has the `get_cell`/`put_cell` interface of `cache.ConversionCache`.
+    Only the conversions of the current cells are carried over from the
+    previous build, so the memo does not grow as a notebook is edited.
+    """
+
+    def __init__(self, previous=None, sources=()):
+        self.sources = set(sources)
+        self.n_converted = 0
+        self._converted = {}
+        if previous:
+            self._converted = {source: converted for source, converted
+                               in previous._converted.items()
+                               if source in self.sources}
+
+    def get_cell(self, source):
+        return self._converted.get(source)
+
+    def put_cell(self, source, converted_source):
+        self.n_converted += 1
+        self._converted[source] = converted_source
+
+
+def _scan(src_dir, exclude_dir):
+    """Return ``{nb_filename: (mtime_ns, size)}`` of the notebooks in a
+    directory tree, skipping ``.ipynb_checkpoints`` directories and
+    `exclude_dir`, in case the output directory is inside the source one.
+    """
+    exclude_dir = os.path.abspath(exclude_dir)
+    stats = {}
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = [
+            d for d in dirnames if d != '.ipynb_checkpoints' and
+            os.path.abspath(os.path.join(dirpath, d)) != exclude_dir]
+        for filename in filenames:
+            if not filename.endswith('.ipynb'):
+                continue
+            nb_filename = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(nb_filename)
+            except FileNotFoundError:
+                continue
+            stats[nb_filename] = (stat.st_mtime_ns, stat.st_size)
+    return stats